@@ -0,0 +1,343 @@
+import asyncio
+import itertools
+import logging
+import time
+import msgpack
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import airsim
+from control_loop import ControlLoop, DEGRADE, LoopStats, TickInfo
+from instrumentation import (COMMAND_DISPATCH, LIDAR_FETCH, STATE_FETCH, configure_from_env, get_logger,
+                             log_event, report_timers, timers)
+from multi_drones_swarm import SwarmController
+from swarm_acquisition import DroneSample, SwarmSnapshot
+
+logger = get_logger("async_swarm")
+
+_REQUEST, _RESPONSE = 0, 1
+_MAX_TIMEOUT = 3e38  # AirSim's "no timeout"
+
+class RpcError(Exception):
+    """The server answered a request with an error"""
+
+def _pack_default(value):
+    # airsim types serialise as their attribute dict, as in msgpack-rpc-python
+    return value.to_msgpack()
+
+class AsyncRpcConnection:
+    """One msgpack-rpc connection with any number of requests in flight
+
+    Requests are written as soon as they are made and matched to responses by msgid,
+    so N calls cost about one round trip instead of N.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 41451, timeout: Optional[float] = 3600):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._packer = msgpack.Packer(use_bin_type=True, default=_pack_default)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._lost: Optional[Exception] = None  # why the server side went away, once it has
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._lost = None
+        self._read_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    def send(self, method: str, *args) -> asyncio.Future:
+        """Write a request now and return the future of its result"""
+        if self._writer is None:
+            raise ConnectionError("Not connected")
+        if self._lost is not None:
+            # Nothing would ever answer; fail now instead of when the timeout runs out
+            raise ConnectionError(f"Connection to {self.host}:{self.port} lost: {self._lost}") from self._lost
+        msgid = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msgid] = future
+        # A request that was given up on (timed out or cancelled) must not stay pending
+        future.add_done_callback(lambda _, msgid=msgid: self._pending.pop(msgid, None))
+        self._writer.write(self._packer.pack([_REQUEST, msgid, method, list(args)]))
+        return future
+
+    async def call(self, method: str, *args) -> Any:
+        """Send a request and wait for its result"""
+        future = self.send(method, *args)
+        await self._writer.drain()
+        if self.timeout is None:
+            return await future
+        return await asyncio.wait_for(future, self.timeout)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self._read_task is not None:
+            await asyncio.gather(self._read_task, return_exceptions=True)
+        self._writer = None
+
+    async def _read_loop(self):
+        unpacker = msgpack.Unpacker(raw=False)
+        error: Exception = ConnectionError("Connection closed")
+        try:
+            while True:
+                data = await self._reader.read(1 << 16)
+                if not data:
+                    break
+                unpacker.feed(data)
+                for message in unpacker:
+                    if message[0] != _RESPONSE:
+                        continue
+                    _, msgid, rpc_error, result = message
+                    future = self._pending.pop(msgid, None)
+                    if future is None or future.done():
+                        continue
+                    if rpc_error is not None:
+                        future.set_exception(RpcError(rpc_error))
+                    else:
+                        future.set_result(result)
+        except Exception as e:
+            error = e
+        self._lost = error
+        for future in list(self._pending.values()):
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+class AsyncAirSimClient:
+    """Coroutine wrappers for the AirSim RPCs the swarm uses, spread over a few connections
+
+    Commands are awaited to completion like ``moveToPositionAsync(...).join()``; the
+    ``command_*`` variants only send them, for loops that re-plan every tick.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 41451, connections: int = 2,
+                 timeout: Optional[float] = 3600):
+        self.connections = [AsyncRpcConnection(host, port, timeout) for _ in range(connections)]
+        self._next = itertools.cycle(self.connections)
+
+    async def connect(self) -> "AsyncAirSimClient":
+        await asyncio.gather(*(connection.connect() for connection in self.connections))
+        return self
+
+    async def close(self):
+        await asyncio.gather(*(connection.close() for connection in self.connections))
+
+    def call(self, method: str, *args) -> Awaitable[Any]:
+        return next(self._next).call(method, *args)
+
+    def send(self, method: str, *args) -> asyncio.Future:
+        return next(self._next).send(method, *args)
+
+    # -------------------------------------------------------------- session
+    async def ping(self) -> bool:
+        return await self.call("ping")
+
+    async def list_vehicles(self) -> List[str]:
+        return await self.call("listVehicles")
+
+    async def enable_api_control(self, is_enabled: bool, vehicle_name: str = ""):
+        return await self.call("enableApiControl", is_enabled, vehicle_name)
+
+    async def arm_disarm(self, arm: bool, vehicle_name: str = "") -> bool:
+        return await self.call("armDisarm", arm, vehicle_name)
+
+    # -------------------------------------------------------------- sensors
+    async def get_state(self, vehicle_name: str = "") -> airsim.MultirotorState:
+        return airsim.MultirotorState.from_msgpack(await self.call("getMultirotorState", vehicle_name))
+
+    async def get_lidar(self, lidar_name: str = "", vehicle_name: str = "") -> airsim.LidarData:
+        return airsim.LidarData.from_msgpack(await self.call("getLidarData", lidar_name, vehicle_name))
+
+    async def get_images(self, requests: Sequence[airsim.ImageRequest],
+                         vehicle_name: str = "") -> List[airsim.ImageResponse]:
+        responses = await self.call("simGetImages", list(requests), vehicle_name)
+        return [airsim.ImageResponse.from_msgpack(response) for response in responses]
+
+    # ------------------------------------------------------------- commands
+    async def takeoff(self, timeout_sec: float = 20, vehicle_name: str = "") -> bool:
+        return await self.call("takeoff", timeout_sec, vehicle_name)
+
+    async def land(self, timeout_sec: float = 60, vehicle_name: str = "") -> bool:
+        return await self.call("land", timeout_sec, vehicle_name)
+
+    async def move_to_position(self, x: float, y: float, z: float, velocity: float, vehicle_name: str = "",
+                               timeout_sec: float = _MAX_TIMEOUT) -> bool:
+        return await self.command_move_to_position(x, y, z, velocity, vehicle_name, timeout_sec)
+
+    def command_move_to_position(self, x: float, y: float, z: float, velocity: float, vehicle_name: str = "",
+                                 timeout_sec: float = _MAX_TIMEOUT) -> asyncio.Future:
+        """Send a move without waiting for arrival; a newer command replaces it"""
+        return self.send("moveToPosition", x, y, z, velocity, timeout_sec,
+                         airsim.DrivetrainType.MaxDegreeOfFreedom, airsim.YawMode(), -1, 1, vehicle_name)
+
+    async def flush(self):
+        """Wait until everything sent so far has been handed to the OS"""
+        await asyncio.gather(*(connection._writer.drain() for connection in self.connections
+                               if connection._writer is not None))
+
+class ThreadedAirSimClient:
+    """Same coroutine surface over a blocking client, one worker thread per call
+
+    Lets the async runtime drive in-process clients that have no socket to pipeline on
+    (fake or replay). The client must be thread-safe, which msgpack-rpc clients are not.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    async def connect(self) -> "ThreadedAirSimClient":
+        return self
+
+    async def close(self):
+        pass
+
+    async def ping(self) -> bool:
+        return await asyncio.to_thread(self.client.ping)
+
+    async def list_vehicles(self) -> List[str]:
+        return await asyncio.to_thread(self.client.listVehicles)
+
+    async def enable_api_control(self, is_enabled: bool, vehicle_name: str = ""):
+        return await asyncio.to_thread(self.client.enableApiControl, is_enabled, vehicle_name)
+
+    async def arm_disarm(self, arm: bool, vehicle_name: str = "") -> bool:
+        return await asyncio.to_thread(self.client.armDisarm, arm, vehicle_name)
+
+    async def get_state(self, vehicle_name: str = "") -> airsim.MultirotorState:
+        return await asyncio.to_thread(self.client.getMultirotorState, vehicle_name=vehicle_name)
+
+    async def get_lidar(self, lidar_name: str = "", vehicle_name: str = "") -> airsim.LidarData:
+        return await asyncio.to_thread(self.client.getLidarData, lidar_name=lidar_name, vehicle_name=vehicle_name)
+
+    async def get_images(self, requests: Sequence[airsim.ImageRequest],
+                         vehicle_name: str = "") -> List[airsim.ImageResponse]:
+        return await asyncio.to_thread(self.client.simGetImages, list(requests), vehicle_name=vehicle_name)
+
+    async def takeoff(self, timeout_sec: float = 20, vehicle_name: str = "") -> bool:
+        future = await asyncio.to_thread(self.client.takeoffAsync, timeout_sec, vehicle_name)
+        return await asyncio.to_thread(future.get)
+
+    async def land(self, timeout_sec: float = 60, vehicle_name: str = "") -> bool:
+        future = await asyncio.to_thread(self.client.landAsync, timeout_sec, vehicle_name)
+        return await asyncio.to_thread(future.get)
+
+    async def move_to_position(self, x: float, y: float, z: float, velocity: float, vehicle_name: str = "",
+                               timeout_sec: float = _MAX_TIMEOUT) -> bool:
+        future = self.command_move_to_position(x, y, z, velocity, vehicle_name, timeout_sec)
+        return await asyncio.to_thread((await future).get)
+
+    def command_move_to_position(self, x: float, y: float, z: float, velocity: float, vehicle_name: str = "",
+                                 timeout_sec: float = _MAX_TIMEOUT) -> asyncio.Future:
+        return asyncio.ensure_future(asyncio.to_thread(
+            self.client.moveToPositionAsync, x, y, z, velocity, timeout_sec, vehicle_name=vehicle_name))
+
+    async def flush(self):
+        pass
+
+def _log_command_error(drone_name: str):
+    def callback(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            log_event(logger, logging.WARNING, "move_error", drone=drone_name, error=str(future.exception()))
+    return callback
+
+class AsyncSwarm:
+    """Full-swarm sense and act as coroutines; every drone's requests are in flight at once"""
+    def __init__(self, client, drone_names: Sequence[str], lidar_name: str = "Lidar1"):
+        self.client = client
+        self.drone_names = list(drone_names)
+        self.lidar_name = lidar_name
+        self.tick = 0
+
+    async def _timed(self, stage: str, awaitable: Awaitable[Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            if timers.enabled:
+                timers.record(stage, time.perf_counter() - start)
+
+    async def _sample(self, drone_name: str, include_lidar: bool) -> DroneSample:
+        state_call = self._timed(STATE_FETCH, self.client.get_state(drone_name))
+        if not include_lidar:
+            calls = [state_call]
+        else:
+            calls = [state_call, self._timed(LIDAR_FETCH, self.client.get_lidar(self.lidar_name, drone_name))]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            return DroneSample(state=None, lidar=None, error=str(errors[0]))
+        return DroneSample(state=results[0], lidar=results[1] if include_lidar else None)
+
+    async def sense(self, include_lidar: bool = True) -> SwarmSnapshot:
+        """State (and LiDAR) of every drone, all requests issued before any is awaited"""
+        samples = await asyncio.gather(*(self._sample(name, include_lidar) for name in self.drone_names))
+        self.tick += 1
+        return SwarmSnapshot(tick=self.tick, timestamp=time.time(), samples=dict(zip(self.drone_names, samples)))
+
+    async def act(self, targets: Dict[str, Tuple[float, float, float]], velocity: float = 2.0):
+        """Send one move per drone without waiting for arrival"""
+        with timers.stage(COMMAND_DISPATCH):
+            for drone_name, (x, y, z) in targets.items():
+                future = self.client.command_move_to_position(x, y, z, velocity, drone_name)
+                future.add_done_callback(_log_command_error(drone_name))
+            await self.client.flush()
+
+    async def control_tick(self, controller, angle: float, include_lidar: bool = True):
+        """SwarmController.control_tick with acquisition and dispatch as one pipelined round"""
+        controller.apply_snapshot(await self.sense(include_lidar))
+        target_positions, collision_risks = controller.plan_tick(angle)
+        for drone_name, (other_drone, dist) in collision_risks.items():
+            log_event(logger, logging.INFO, "move_skipped", drone=drone_name, other=other_drone,
+                      distance=dist, minimum=controller.safety_distance)
+        await self.act({name: target for name, target in target_positions.items() if name not in collision_risks})
+        controller.finish_tick(target_positions, collision_risks)
+
+    async def takeoff(self, timeout_sec: float = 20) -> Dict[str, Optional[str]]:
+        """Enable, arm and take off every drone concurrently; returns the error per drone, if any"""
+        async def one(drone_name: str):
+            await self.client.enable_api_control(True, drone_name)
+            await self.client.arm_disarm(True, drone_name)
+            await self.client.takeoff(timeout_sec, drone_name)
+        return await self._each(one)
+
+    async def land(self, timeout_sec: float = 60) -> Dict[str, Optional[str]]:
+        """Land and disarm every drone concurrently"""
+        async def one(drone_name: str):
+            await self.client.land(timeout_sec, drone_name)
+            await self.client.arm_disarm(False, drone_name)
+            await self.client.enable_api_control(False, drone_name)
+        return await self._each(one)
+
+    async def _each(self, action: Callable[[str], Awaitable[None]]) -> Dict[str, Optional[str]]:
+        results = await asyncio.gather(*(action(name) for name in self.drone_names), return_exceptions=True)
+        return {name: (str(result) if isinstance(result, BaseException) else None)
+                for name, result in zip(self.drone_names, results)}
+
+    async def run(self, tick: Callable[[TickInfo], Awaitable[None]], duration: float, rate_hz: float = 10.0,
+                  late_policy: str = DEGRADE) -> LoopStats:
+        """Await ``tick(info)`` at ``rate_hz`` on absolute deadlines, as ControlLoop does for threads"""
+        return await ControlLoop(rate_hz, late_policy=late_policy).run_async(tick, duration=duration)
+
+async def run_swarm(host: str, port: int, drone_names: Sequence[str], duration: float = 30.0):
+    """Async counterpart of multi_drones_swarm.main: take off, fly formations, land"""
+    client = await AsyncAirSimClient(host, port).connect()
+    swarm = AsyncSwarm(client, drone_names)
+    # The controller only plans here; all RPCs go through the async client
+    controller = SwarmController(None, list(drone_names), acquisition=False)
+    try:
+        print(f"Takeoff: {await swarm.takeoff()}")
+        angular_speed = 0.5
+        stats = await swarm.run(lambda info: swarm.control_tick(controller, angular_speed * info.scheduled,
+                                                                include_lidar=not info.degraded), duration)
+        print(f"Async swarm control loop: {stats.summary()}")
+    finally:
+        print(f"Landing: {await swarm.land()}")
+        await client.close()
+
+if __name__ == "__main__":
+    configure_from_env()
+    asyncio.run(run_swarm("127.0.0.1", 41451, ["Drone1", "Drone2", "Drone3", "Drone4", "Drone5", "Drone6"]))
+    report_timers()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import List
+from async_swarm import AsyncAirSimClient, AsyncSwarm
+from fake_airsim import FakeAirSimServer, FakeMultirotorClient, FakeWorld, LidarConfig
+from swarm_acquisition import SwarmStateFetcher
+
+def make_world(drone_names: List[str], latency: float) -> FakeWorld:
+    """Fake world with one vehicle per name, spaced 3 m apart on a line
+
+    The fake simulates in-process, so LiDAR is kept small to make RPC latency,
+    not ray casting on this host, dominate the measurement.
+    """
+    return FakeWorld(vehicles={name: (3.0 * i, 0.0, -2.0) for i, name in enumerate(drone_names)},
+                     lidar=LidarConfig(points_per_scan=64), latency=latency)
+
+def time_serial(client: FakeMultirotorClient, drone_names: List[str], ticks: int) -> float:
+    """Average tick latency of the old one-drone-at-a-time loop"""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for drone_name in drone_names:
+            client.getMultirotorState(vehicle_name=drone_name)
+            client.getLidarData(lidar_name="Lidar1", vehicle_name=drone_name)
+    return (time.perf_counter() - start) / ticks
+
+def time_concurrent(world: FakeWorld, drone_names: List[str], ticks: int) -> float:
+    """Average tick latency of the concurrent acquisition stage"""
+    fetcher = SwarmStateFetcher(world.client, drone_names)
+    try:
+        fetcher.fetch()  # warm up worker threads and their clients
+        start = time.perf_counter()
+        for _ in range(ticks):
+            fetcher.fetch()
+        return (time.perf_counter() - start) / ticks
+    finally:
+        fetcher.shutdown()
+
+def time_async(world: FakeWorld, drone_names: List[str], ticks: int) -> float:
+    """Average tick latency of the pipelined asyncio runtime against the world served over TCP"""
+    server = FakeAirSimServer(world, port=0, latency=world.latency, workers=2 * len(drone_names))
+    server.start()
+
+    async def run() -> float:
+        client = await AsyncAirSimClient(port=server.server_address[1]).connect()
+        try:
+            swarm = AsyncSwarm(client, drone_names)
+            await swarm.sense()  # warm up
+            start = time.perf_counter()
+            for _ in range(ticks):
+                await swarm.sense()
+            return (time.perf_counter() - start) / ticks
+        finally:
+            await client.close()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def main():
+    latency = 0.005
+    ticks = 20
+    print(f"\nAcquisition tick latency with {latency * 1000:.1f} ms per RPC:")
+    print(f"  {'drones':>6} {'serial (ms)':>12} {'concurrent (ms)':>16} {'async (ms)':>11}")
+    for num_drones in [6, 16, 32, 64]:
+        drone_names = [f"Drone{i + 1}" for i in range(num_drones)]
+        world = make_world(drone_names, latency)
+        serial = time_serial(world.client(), drone_names, ticks)
+        concurrent = time_concurrent(world, drone_names, ticks)
+        pipelined = time_async(world, drone_names, ticks)
+        print(f"  {num_drones:>6} {serial * 1000:>12.1f} {concurrent * 1000:>16.1f} {pipelined * 1000:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import functools
+import os
+import time
+from typing import List
+from fake_airsim import FakeMultirotorClient, FakeWorld
+from parallel_odometry import ParallelSwarmVisualOdometry
+from visual_odometry import VisualOdometry
+
+def drifting_client(drone_names: List[str]) -> FakeMultirotorClient:
+    """Client to a private fake world whose drones drift sideways, so every frame differs
+
+    Module level so it can be pickled into worker processes.
+    """
+    client = FakeWorld(vehicles={name: (3.0 * i, 0.0, -2.0) for i, name in enumerate(drone_names)}).client()
+    for name in drone_names:
+        client.moveByVelocityAsync(1.0, 0.6, 0.0, duration=1e6, vehicle_name=name)
+    return client
+
+def time_serial(drone_names: List[str], seconds: float) -> float:
+    """VO updates per second of the single-threaded SwarmVisualOdometry loop"""
+    client = drifting_client(drone_names)
+    odometry = [VisualOdometry(client, name) for name in drone_names]
+    updates = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for vo in odometry:
+            vo.update()
+        updates += len(odometry)
+    return updates / (time.perf_counter() - start)
+
+def time_parallel(drone_names: List[str], num_workers: int, seconds: float) -> float:
+    """VO updates per second with drones spread over ``num_workers`` processes, run flat out"""
+    swarm_vo = ParallelSwarmVisualOdometry(functools.partial(drifting_client, drone_names), drone_names,
+                                           num_workers=num_workers, rate_hz=1000.0)
+    try:
+        swarm_vo.start()
+        time.sleep(1.0)  # workers connect and process their first frames
+        before = sum(swarm_vo.update_counts().values())
+        time.sleep(seconds)
+        return (sum(swarm_vo.update_counts().values()) - before) / seconds
+    finally:
+        swarm_vo.close()
+
+def main():
+    seconds = 3.0
+    drone_names = [f"Drone{i + 1}" for i in range(6)]
+    cores = os.cpu_count() or 1
+    serial = time_serial(drone_names, seconds)
+    print(f"\nVO throughput for {len(drone_names)} drones on {cores} cores:")
+    print(f"  {'workers':>7} {'updates/s':>10} {'speedup':>8}")
+    print(f"  {'serial':>7} {serial:>10.1f} {1.0:>8.2f}")
+    for num_workers in sorted({1, 2, 3, 6} | {min(cores, len(drone_names))}):
+        rate = time_parallel(drone_names, num_workers, seconds)
+        print(f"  {num_workers:>7} {rate:>10.1f} {rate / serial:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import glob
+import json
+import platform
+import statistics
+import sys
+import time
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fake_airsim import FakeWorld, FakeScene
+from feature_matching import MATCHERS, create_matcher, keypoint_coords
+from collision_avoidance import AvoidanceEngine
+from formations import FormationEngine
+from formation_assignment import assignment_cost, greedy_assignment, solve_assignment
+from image_ingestion import ImageIngestor
+from lidar_processing import extract_obstacles
+from occupancy_map import OccupancyMap
+from swarm_proximity import ProximityEngine
+from swarm_state import SwarmState
+from visual_odometry import VO_MODES, VisualOdometry
+
+# name -> factory returning the zero-argument callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+VO_RESOLUTIONS = [(144, 256), (288, 512), (480, 640)]
+LIDAR_POINT_COUNTS = [1000, 10000, 100000]
+SWARM_SIZES = [3, 6, 50, 100, 500]
+TICK_SWARM_SIZES = [6, 32]
+
+def benchmark(name: str):
+    """Decorator registering a benchmark setup function under ``name``"""
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+def measure(fn: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> Dict[str, float]:
+    """Time ``fn`` in batches sized to run at least ``min_time``, return per-call ms"""
+    fn()  # warm up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {"median_ms": statistics.median(samples) * 1000,
+            "min_ms": min(samples) * 1000,
+            "calls": number * repeat}
+
+# ----------------------------------------------------------------- frames
+
+_recorded_frames: List[np.ndarray] = []
+
+def frame_pair(height: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Two consecutive grayscale frames, recorded if --frames was given, else synthetic"""
+    if len(_recorded_frames) >= 2:
+        return tuple(cv2.resize(f, (width, height)) for f in _recorded_frames[:2])
+    world = FakeWorld(image_size=(height, width), realtime=False)
+    first = cv2.cvtColor(world.camera_frame("Drone1", height, width), cv2.COLOR_BGR2GRAY)
+    world.vehicles["Drone1"].position += (0.4, 0.25, 0.0)
+    second = cv2.cvtColor(world.camera_frame("Drone1", height, width), cv2.COLOR_BGR2GRAY)
+    return first, second
+
+def frame_sequence(height: int, width: int, count: int = 60) -> List[np.ndarray]:
+    """A grayscale sequence, recorded if --frames was given, else a synthetic fly-over"""
+    if len(_recorded_frames) >= 2:
+        return [cv2.resize(f, (width, height)) for f in _recorded_frames]
+    world = FakeWorld(image_size=(height, width), realtime=False)
+    frames = []
+    for _ in range(count):
+        frames.append(cv2.cvtColor(world.camera_frame("Drone1", height, width), cv2.COLOR_BGR2GRAY))
+        world.vehicles["Drone1"].position += (0.1, 0.06, 0.0)
+    return frames
+
+def _vo_setup(height: int, width: int, matcher: str = "bf"):
+    vo = VisualOdometry(FakeWorld(realtime=False).client(), "Drone1", matcher=matcher)
+    first, second = frame_pair(height, width)
+    kp1, desc1 = vo.detect_features(first)
+    kp2, desc2 = vo.detect_features(second)
+    pts1, pts2 = keypoint_coords(kp1), keypoint_coords(kp2)
+    # Give the prior-based matcher the motion it would have learnt from the previous pair
+    src, dst = create_matcher("bf").match(pts1, desc1, pts2, desc2)
+    vo.pixel_motion = np.median(dst - src, axis=0) if len(src) else None
+    return vo, first, second, pts1, desc1, pts2, desc2
+
+def _register_vo(height: int, width: int):
+    label = f"{width}x{height}"
+
+    @benchmark(f"vo/detect/{label}")
+    def detect():
+        vo, first, *_ = _vo_setup(height, width)
+        return lambda: vo.detect_features(first)
+
+    for matcher in MATCHERS:
+        @benchmark(f"vo/match_{matcher}/{label}")
+        def match(matcher=matcher):
+            vo, _, _, pts1, desc1, pts2, desc2 = _vo_setup(height, width, matcher)
+            return lambda: vo.match_features(pts1, desc1, pts2, desc2)
+
+    @benchmark(f"vo/pose/{label}")
+    def pose():
+        vo, _, _, pts1, desc1, pts2, desc2 = _vo_setup(height, width)
+        src, dst = vo.match_features(pts1, desc1, pts2, desc2)
+        return lambda: vo.estimate_motion(src, dst)
+
+    for mode in VO_MODES:
+        @benchmark(f"vo/frame_{mode}/{label}")
+        def frame(mode=mode):
+            # Full per-frame update over a looping sequence; the image fetch is left out
+            frames = frame_sequence(height, width)
+            vo = VisualOdometry(FakeWorld(realtime=False).client(), "Drone1", mode=mode)
+            cursor = iter(())
+
+            def next_frame():
+                nonlocal cursor
+                image = next(cursor, None)
+                if image is None:
+                    cursor = iter(frames)
+                    vo.prev_image = None  # the loop wraps around, start a fresh track
+                    image = next(cursor)
+                return image
+            vo.get_camera_image = next_frame
+            return vo.update
+
+    for compress in (False, True):
+        @benchmark(f"image/ingest_{'png' if compress else 'raw'}/{label}")
+        def ingest(compress=compress):
+            world = FakeWorld(image_size=(height, width), realtime=False)
+            ingestor = ImageIngestor(world.client(), ["Drone1"], compress=compress)
+            return ingestor.fetch
+
+for _height, _width in VO_RESOLUTIONS:
+    _register_vo(_height, _width)
+
+# ------------------------------------------------------------------ LiDAR
+
+def _register_lidar(count: int):
+    @benchmark(f"lidar/obstacles/{count}")
+    def obstacles():
+        rng = np.random.default_rng(0)
+        point_cloud = rng.uniform(-10, 10, count * 3).tolist()  # the RPC hands over a list
+        return lambda: extract_obstacles(point_cloud, max_range=3.0)
+
+    @benchmark(f"lidar/occupancy_insert/{count}")
+    def occupancy_insert():
+        rng = np.random.default_rng(0)
+        points = rng.uniform(-20, 20, (count, 3)).astype(np.float32)
+        occupancy = OccupancyMap()
+        clock = iter(range(10 ** 9))
+        return lambda: occupancy.insert(points, timestamp=next(clock) * 0.1)
+
+for _count in LIDAR_POINT_COUNTS:
+    _register_lidar(_count)
+
+@benchmark("lidar/occupancy_segments/100")
+def occupancy_segments():
+    rng = np.random.default_rng(0)
+    occupancy = OccupancyMap()
+    occupancy.insert(rng.uniform(-20, 20, (10000, 3)), timestamp=0.0)
+    starts = rng.uniform(-10, 10, (100, 3))
+    ends = starts + rng.normal(0, 2.0, (100, 3))
+    return lambda: occupancy.segment_free(starts, ends, timestamp=0.0)
+
+# ------------------------------------------------------------------ swarm
+
+def _register_swarm(size: int):
+    @benchmark(f"swarm/formation/{size}")
+    def formation():
+        engine = FormationEngine(size, radius=5.0)
+        return lambda: engine.compute("spiral", (0.0, 0.0, -3.0), 1.3)
+
+    @benchmark(f"swarm/collision/{size}")
+    def collision():
+        rng = np.random.default_rng(0)
+        spread = 3.0 * size ** (1 / 3)
+        positions = rng.uniform(-spread, spread, (size, 3))
+        targets = positions + rng.normal(0, 1.0, (size, 3))
+        engine = ProximityEngine(safety_distance=2.0)
+        return lambda: engine.check(targets, positions)
+
+    @benchmark(f"swarm/assignment/{size}")
+    def assignment():
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(-10, 10, (size, 3))
+        slots = FormationEngine(size, radius=5.0).compute("diamond", (0.0, 0.0, -3.0), 0.7)
+        return lambda: solve_assignment(assignment_cost(positions, slots))
+
+    @benchmark(f"swarm/assignment_greedy/{size}")
+    def assignment_greedy():
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(-10, 10, (size, 3))
+        slots = FormationEngine(size, radius=5.0).compute("diamond", (0.0, 0.0, -3.0), 0.7)
+        return lambda: greedy_assignment(assignment_cost(positions, slots))
+
+    @benchmark(f"swarm/avoidance/{size}")
+    def avoidance():
+        rng = np.random.default_rng(0)
+        spread = 3.0 * size ** (1 / 3)
+        positions = rng.uniform(-spread, spread, (size, 3))
+        velocities = rng.normal(0, 1.0, (size, 3))
+        targets = positions + rng.normal(0, 1.0, (size, 3))
+        engine = AvoidanceEngine(safety_distance=2.0)
+        return lambda: engine.adjust(targets, positions, velocities)
+
+    @benchmark(f"swarm/state_center/{size}")
+    def state_center():
+        rng = np.random.default_rng(0)
+        state = SwarmState([f"Drone{i + 1}" for i in range(size)])
+        for slot, position in enumerate(rng.uniform(-10, 10, (size, 3)).tolist()):
+            state.update(slot, position, (0.0, 0.0, 0.0))
+        return state.center
+
+for _size in SWARM_SIZES:
+    _register_swarm(_size)
+
+def _register_tick(size: int):
+    @benchmark(f"swarm/control_tick/{size}")
+    def control_tick():
+        from multi_drones_swarm import SwarmController
+        names = [f"Drone{i + 1}" for i in range(size)]
+        world = FakeWorld(vehicles={name: (3.0 * (i % 8), 3.0 * (i // 8), -2.0) for i, name in enumerate(names)},
+                          scene=FakeScene.random(10), realtime=False)
+        swarm = SwarmController(world.client(), names, client_factory=world.client)
+        swarm.update_drone_states()
+        return lambda: swarm.control_tick(0.5)
+
+for _size in TICK_SWARM_SIZES:
+    _register_tick(_size)
+
+# --------------------------------------------------------------- reporting
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[Tuple[str, float, float]]:
+    """Benchmarks whose median is more than ``threshold`` (fraction) slower than the baseline"""
+    regressions = []
+    for name, row in results.items():
+        reference = baseline.get(name)
+        if reference and row["median_ms"] > reference["median_ms"] * (1 + threshold):
+            regressions.append((name, reference["median_ms"], row["median_ms"]))
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the swarm and VO pipelines")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--baseline", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown vs. baseline as a fraction (0.2 = 20%%)")
+    parser.add_argument("--frames", help="Glob of recorded frames to use instead of synthetic ones")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend per benchmark")
+    args = parser.parse_args(argv)
+
+    if args.frames:
+        _recorded_frames.extend(cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in sorted(glob.glob(args.frames)))
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(setup(), min_time=args.min_time)
+        print(f"  {name:<32} {results[name]['median_ms']:>10.4f} ms")
+
+    with open(args.output, "w") as f:
+        json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                   "opencv": cv2.__version__, "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"  REGRESSION {name}: {before:.4f} ms -> {after:.4f} ms")
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
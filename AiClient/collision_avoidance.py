@@ -0,0 +1,134 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from swarm_proximity import grid_candidate_pairs
+
+def nearest_pairs(queries: np.ndarray, points: np.ndarray, radius: float, k: int,
+                  query_ids: Optional[np.ndarray] = None, point_ids: Optional[np.ndarray] = None,
+                  dense_limit: int = 64) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(query, point, distance) for the up to ``k`` nearest points within ``radius`` of each query
+
+    Small inputs use a dense distance matrix, larger ones the uniform grid of
+    ``grid_candidate_pairs``, so the cost grows with the number of neighbours rather
+    than the square of the swarm size. With ``query_ids`` and ``point_ids`` (the drone
+    each row belongs to), a query is never paired with its own drone's points.
+    """
+    if len(queries) == 0 or len(points) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    if len(queries) <= dense_limit and len(points) <= dense_limit:
+        query, other = np.divmod(np.arange(len(queries) * len(points)), len(points))
+    else:
+        # NaN rows (drones without state) cannot be hashed into the grid; leave them out
+        query_rows = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        point_rows = np.flatnonzero(np.isfinite(points).all(axis=1))
+        query, other = grid_candidate_pairs(queries[query_rows], points[point_rows], radius)
+        query, other = query_rows[query], point_rows[other]
+    if query_ids is not None:
+        keep = query_ids[query] != point_ids[other]
+        query, other = query[keep], other[keep]
+    diff = queries[query] - points[other]
+    distance = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+    close = distance < radius  # NaN rows (drones without state) drop out here
+    query, other, distance = query[close], other[close], distance[close]
+
+    # Keep the k closest per query: sort by (query, distance) and rank within each run
+    order = np.lexsort((distance, query))
+    query, other, distance = query[order], other[order], distance[order]
+    run_start = np.searchsorted(query, query, side='left')
+    keep = np.arange(len(query)) - run_start < k
+    return query[keep], other[keep], distance[keep]
+
+@dataclass
+class AvoidanceResult:
+    targets: np.ndarray  # (N,3) adjusted targets
+    adjusted: np.ndarray  # (N,) bool, True where the target was moved
+    shift: np.ndarray     # (N,) distance each target was moved
+
+class AvoidanceEngine:
+    """Moves formation targets just far enough to keep the swarm separated
+
+    A potential-field style relaxation run for all drones at once. Each target is pushed
+    out of the ``safety_distance`` sphere around the other drones' current positions and
+    their positions ``horizon`` seconds ahead at the current velocity; two targets that
+    are too close each move half of the way apart (reciprocal avoidance), and targets
+    within ``obstacle_distance`` of an obstacle point are pushed away from it. Only the
+    ``neighbours`` closest constraints of each drone are used, so a tick costs
+    O(N * neighbours), and after the first pass only the targets that moved are
+    checked again. A ``margin`` beyond the minimum distance keeps the adjusted
+    targets clear of ProximityEngine's check.
+    """
+    def __init__(self, safety_distance: float, obstacle_distance: float = 1.0, horizon: float = 0.5,
+                 neighbours: int = 8, iterations: int = 4, margin: float = 0.05, dense_limit: int = 64):
+        self.safety_distance = safety_distance
+        self.obstacle_distance = obstacle_distance
+        self.horizon = horizon
+        self.neighbours = neighbours
+        self.iterations = iterations
+        self.margin = margin
+        self.dense_limit = dense_limit
+
+    def _push(self, push: np.ndarray, weight: np.ndarray, queries: np.ndarray, query_ids: np.ndarray,
+              points: np.ndarray, point_ids: Optional[np.ndarray], minimum: float, share: np.ndarray):
+        """Accumulate the pushes moving each query target out of ``minimum`` of its nearest ``points``"""
+        query, other, distance = nearest_pairs(queries, points, minimum, self.neighbours,
+                                               query_ids if point_ids is not None else None, point_ids,
+                                               self.dense_limit)
+        if not len(query):
+            return
+        direction = queries[query] - points[other]
+        # Coincident pairs get a fixed sideways direction that differs between the two drones
+        degenerate = distance < 1e-6
+        if degenerate.any():
+            owner = point_ids[other[degenerate]] if point_ids is not None else other[degenerate]
+            angle = (query_ids[query[degenerate]] - owner) * 2.399963  # golden angle
+            direction[degenerate] = np.stack([np.cos(angle), np.sin(angle), np.zeros_like(angle)], axis=1)
+            distance = np.where(degenerate, 1.0, distance)
+        depth = share[other] * (minimum * (1 + self.margin) - np.where(degenerate, 0.0, distance))
+        step = direction * (depth / distance)[:, None]
+        for axis in range(3):
+            push[:, axis] += np.bincount(query, weights=step[:, axis], minlength=len(queries))
+        weight += np.bincount(query, minlength=len(queries))
+
+    def adjust(self, targets: np.ndarray, positions: np.ndarray, velocities: Optional[np.ndarray] = None,
+               obstacles: Optional[np.ndarray] = None) -> AvoidanceResult:
+        """Adjust (N,3) targets given current (N,3) positions, velocities and (M,3) world-frame obstacle points
+
+        Row i of every array belongs to the same drone; NaN positions (drones without
+        state) are ignored as neighbours and their targets are left alone.
+        """
+        original = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        count = len(original)
+        adjusted = original.copy()
+        # Drone constraints: current positions, predicted positions (both kept clear of
+        # entirely) and the other targets (each side of a pair moves half the way)
+        fixed = [positions]
+        if velocities is not None and self.horizon > 0:
+            fixed.append(positions + self.horizon * np.nan_to_num(np.asarray(velocities, dtype=np.float64)))
+        share = np.concatenate([np.ones(count * len(fixed)), np.full(count, 0.5)])
+        owners = np.tile(np.arange(count), len(fixed) + 1)
+        if obstacles is not None:
+            obstacles = np.asarray(obstacles, dtype=np.float64).reshape(-1, 3)
+            obstacles = obstacles[np.isfinite(obstacles).all(axis=1)]
+        obstacle_share = np.ones(len(obstacles)) if obstacles is not None else None
+
+        active = np.isfinite(positions).all(axis=1) & np.isfinite(adjusted).all(axis=1)
+        rows = np.flatnonzero(active)
+        for _ in range(self.iterations):
+            if not len(rows):
+                break
+            queries = adjusted[rows]
+            push = np.zeros_like(queries)
+            weight = np.zeros(len(rows))
+            points = np.concatenate(fixed + [np.where(active[:, None], adjusted, np.nan)])
+            self._push(push, weight, queries, rows, points, owners, self.safety_distance, share)
+            if obstacles is not None and len(obstacles):
+                self._push(push, weight, queries, rows, obstacles, None, self.obstacle_distance, obstacle_share)
+            moving = weight > 0
+            # Average the pushes of a drone's constraints so opposite neighbours do not overshoot
+            adjusted[rows[moving]] += push[moving] / np.sqrt(weight[moving])[:, None]
+            rows = rows[moving]
+
+        shift = np.sqrt(np.einsum('ij,ij->i', adjusted - original, adjusted - original))
+        return AvoidanceResult(targets=adjusted, adjusted=shift > 1e-9, shift=shift)
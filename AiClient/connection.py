@@ -0,0 +1,241 @@
+import airsim
+import logging
+import msgpackrpc
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from instrumentation import get_logger, log_event
+
+logger = get_logger("connection")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 41451
+
+# Errors meaning the connection (not the request) failed; anything else is passed through
+CONNECTION_ERRORS = (msgpackrpc.error.TransportError, msgpackrpc.error.TimeoutError, OSError)
+
+# Bumped whenever a client finds the simulator at an endpoint gone, so every other
+# client of it reconnects on its next call instead of waiting out its own timeout
+_endpoint_epochs: Dict[Tuple[str, int], int] = {}
+_epochs_lock = threading.Lock()
+
+def _endpoint_epoch(endpoint: Tuple[str, int], bump: bool = False) -> int:
+    with _epochs_lock:
+        if bump:
+            _endpoint_epochs[endpoint] = _endpoint_epochs.get(endpoint, 0) + 1
+        return _endpoint_epochs.get(endpoint, 0)
+
+def backoff_delays(initial: float = 0.1, maximum: float = 5.0, factor: float = 2.0,
+                   jitter: float = 0.5) -> Iterator[float]:
+    """Endless exponential backoff; each delay is randomly shortened by up to ``jitter`` of itself
+
+    The randomness keeps many clients that lost the simulator together from
+    reconnecting in lockstep.
+    """
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * random.random())
+        delay = min(delay * factor, maximum)
+
+def probe(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 0.2) -> bool:
+    """True if something accepts TCP connections at host:port"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_until_ready(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 1.0,
+                     interval: float = 0.05) -> bool:
+    """Probe the RPC port every ``interval`` seconds until it accepts connections or ``timeout`` passes"""
+    deadline = time.monotonic() + timeout
+    while True:
+        if probe(host, port, timeout=min(0.2, max(timeout, 0.01))):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+
+def connect(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 60.0,
+            rpc_timeout: float = 3600, factory: Optional[Callable[[], airsim.MultirotorClient]] = None,
+            verbose: bool = True) -> airsim.MultirotorClient:
+    """Connect to AirSim, waiting up to ``timeout`` seconds for the simulator to come up
+
+    Between attempts the port is probed every 50 ms, so a simulator that starts is
+    picked up at once rather than after the backoff delay. ``factory`` replaces the
+    default client (e.g. a FakeWorld's), in which case no port is probed. Raises
+    ConnectionError when the simulator stays unreachable.
+    """
+    probe_port = factory is None
+    factory = factory or (lambda: airsim.MultirotorClient(ip=host, port=port, timeout_value=rpc_timeout))
+    deadline = time.monotonic() + timeout
+    last_error = None
+    if verbose:
+        print(f"Connecting to AirSim at {host}:{port}...")
+    for attempt, delay in enumerate(backoff_delays(), start=1):
+        if not probe_port or probe(host, port):
+            try:
+                client = factory()
+                client.ping()
+                if verbose:
+                    print(f"Connected to AirSim after {attempt} attempt(s)")
+                return client
+            except CONNECTION_ERRORS as e:
+                last_error = e
+                log_event(logger, logging.DEBUG, "connect_failed", attempt=attempt, error=str(e))
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if probe_port:
+            wait_until_ready(host, port, timeout=min(delay, remaining))
+        else:
+            time.sleep(min(delay, remaining))
+    raise ConnectionError(f"AirSim at {host}:{port} not reachable after {timeout:.0f}s"
+                          + (f": {last_error}" if last_error else ""))
+
+class ResilientClient:
+    """MultirotorClient stand-in that reconnects and retries when the connection drops
+
+    msgpack-rpc only notices a dead connection when a request times out, so plain
+    calls (state, sensors, settings) use their own connection with a short
+    ``rpc_timeout``; *Async commands, whose futures may be joined for minutes, use a
+    second one with ``command_timeout``. A call that fails with a connection error
+    rebuilds both with ``connect`` and is retried up to ``retries`` times; errors the
+    simulator itself returns are raised as usual. Only the first connection waits up to
+    ``connect_timeout`` for the simulator to come up; rebuilt ones give up after
+    ``reconnect_timeout``, so a failing call returns within about
+    ``retries * reconnect_timeout`` rather than stalling the caller for minutes. For *Async calls only sending is
+    retried: a future belongs to the connection that issued it. Once one client has
+    reconnected, the others of the same endpoint follow on their next call.
+    """
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, retries: int = 2,
+                 connect_timeout: float = 30.0, rpc_timeout: float = 10.0, command_timeout: float = 3600,
+                 factory: Optional[Callable[[], airsim.MultirotorClient]] = None, reconnect_timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.retries = retries
+        self.connect_timeout = connect_timeout
+        self.reconnect_timeout = reconnect_timeout
+        self.rpc_timeout = rpc_timeout
+        self.command_timeout = command_timeout
+        self.factory = factory
+        self.reconnects = 0
+        self._connected = False
+        self._client: Optional[airsim.MultirotorClient] = None
+        self._command_client: Optional[airsim.MultirotorClient] = None
+        self._epoch = _endpoint_epoch((host, port))
+
+    def _connect(self, rpc_timeout: float) -> airsim.MultirotorClient:
+        timeout = self.reconnect_timeout if self._connected else self.connect_timeout
+        client = connect(self.host, self.port, timeout, rpc_timeout, self.factory, verbose=False)
+        self._connected = True
+        return client
+
+    @property
+    def client(self) -> airsim.MultirotorClient:
+        """Connection for plain calls"""
+        if self._client is None:
+            self._client = self._connect(self.rpc_timeout)
+        return self._client
+
+    @property
+    def command_client(self) -> airsim.MultirotorClient:
+        """Connection for *Async commands"""
+        if self._command_client is None:
+            self._command_client = self._connect(self.command_timeout)
+        return self._command_client
+
+    def _close(self):
+        for old in (self._client, self._command_client):
+            if old is not None and hasattr(old, "client"):
+                try:
+                    old.client.close()
+                except Exception:
+                    pass
+        self._client = self._command_client = None
+
+    def _follow_epoch(self):
+        """Drop connections opened before another client of this endpoint had to reconnect"""
+        epoch = _endpoint_epoch((self.host, self.port))
+        if epoch != self._epoch:
+            self._close()
+            self._epoch = epoch
+
+    def reconnect(self):
+        """Drop both connections and have the endpoint's other clients do the same; the next call opens new ones"""
+        self._close()
+        self._epoch = _endpoint_epoch((self.host, self.port), bump=True)
+        self.reconnects += 1
+        log_event(logger, logging.WARNING, "reconnect", host=self.host, port=self.port, count=self.reconnects)
+
+    def check_health(self) -> bool:
+        """Ping the simulator, reconnecting if it does not answer; returns whether the connection was fine"""
+        try:
+            if (self.factory is not None or probe(self.host, self.port)) and self.client.ping():
+                return True
+        except CONNECTION_ERRORS:
+            pass
+        self.reconnect()
+        return False
+
+    def __getattr__(self, name: str):
+        command = name.endswith("Async")
+        self._follow_epoch()
+        attribute = getattr(self.command_client if command else self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            for attempt in range(self.retries + 1):
+                self._follow_epoch()
+                try:
+                    return getattr(self.command_client if command else self.client, name)(*args, **kwargs)
+                except CONNECTION_ERRORS as e:
+                    if attempt == self.retries:
+                        raise
+                    log_event(logger, logging.WARNING, "rpc_retry", method=name, attempt=attempt + 1, error=str(e))
+                    self.reconnect()
+        call.__name__ = name
+        return call
+
+class ClientPool:
+    """One client per thread, built on first use from ``factory``
+
+    msgpack-rpc clients must not be shared between threads; pass ``pool.get`` where a
+    client factory is expected, or call it from worker code directly.
+    """
+    def __init__(self, factory: Optional[Callable[[], airsim.MultirotorClient]] = None):
+        self.factory = factory or ResilientClient
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.clients: List[airsim.MultirotorClient] = []
+
+    def get(self) -> airsim.MultirotorClient:
+        """Return the calling thread's client"""
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self.factory()
+            self._local.client = client
+            with self._lock:
+                self.clients.append(client)
+        return client
+
+    def discard(self):
+        """Forget the calling thread's client, e.g. after it failed; the next get() builds a new one"""
+        client = getattr(self._local, "client", None)
+        if client is not None:
+            self._local.client = None
+            with self._lock:
+                self.clients.remove(client)
+
+# Example usage:
+if __name__ == "__main__":
+    client = ResilientClient()
+    print(f"Vehicles: {client.listVehicles()}")
+    while True:
+        healthy = client.check_health()
+        print("healthy" if healthy else f"reconnected ({client.reconnects} so far)")
+        time.sleep(2)
@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+SKIP = "skip"          # drop the missed periods and realign to the next deadline
+CATCH_UP = "catch_up"  # run missed ticks back to back until the schedule is met again
+DEGRADE = "degrade"    # like skip, but run the next tick without its optional stages
+LATE_POLICIES = (SKIP, CATCH_UP, DEGRADE)
+
+@dataclass
+class TickInfo:
+    index: int         # tick counter since the loop started
+    scheduled: float   # seconds since start at which this tick was due
+    elapsed: float     # seconds since start at which it actually started
+    degraded: bool     # optional stages (e.g. LiDAR) should be skipped this tick
+
+class SampleStats:
+    """Count, mean and max of every sample added
+
+    Memory stays constant however long the loop runs.
+    """
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f"SampleStats(count={self.count}, mean={self.mean:.6f}, max={self.max:.6f})"
+
+@dataclass
+class LoopStats:
+    period: float
+    ticks: int = 0
+    overruns: int = 0
+    skipped: int = 0
+    degraded: int = 0
+    jitter: SampleStats = field(default_factory=SampleStats)     # seconds each tick started late
+    durations: SampleStats = field(default_factory=SampleStats)  # seconds each tick took
+
+    def summary(self) -> str:
+        """One-line human readable summary of the loop timing"""
+        if not self.ticks:
+            return "no ticks run"
+        return (f"{self.ticks} ticks at {1 / self.period:.1f} Hz, {self.overruns} overruns, "
+                f"{self.skipped} skipped, {self.degraded} degraded, "
+                f"jitter mean={self.jitter.mean * 1000:.2f}ms max={self.jitter.max * 1000:.2f}ms, "
+                f"tick mean={self.durations.mean * 1000:.2f}ms max={self.durations.max * 1000:.2f}ms")
+
+class ControlLoop:
+    """Fixed-rate loop that sleeps until absolute deadlines instead of for fixed intervals
+
+    Deadlines are start + k * period, so time spent inside the tick never shifts the
+    schedule. A tick that runs past its successor's deadline is an overrun and is
+    handled according to ``late_policy``.
+    """
+    def __init__(self, rate_hz: float, late_policy: str = SKIP, max_catch_up: int = 5,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"Unknown late policy {late_policy!r}, expected one of {LATE_POLICIES}")
+        self.period = 1.0 / rate_hz
+        self.late_policy = late_policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = LoopStats(period=self.period)
+
+    def run(self, tick: Callable[[TickInfo], None], duration: Optional[float] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> LoopStats:
+        """Call ``tick`` once per period until ``duration`` elapses or ``should_stop`` returns True"""
+        self._begin()
+        while True:
+            info = self._next_tick(duration, should_stop)
+            if info is None:
+                return self.stats
+            tick(info)
+            remaining = self._finish_tick()
+            if remaining > 0:
+                self.sleep(remaining)
+
+    async def run_async(self, tick: Callable[[TickInfo], Awaitable[None]], duration: Optional[float] = None,
+                        should_stop: Optional[Callable[[], bool]] = None) -> LoopStats:
+        """``run`` for a coroutine ``tick``, waiting with asyncio.sleep instead of ``sleep``"""
+        self._begin()
+        while True:
+            info = self._next_tick(duration, should_stop)
+            if info is None:
+                return self.stats
+            await tick(info)
+            remaining = self._finish_tick()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+
+    def _begin(self):
+        self.stats = LoopStats(period=self.period)
+        self._start = self.clock()
+        self._deadline = self._start
+        self._index = 0
+        self._degraded = False
+
+    def _next_tick(self, duration: Optional[float], should_stop: Optional[Callable[[], bool]]) -> Optional[TickInfo]:
+        """Info for the tick due now, or None when the loop should end"""
+        now = self.clock()
+        if duration is not None and now - self._start >= duration:
+            return None
+        if should_stop is not None and should_stop():
+            return None
+        self._tick_start = now
+        self.stats.jitter.add(max(0.0, now - self._deadline))
+        if self._degraded:
+            self.stats.degraded += 1
+        return TickInfo(index=self._index, scheduled=self._deadline - self._start, elapsed=now - self._start,
+                        degraded=self._degraded)
+
+    def _finish_tick(self) -> float:
+        """Account for the tick that just ran and move the deadline on; returns seconds to wait"""
+        finished = self.clock()
+        self.stats.ticks += 1
+        self.stats.durations.add(finished - self._tick_start)
+        self._index += 1
+
+        self._deadline += self.period
+        self._degraded = False
+        if finished > self._deadline:
+            self.stats.overruns += 1
+            behind = math.ceil((finished - self._deadline) / self.period)
+            if self.late_policy == CATCH_UP and behind <= self.max_catch_up:
+                # Keep the missed deadlines and run them immediately
+                return 0.0
+            # Drop the missed periods and realign to the schedule
+            self._deadline += behind * self.period
+            self.stats.skipped += behind
+            self._degraded = self.late_policy == DEGRADE
+        return self._deadline - self.clock()
@@ -0,0 +1,661 @@
+import airsim
+import argparse
+import json
+import socket
+import socketserver
+import threading
+import time
+import msgpack
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import cv2
+except ImportError:  # PNG transfer needs OpenCV, raw frames do not
+    cv2 = None
+
+Vec3 = Tuple[float, float, float]
+
+@dataclass
+class FakeScene:
+    """Static obstacles seen by the synthetic LiDAR (NED frame, ground at ground_z)"""
+    spheres: List[Tuple[Vec3, float]] = field(default_factory=list)
+    boxes: List[Tuple[Vec3, Vec3]] = field(default_factory=list)
+    ground_z: float = 0.0
+
+    @staticmethod
+    def random(num_obstacles: int = 20, extent: float = 30.0, seed: int = 0) -> "FakeScene":
+        """Scatter spheres and pillars over an extent x extent area"""
+        rng = np.random.default_rng(seed)
+        scene = FakeScene()
+        for i in range(num_obstacles):
+            x, y = rng.uniform(-extent / 2, extent / 2, 2)
+            if i % 2 == 0:
+                scene.spheres.append(((float(x), float(y), float(rng.uniform(-6, -1))), float(rng.uniform(0.5, 1.5))))
+            else:
+                half = float(rng.uniform(0.3, 1.0))
+                scene.boxes.append(((float(x) - half, float(y) - half, -float(rng.uniform(3, 8))),
+                                    (float(x) + half, float(y) + half, 0.0)))
+        return scene
+
+@dataclass
+class LidarConfig:
+    channels: int = 16
+    points_per_scan: int = 1000
+    range: float = 10.0
+    vertical_fov: float = 30.0
+
+class _Vehicle:
+    """Kinematic point-mass vehicle driven by position, path or velocity commands"""
+    def __init__(self, name: str, home: Vec3):
+        self.name = name
+        self.home = np.array(home, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.position = self.home.copy()
+        self.velocity = np.zeros(3)
+        self.api_control = False
+        self.armed = False
+        self.landed = True
+        self.waypoints: List[np.ndarray] = []
+        self.speed = 0.0
+        self.command_velocity = np.zeros(3)
+        self.velocity_until = 0.0
+        self.command_id = 0
+
+    def command_path(self, waypoints: Sequence[Sequence[float]], speed: float):
+        self.waypoints = [np.array(w, dtype=np.float64) for w in waypoints]
+        self.speed = max(float(speed), 1e-3)
+        self.velocity_until = 0.0
+        self.command_id += 1
+        return self.command_id
+
+    def command_velocity_for(self, velocity: Sequence[float], until: float):
+        self.waypoints = []
+        self.command_velocity = np.array(velocity, dtype=np.float64)
+        self.velocity_until = until
+        self.command_id += 1
+        return self.command_id
+
+    def busy(self, sim_time: float) -> bool:
+        return bool(self.waypoints) or sim_time < self.velocity_until
+
+    def integrate(self, start: float, dt: float):
+        """Advance the vehicle by dt seconds of sim time starting at ``start``"""
+        if dt <= 0:
+            return
+        before = self.position.copy()
+        if self.waypoints:
+            budget = self.speed * dt
+            while self.waypoints and budget > 0:
+                delta = self.waypoints[0] - self.position
+                distance = float(np.linalg.norm(delta))
+                if distance <= budget:
+                    self.position = self.waypoints.pop(0)
+                    budget -= distance
+                else:
+                    self.position = self.position + delta * (budget / distance)
+                    budget = 0.0
+        elif start < self.velocity_until:
+            active = min(dt, self.velocity_until - start)
+            self.position = self.position + self.command_velocity * active
+        self.position[2] = min(self.position[2], self.home[2])  # cannot sink below its spawn point
+        self.velocity = (self.position - before) / dt
+        self.landed = self.position[2] >= self.home[2] - 0.05 and not self.busy(start + dt)
+
+class FakeWorld:
+    """Shared simulated world behind any number of FakeMultirotorClient connections
+
+    With ``realtime=True`` sim time follows the wall clock scaled by ``clock_speed``
+    (like AirSim's ClockSpeed setting); otherwise it only moves through advance()
+    or simContinueForTime.
+    """
+    def __init__(self, vehicles: Optional[Dict[str, Vec3]] = None, scene: Optional[FakeScene] = None,
+                 lidar: Optional[LidarConfig] = None, image_size: Tuple[int, int] = (144, 256),
+                 latency: float = 0.0, clock_speed: float = 1.0, realtime: bool = True, seed: int = 0):
+        vehicles = vehicles if vehicles is not None else {"Drone1": (0.0, 0.0, 0.0)}
+        self.vehicles = {name: _Vehicle(name, home) for name, home in vehicles.items()}
+        self.scene = scene if scene is not None else FakeScene()
+        self.lidar = lidar or LidarConfig()
+        self.image_size = image_size
+        self.latency = latency
+        self.clock_speed = clock_speed
+        self.realtime = realtime
+        self.sim_time = 0.0
+        self.paused = False
+        self._last_wall = time.monotonic()
+        self._lock = threading.RLock()
+        self._rng = np.random.default_rng(seed)
+        self._texture = self._make_texture(image_size, self._rng)
+        self._lidar_directions = self._make_lidar_directions(self.lidar)
+
+    @staticmethod
+    def from_settings(path: str, **kwargs) -> "FakeWorld":
+        """Build a world with the vehicles declared in an AirSim settings.json"""
+        with open(path) as f:
+            settings = json.load(f)
+        vehicles = {name: (float(cfg.get("X", 0)), float(cfg.get("Y", 0)), float(cfg.get("Z", 0)))
+                    for name, cfg in settings.get("Vehicles", {}).items()}
+        kwargs.setdefault("clock_speed", float(settings.get("ClockSpeed", 1.0)))
+        return FakeWorld(vehicles=vehicles, **kwargs)
+
+    def client(self, latency: Optional[float] = None) -> "FakeMultirotorClient":
+        """New in-process connection to this world"""
+        return FakeMultirotorClient(self, latency=latency)
+
+    # ------------------------------------------------------------------ time
+    def _sync(self):
+        """Bring sim time up to date with the wall clock (caller holds the lock)"""
+        now = time.monotonic()
+        if self.realtime and not self.paused:
+            self._integrate((now - self._last_wall) * self.clock_speed)
+        self._last_wall = now
+
+    def _integrate(self, dt: float):
+        for vehicle in self.vehicles.values():
+            vehicle.integrate(self.sim_time, dt)
+        self.sim_time += dt
+
+    def advance(self, dt: float):
+        """Advance sim time by dt seconds regardless of the wall clock"""
+        with self._lock:
+            self._sync()
+            self._integrate(dt)
+
+    def set_paused(self, paused: bool):
+        with self._lock:
+            self._sync()
+            self.paused = paused
+
+    def continue_for(self, seconds: float):
+        """simContinueForTime: run ``seconds`` of sim time, then stay paused"""
+        with self._lock:
+            self._sync()
+            self._integrate(seconds)
+            self.paused = True
+
+    # ------------------------------------------------------------- vehicles
+    def vehicle(self, name: str) -> _Vehicle:
+        if name == "" and len(self.vehicles) >= 1:
+            return next(iter(self.vehicles.values()))
+        if name not in self.vehicles:
+            raise KeyError(f"Vehicle {name!r} does not exist")
+        return self.vehicles[name]
+
+    def command(self, vehicle_name: str, method: str, *args) -> Tuple[_Vehicle, int]:
+        with self._lock:
+            self._sync()
+            vehicle = self.vehicle(vehicle_name)
+            if method == "path":
+                waypoints, speed = args
+                command_id = vehicle.command_path(waypoints, speed)
+            else:
+                velocity, duration = args
+                command_id = vehicle.command_velocity_for(velocity, self.sim_time + duration)
+            return vehicle, command_id
+
+    def is_done(self, vehicle: _Vehicle, command_id: int) -> bool:
+        with self._lock:
+            self._sync()
+            return vehicle.command_id != command_id or not vehicle.busy(self.sim_time)
+
+    def state(self, vehicle_name: str) -> airsim.MultirotorState:
+        with self._lock:
+            self._sync()
+            vehicle = self.vehicle(vehicle_name)
+            state = airsim.MultirotorState()
+            kinematics = airsim.KinematicsState()
+            kinematics.position = airsim.Vector3r(*vehicle.position.tolist())
+            kinematics.orientation = airsim.Quaternionr()
+            kinematics.linear_velocity = airsim.Vector3r(*vehicle.velocity.tolist())
+            kinematics.angular_velocity = airsim.Vector3r()
+            kinematics.linear_acceleration = airsim.Vector3r()
+            kinematics.angular_acceleration = airsim.Vector3r()
+            state.kinematics_estimated = kinematics
+            state.timestamp = int(self.sim_time * 1e9)
+            state.landed_state = airsim.LandedState.Landed if vehicle.landed else airsim.LandedState.Flying
+            return state
+
+    # ---------------------------------------------------------------- LiDAR
+    @staticmethod
+    def _make_lidar_directions(config: LidarConfig) -> np.ndarray:
+        per_channel = max(config.points_per_scan // config.channels, 1)
+        elevation = np.radians(np.linspace(-config.vertical_fov / 2, config.vertical_fov / 2, config.channels))
+        azimuth = np.linspace(-np.pi, np.pi, per_channel, endpoint=False)
+        el, az = np.meshgrid(elevation, azimuth, indexing="ij")
+        # NED: z points down, so a positive elevation looks up (negative z)
+        directions = np.stack((np.cos(el) * np.cos(az), np.cos(el) * np.sin(az), -np.sin(el)), axis=-1)
+        return directions.reshape(-1, 3)
+
+    def _cast(self, origin: np.ndarray, directions: np.ndarray, obstacles: List[Tuple[Vec3, float]]) -> np.ndarray:
+        """Distance along each ray to the first hit, inf where nothing is hit"""
+        hit = np.full(len(directions), np.inf)
+        if obstacles:
+            centers = np.array([c for c, _ in obstacles])
+            radii = np.array([r for _, r in obstacles])
+            offset = origin - centers                                   # (K,3)
+            b = directions @ offset.T                                   # (M,K)
+            c = np.einsum("ij,ij->i", offset, offset) - radii ** 2      # (K,)
+            disc = b ** 2 - c
+            t = -b - np.sqrt(np.maximum(disc, 0))
+            t = np.where((disc >= 0) & (t > 0), t, np.inf)
+            hit = np.minimum(hit, t.min(axis=1))
+        if self.scene.boxes:
+            lo = np.array([b[0] for b in self.scene.boxes])
+            hi = np.array([b[1] for b in self.scene.boxes])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                inv = 1.0 / directions                                  # (M,3)
+                t1 = (lo[None] - origin) * inv[:, None]                 # (M,K,3)
+                t2 = (hi[None] - origin) * inv[:, None]
+            t_near = np.nanmax(np.minimum(t1, t2), axis=2)
+            t_far = np.nanmin(np.maximum(t1, t2), axis=2)
+            t = np.where((t_near <= t_far) & (t_far > 0), np.maximum(t_near, 0), np.inf)
+            hit = np.minimum(hit, t.min(axis=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_ground = (self.scene.ground_z - origin[2]) / directions[:, 2]
+        hit = np.minimum(hit, np.where(t_ground > 0, t_ground, np.inf))
+        return hit
+
+    def lidar_data(self, vehicle_name: str) -> airsim.LidarData:
+        with self._lock:
+            self._sync()
+            vehicle = self.vehicle(vehicle_name)
+            origin = vehicle.position.copy()
+            # Other vehicles show up as small spheres
+            obstacles = list(self.scene.spheres) + [(tuple(v.position), 0.3) for v in self.vehicles.values()
+                                                    if v is not vehicle]
+            timestamp = int(self.sim_time * 1e9)
+        distance = self._cast(origin, self._lidar_directions, obstacles)
+        visible = distance < self.lidar.range
+        # SensorLocalFrame, as the settings files configure Lidar1; the vehicles never rotate
+        points = (self._lidar_directions[visible] * distance[visible, None]).astype(np.float32)
+        lidar = airsim.LidarData()
+        lidar.point_cloud = points.ravel().tolist() if len(points) else [0.0]
+        lidar.time_stamp = timestamp
+        lidar.pose = airsim.Pose(airsim.Vector3r(*origin.tolist()), airsim.Quaternionr())
+        lidar.segmentation = [0] * len(points)
+        return lidar
+
+    # --------------------------------------------------------------- camera
+    @staticmethod
+    def _make_texture(image_size: Tuple[int, int], rng: np.random.Generator) -> np.ndarray:
+        """Blocky random texture four frames wide, rich in ORB corners"""
+        height, width = image_size[0] * 4, image_size[1] * 4
+        block = 8
+        coarse = rng.integers(0, 256, (height // block + 1, width // block + 1), dtype=np.uint8)
+        texture = np.repeat(np.repeat(coarse, block, axis=0), block, axis=1)[:height, :width]
+        texture = texture // 2 + rng.integers(0, 64, (height, width), dtype=np.uint8)
+        return np.ascontiguousarray(texture)
+
+    def camera_frame(self, vehicle_name: str, height: int, width: int, pixels_per_meter: float = 20.0) -> np.ndarray:
+        """Downward-looking BGR view of the world texture, shifted by the vehicle's x/y"""
+        with self._lock:
+            self._sync()
+            position = self.vehicle(vehicle_name).position.copy()
+        tex_h, tex_w = self._texture.shape
+        top = int(round(position[0] * pixels_per_meter)) % tex_h
+        left = int(round(position[1] * pixels_per_meter)) % tex_w
+        rows = (np.arange(height) + top) % tex_h
+        cols = (np.arange(width) + left) % tex_w
+        gray = self._texture[rows[:, None], cols[None, :]]
+        return np.repeat(gray[:, :, None], 3, axis=2)
+
+    def image_response(self, request, vehicle_name: str) -> airsim.ImageResponse:
+        height, width = self.image_size
+        response = airsim.ImageResponse()
+        response.camera_name = _field(request, "camera_name")
+        response.image_type = _field(request, "image_type")
+        response.pixels_as_float = bool(_field(request, "pixels_as_float"))
+        response.compress = bool(_field(request, "compress"))
+        response.height, response.width = height, width
+        with self._lock:
+            self._sync()
+            vehicle = self.vehicle(vehicle_name)
+            response.camera_position = airsim.Vector3r(*vehicle.position.tolist())
+            response.time_stamp = int(self.sim_time * 1e9)
+        response.camera_orientation = airsim.Quaternionr()
+        response.message = ""
+        if response.pixels_as_float:
+            depth = float(max(vehicle.home[2] - vehicle.position[2], 0.1) + 1.0)
+            response.image_data_float = [depth] * (height * width)
+            response.image_data_uint8 = b""
+            return response
+        frame = self.camera_frame(vehicle_name, height, width)
+        if response.compress:
+            if cv2 is None:
+                raise RuntimeError("Compressed images need OpenCV installed")
+            response.image_data_uint8 = cv2.imencode(".png", frame)[1].tobytes()
+        else:
+            response.image_data_uint8 = frame.tobytes()
+        response.image_data_float = []
+        return response
+
+def _field(obj, name: str):
+    """Read ``name`` from an airsim type or from its msgpack dict form"""
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+class FakeFuture:
+    """Stand-in for the msgpack-rpc future returned by the *Async calls"""
+    def __init__(self, world: FakeWorld, vehicle: Optional[_Vehicle] = None, command_id: int = 0,
+                 timeout_sec: float = 3e+38):
+        self.world = world
+        self.vehicle = vehicle
+        self.command_id = command_id
+        self.timeout_sec = timeout_sec
+        self._result: Optional[bool] = None
+
+    def join(self):
+        """Block until the command finishes, mirroring AirSim; returns at once when time is manual
+
+        Like msgpack-rpc's Future, join() returns nothing; get() gives the command's
+        outcome, False when it timed out.
+        """
+        self._result = True
+        if self.vehicle is None or not self.world.realtime:
+            return
+        deadline = time.monotonic() + min(self.timeout_sec, 1e9)
+        while not self.world.is_done(self.vehicle, self.command_id):
+            if time.monotonic() > deadline or self.world.paused:
+                self._result = False
+                return
+            time.sleep(0.01)
+
+    def get(self) -> bool:
+        self.join()
+        return self._result
+
+    @property
+    def result(self) -> Optional[bool]:
+        return self._result
+
+class FakeMultirotorClient:
+    """Drop-in replacement for airsim.MultirotorClient backed by a FakeWorld
+
+    Every call sleeps for ``latency`` seconds to mimic the RPC round trip. Several
+    clients can share one world, e.g. one per worker thread.
+    """
+    def __init__(self, world: Optional[FakeWorld] = None, latency: Optional[float] = None):
+        self.world = world if world is not None else FakeWorld()
+        self.latency = self.world.latency if latency is None else latency
+
+    def _rpc(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    # Connection
+    def confirmConnection(self):
+        self._rpc()
+        print("Connected!")
+
+    def ping(self):
+        self._rpc()
+        return True
+
+    def reset(self):
+        self._rpc()
+        with self.world._lock:
+            for vehicle in self.world.vehicles.values():
+                vehicle.reset()
+
+    def listVehicles(self):
+        self._rpc()
+        return list(self.world.vehicles)
+
+    def enableApiControl(self, is_enabled, vehicle_name=''):
+        self._rpc()
+        self.world.vehicle(vehicle_name).api_control = bool(is_enabled)
+
+    def isApiControlEnabled(self, vehicle_name=''):
+        self._rpc()
+        return self.world.vehicle(vehicle_name).api_control
+
+    def armDisarm(self, arm, vehicle_name=''):
+        self._rpc()
+        self.world.vehicle(vehicle_name).armed = bool(arm)
+        return True
+
+    # Simulation clock
+    def simPause(self, is_paused):
+        self._rpc()
+        self.world.set_paused(bool(is_paused))
+
+    def simIsPause(self):
+        self._rpc()
+        return self.world.paused
+
+    def simContinueForTime(self, seconds):
+        self._rpc()
+        self.world.continue_for(float(seconds))
+
+    # Sensors and state
+    def getMultirotorState(self, vehicle_name=''):
+        self._rpc()
+        return self.world.state(vehicle_name)
+
+    def simGetVehiclePose(self, vehicle_name=''):
+        self._rpc()
+        position = self.world.state(vehicle_name).kinematics_estimated.position
+        return airsim.Pose(position, airsim.Quaternionr())
+
+    def getLidarData(self, lidar_name='', vehicle_name=''):
+        self._rpc()
+        return self.world.lidar_data(vehicle_name)
+
+    def simGetImages(self, requests, vehicle_name='', external=False):
+        self._rpc()
+        return [self.world.image_response(request, vehicle_name) for request in requests]
+
+    # Motion
+    def takeoffAsync(self, timeout_sec=20, vehicle_name=''):
+        self._rpc()
+        home = self.world.vehicle(vehicle_name).home
+        vehicle, command_id = self.world.command(vehicle_name, "path", [home + (0.0, 0.0, -3.0)], 2.0)
+        return FakeFuture(self.world, vehicle, command_id, timeout_sec)
+
+    def landAsync(self, timeout_sec=60, vehicle_name=''):
+        self._rpc()
+        vehicle = self.world.vehicle(vehicle_name)
+        target = vehicle.position.copy()
+        target[2] = vehicle.home[2]
+        vehicle, command_id = self.world.command(vehicle_name, "path", [target], 1.0)
+        return FakeFuture(self.world, vehicle, command_id, timeout_sec)
+
+    def hoverAsync(self, vehicle_name=''):
+        self._rpc()
+        vehicle, command_id = self.world.command(vehicle_name, "velocity", (0.0, 0.0, 0.0), 0.0)
+        return FakeFuture(self.world, vehicle, command_id)
+
+    def moveToPositionAsync(self, x, y, z, velocity, timeout_sec=3e+38, drivetrain=None, yaw_mode=None,
+                            lookahead=-1, adaptive_lookahead=1, vehicle_name=''):
+        self._rpc()
+        vehicle, command_id = self.world.command(vehicle_name, "path", [(x, y, z)], velocity)
+        return FakeFuture(self.world, vehicle, command_id, timeout_sec)
+
+    def moveOnPathAsync(self, path, velocity, timeout_sec=3e+38, drivetrain=None, yaw_mode=None,
+                        lookahead=-1, adaptive_lookahead=1, vehicle_name=''):
+        self._rpc()
+        waypoints = [(_field(p, "x_val"), _field(p, "y_val"), _field(p, "z_val")) for p in path]
+        vehicle, command_id = self.world.command(vehicle_name, "path", waypoints, velocity)
+        return FakeFuture(self.world, vehicle, command_id, timeout_sec)
+
+    def moveByVelocityAsync(self, vx, vy, vz, duration, drivetrain=None, yaw_mode=None, vehicle_name=''):
+        self._rpc()
+        vehicle, command_id = self.world.command(vehicle_name, "velocity", (vx, vy, vz), duration)
+        return FakeFuture(self.world, vehicle, command_id, duration)
+
+# ---------------------------------------------------------------------------
+# Local msgpack-rpc server so unmodified scripts can connect on 127.0.0.1:41451
+# ---------------------------------------------------------------------------
+
+def to_msgpack(value):
+    """Recursively turn airsim types into plain msgpack-friendly values"""
+    if isinstance(value, airsim.MsgpackMixin):
+        return {k: to_msgpack(v) for k, v in vars(value).items()}
+    if isinstance(value, (list, tuple)):
+        return [to_msgpack(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class _RpcDispatcher:
+    """Maps AirSim RPC method names onto a FakeMultirotorClient
+
+    Movement commands are acknowledged immediately; the vehicles keep moving in the
+    background, so ``join()`` on the client side does not wait for arrival.
+    """
+    def __init__(self, client: FakeMultirotorClient):
+        self.client = client
+
+    def ping(self):
+        return True
+
+    def getServerVersion(self):
+        return 1
+
+    def getMinRequiredClientVersion(self):
+        return 1
+
+    def reset(self):
+        self.client.reset()
+
+    def listVehicles(self):
+        return self.client.listVehicles()
+
+    def enableApiControl(self, is_enabled, vehicle_name):
+        self.client.enableApiControl(is_enabled, vehicle_name)
+
+    def isApiControlEnabled(self, vehicle_name):
+        return self.client.isApiControlEnabled(vehicle_name)
+
+    def armDisarm(self, arm, vehicle_name):
+        return self.client.armDisarm(arm, vehicle_name)
+
+    def simPause(self, is_paused):
+        self.client.simPause(is_paused)
+
+    def simIsPaused(self):
+        return self.client.simIsPause()
+
+    def simContinueForTime(self, seconds):
+        self.client.simContinueForTime(seconds)
+
+    def getMultirotorState(self, vehicle_name):
+        return to_msgpack(self.client.getMultirotorState(vehicle_name))
+
+    def simGetVehiclePose(self, vehicle_name):
+        return to_msgpack(self.client.simGetVehiclePose(vehicle_name))
+
+    def getLidarData(self, lidar_name, vehicle_name):
+        return to_msgpack(self.client.getLidarData(lidar_name, vehicle_name))
+
+    def simGetImages(self, requests, vehicle_name, external=False):
+        return to_msgpack(self.client.simGetImages(requests, vehicle_name))
+
+    def takeoff(self, timeout_sec, vehicle_name):
+        self.client.takeoffAsync(timeout_sec, vehicle_name)
+        return True
+
+    def land(self, timeout_sec, vehicle_name):
+        self.client.landAsync(timeout_sec, vehicle_name)
+        return True
+
+    def hover(self, vehicle_name):
+        self.client.hoverAsync(vehicle_name)
+        return True
+
+    def moveToPosition(self, x, y, z, velocity, timeout_sec, drivetrain, yaw_mode,
+                       lookahead, adaptive_lookahead, vehicle_name):
+        self.client.moveToPositionAsync(x, y, z, velocity, timeout_sec, vehicle_name=vehicle_name)
+        return True
+
+    def moveOnPath(self, path, velocity, timeout_sec, drivetrain, yaw_mode,
+                   lookahead, adaptive_lookahead, vehicle_name):
+        self.client.moveOnPathAsync(path, velocity, timeout_sec, vehicle_name=vehicle_name)
+        return True
+
+    def moveByVelocity(self, vx, vy, vz, duration, drivetrain, yaw_mode, vehicle_name):
+        self.client.moveByVelocityAsync(vx, vy, vz, duration, vehicle_name=vehicle_name)
+        return True
+
+class _RpcHandler(socketserver.BaseRequestHandler):
+    """One msgpack-rpc session: [0, msgid, method, params] -> [1, msgid, error, result]
+
+    Requests run on the server's worker pool, like AirSim's rpclib server, so several
+    requests pipelined on one connection are served concurrently and may answer out of order.
+    """
+    def handle(self):
+        # Back-to-back responses must not wait for the client's delayed ACK (Nagle)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        unpacker = msgpack.Unpacker(raw=False)
+        send_lock = threading.Lock()
+        dispatcher = self.server.dispatcher
+
+        def respond(msgid, method, params):
+            try:
+                result, error = getattr(dispatcher, method)(*params), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            payload = msgpack.Packer(use_bin_type=True).pack([1, msgid, error, result])
+            with send_lock:
+                self.request.sendall(payload)
+
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except ConnectionResetError:
+                return  # the client process went away without closing its connection
+            if not data:
+                return
+            unpacker.feed(data)
+            for message in unpacker:
+                if message[0] == 0:
+                    _, msgid, method, params = message
+                    self.server.workers.submit(respond, msgid, method, params)
+                elif message[0] == 2:  # notification, no response expected
+                    _, method, params = message
+                    self.server.workers.submit(getattr(dispatcher, method), *params)
+
+class FakeAirSimServer(socketserver.ThreadingTCPServer):
+    """Threaded msgpack-rpc server exposing a FakeWorld on the AirSim RPC port"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, world: FakeWorld, ip: str = "127.0.0.1", port: int = 41451,
+                 latency: float = 0.0, workers: int = 4):
+        super().__init__((ip, port), _RpcHandler)
+        # Network latency is real here; ``latency`` adds simulated server-side processing time
+        self.dispatcher = _RpcDispatcher(FakeMultirotorClient(world, latency=latency))
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fake-airsim-rpc")
+
+    def start(self) -> threading.Thread:
+        """Serve in a daemon thread and return it"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True, name="fake-airsim")
+        thread.start()
+        return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake AirSim world over msgpack-rpc")
+    parser.add_argument("--settings", default="settings.json", help="AirSim settings file to read vehicles from")
+    parser.add_argument("--ip", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=41451)
+    parser.add_argument("--obstacles", type=int, default=20, help="Number of random obstacles in the scene")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated processing time per RPC, seconds")
+    args = parser.parse_args()
+
+    world = FakeWorld.from_settings(args.settings, scene=FakeScene.random(args.obstacles, seed=args.seed),
+                                    seed=args.seed)
+    server = FakeAirSimServer(world, args.ip, args.port, latency=args.latency)
+    print(f"Fake AirSim serving {list(world.vehicles)} on {args.ip}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple, Type
+from swarm_proximity import grid_candidate_pairs
+
+EMPTY_MATCH = (np.empty((0, 2), dtype=np.float32), np.empty((0, 2), dtype=np.float32))
+
+# Number of set bits for every byte value, for numpy versions without np.bitwise_count
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int32)
+
+def hamming_rows(desc1: np.ndarray, desc2: np.ndarray) -> np.ndarray:
+    """Row-wise Hamming distance between two equally shaped uint8 descriptor arrays"""
+    xor = np.bitwise_xor(desc1, desc2)
+    if hasattr(np, "bitwise_count") and xor.shape[1] % 8 == 0:
+        return np.bitwise_count(np.ascontiguousarray(xor).view(np.uint64)).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[xor].sum(axis=1)
+
+def keypoint_coords(keypoints: Sequence[cv2.KeyPoint]) -> np.ndarray:
+    """(N,2) float32 pixel coordinates of a keypoint list"""
+    if len(keypoints) == 0:
+        return np.empty((0, 2), dtype=np.float32)
+    return cv2.KeyPoint_convert(keypoints).reshape(-1, 2)
+
+def ratio_test(query: np.ndarray, train: np.ndarray, best: np.ndarray, second: np.ndarray,
+               ratio: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep matches whose best distance is clearly below the second best (Lowe's ratio test)"""
+    keep = best < ratio * second
+    return query[keep], train[keep]
+
+class FeatureMatcher:
+    """Match ORB descriptors between two frames and return matched pixel coordinates"""
+    def __init__(self, ratio: float = 0.8):
+        self.ratio = ratio
+
+    def match(self, pts1: np.ndarray, desc1: Optional[np.ndarray], pts2: np.ndarray,
+              desc2: Optional[np.ndarray], prior: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (src, dst) (M,2) float32 arrays of matched points
+
+        ``prior`` is the expected pixel shift from frame 1 to frame 2, if known.
+        """
+        if desc1 is None or desc2 is None or len(desc1) < 2 or len(desc2) < 2:
+            return EMPTY_MATCH
+        query, train = self._match_indices(pts1, desc1, pts2, desc2, prior)
+        return pts1[query], pts2[train]
+
+    def _match_indices(self, pts1, desc1, pts2, desc2, prior) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+class BruteForceMatcher(FeatureMatcher):
+    """Exhaustive Hamming kNN (k=2) computed in one OpenCV call, no DMatch objects"""
+    def _match_indices(self, pts1, desc1, pts2, desc2, prior):
+        distances, indices = cv2.batchDistance(desc1, desc2, cv2.CV_32S, normType=cv2.NORM_HAMMING, K=2)
+        return ratio_test(np.arange(len(desc1)), indices[:, 0], distances[:, 0], distances[:, 1], self.ratio)
+
+class FlannLshMatcher(FeatureMatcher):
+    """Approximate kNN over binary descriptors with FLANN's LSH index"""
+    def __init__(self, ratio: float = 0.8, table_number: int = 6, key_size: int = 12,
+                 multi_probe_level: int = 1, checks: int = 32):
+        super().__init__(ratio)
+        index_params = dict(algorithm=6,  # FLANN_INDEX_LSH
+                            table_number=table_number, key_size=key_size,
+                            multi_probe_level=multi_probe_level)
+        self.flann = cv2.FlannBasedMatcher(index_params, dict(checks=checks))
+
+    def _match_indices(self, pts1, desc1, pts2, desc2, prior):
+        knn = self.flann.knnMatch(desc1, desc2, k=2)
+        # LSH can return fewer than two neighbours for some queries; those cannot pass the ratio test
+        rows = np.array([(m[0].queryIdx, m[0].trainIdx, m[0].distance, m[1].distance)
+                         for m in knn if len(m) == 2], dtype=np.float64).reshape(-1, 4)
+        return ratio_test(rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64),
+                          rows[:, 2], rows[:, 3], self.ratio)
+
+class GridMatcher(FeatureMatcher):
+    """Local matching: only compare features near where the motion prior predicts them
+
+    Keypoints of frame 2 are bucketed into a ``search_radius`` grid and each frame 1
+    feature is compared with the candidates around its predicted position. Without a
+    prior (first frame, lost track) it falls back to brute force.
+    """
+    def __init__(self, ratio: float = 0.8, search_radius: float = 12.0):
+        super().__init__(ratio)
+        self.search_radius = search_radius
+        self.fallback = BruteForceMatcher(ratio)
+
+    def _match_indices(self, pts1, desc1, pts2, desc2, prior):
+        if prior is None:
+            return self.fallback._match_indices(pts1, desc1, pts2, desc2, prior)
+        predicted = pts1 + np.asarray(prior, dtype=np.float32)
+        query, train = grid_candidate_pairs(predicted, pts2, self.search_radius)
+        offset = predicted[query] - pts2[train]
+        near = np.einsum('ij,ij->i', offset, offset) < self.search_radius ** 2
+        query, train = query[near], train[near]
+        if not len(query):
+            return query, train
+        distance = hamming_rows(desc1[query], desc2[train])
+
+        # Best and second best candidate per query: sort by (query, distance) and read run heads
+        order = np.lexsort((distance, query))
+        query, train, distance = query[order], train[order], distance[order]
+        heads = np.flatnonzero(np.r_[True, query[1:] != query[:-1]])
+        has_second = np.r_[heads[1:], len(query)] - heads >= 2
+        second = np.where(has_second, distance[np.minimum(heads + 1, len(query) - 1)], np.iinfo(np.int32).max)
+        return ratio_test(query[heads], train[heads], distance[heads], second, self.ratio)
+
+MATCHERS: Dict[str, Type[FeatureMatcher]] = {
+    "bf": BruteForceMatcher,
+    "flann": FlannLshMatcher,
+    "grid": GridMatcher,
+}
+
+def create_matcher(name: str, **kwargs) -> FeatureMatcher:
+    """Build a matching backend by name: bf, flann or grid"""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown matcher {name!r}, expected one of {sorted(MATCHERS)}")
+    return MATCHERS[name](**kwargs)
@@ -0,0 +1,161 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # the NumPy solver below gives the same assignment, only slower for large swarms
+    linear_sum_assignment = None
+
+def _hungarian(cost: np.ndarray) -> np.ndarray:
+    """Column of each row in a minimum-cost assignment of an (N,M) matrix with N <= M
+
+    Shortest augmenting path Hungarian algorithm with row and column potentials;
+    the scan over the columns is vectorized, so one row costs O(M) per path step.
+    """
+    rows, cols = cost.shape
+    u = np.zeros(rows + 1)
+    v = np.zeros(cols + 1)
+    owner = np.zeros(cols + 1, dtype=np.int64)  # 1-based row holding each column, 0 when free
+    way = np.zeros(cols + 1, dtype=np.int64)
+    pending = range(1, rows + 1)
+    if rows == cols:
+        # Column reduction: each column goes to its cheapest row unless another column
+        # claimed that row first; those edges are tight, so only the other rows need a path search
+        v[1:] = cost.min(axis=0)
+        cheapest = np.argmin(cost, axis=0)
+        _, first = np.unique(cheapest, return_index=True)
+        owner[first + 1] = cheapest[first] + 1
+        matched = np.zeros(rows + 1, dtype=bool)
+        matched[owner[1:]] = True
+        pending = np.flatnonzero(~matched[1:]) + 1
+    for row in pending:
+        owner[0] = row
+        column = 0
+        minv = np.full(cols + 1, np.inf)
+        used = np.zeros(cols + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = owner[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, minv[1:], np.inf)
+            nearest = int(np.argmin(candidates)) + 1
+            delta = candidates[nearest - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            column = nearest
+            if owner[column] == 0:
+                break
+        # Flip the augmenting path
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    assignment = np.empty(rows, dtype=np.int64)
+    taken = np.flatnonzero(owner[1:])
+    assignment[owner[1:][taken] - 1] = taken
+    return assignment
+
+def greedy_assignment(cost: np.ndarray) -> np.ndarray:
+    """Column of each row of an (N,M) matrix with N <= M, cheapest pairs first
+
+    Not optimal, but O(N * M) per round: every unassigned row claims its cheapest free
+    column, each column goes to the cheapest of its claimants, and the losers try again.
+    """
+    rows, cols = cost.shape
+    assignment = np.empty(rows, dtype=np.int64)
+    free = np.arange(rows)
+    taken = np.zeros(cols, dtype=bool)
+    while len(free):
+        candidates = np.where(taken, np.inf, cost[free])
+        choice = np.argmin(candidates, axis=1)
+        best = candidates[np.arange(len(free)), choice]
+        # Sort the claims by (column, cost) and keep the first of each column
+        order = np.lexsort((best, choice))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = choice[order][1:] != choice[order][:-1]
+        winners = order[first]
+        assignment[free[winners]] = choice[winners]
+        taken[choice[winners]] = True
+        free = np.delete(free, winners)
+    return assignment
+
+def solve_assignment(cost: np.ndarray) -> np.ndarray:
+    """Column of each row minimizing the total cost of a square or wide (N,M) matrix
+
+    Uses SciPy's linear_sum_assignment when SciPy is installed.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.shape[0] > cost.shape[1]:
+        raise ValueError(f"cannot assign {cost.shape[0]} rows to {cost.shape[1]} columns")
+    if cost.size == 0:
+        return np.empty(cost.shape[0], dtype=np.int64)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+        assignment = np.empty(cost.shape[0], dtype=np.int64)
+        assignment[rows] = cols
+        return assignment
+    return _hungarian(cost)
+
+def assignment_cost(positions: np.ndarray, slots: np.ndarray) -> np.ndarray:
+    """(N,N) squared distances from every drone to every slot; drones without a position cost 0 anywhere
+
+    Minimizing the sum of squared rather than plain distances also keeps the straight
+    paths to the slots from crossing, so drones can fly straight to their new slots.
+    """
+    diff = positions[:, None, :] - slots[None, :, :]
+    cost = np.einsum('ijk,ijk->ij', diff, diff)
+    return np.nan_to_num(cost, nan=0.0)
+
+class SlotAssigner:
+    """Keeps drones assigned to formation slots with minimum total squared travel
+
+    Solving is O(N^3), so ``assign`` keeps the previous assignment while the drones
+    sit about as close to their slots as they have since the last solve. It re-solves
+    only once the RMS distance to the assigned slots grew by more than ``tolerance``
+    over its lowest value (the geometry changed, not just rotated along with the
+    drones), and adopts a new assignment only if it lowers the cost by more than
+    ``improvement`` so drones do not trade slots back and forth. The first call and
+    ``force`` (e.g. on a formation switch) always solve.
+
+    Without SciPy the NumPy solver takes tens of milliseconds at 100 drones, too long
+    for a control tick, so swarms above ``exact_limit`` fall back to greedy_assignment.
+    """
+    def __init__(self, num_drones: int, tolerance: float = 0.5, improvement: float = 0.1,
+                 exact_limit: int = 48):
+        self.tolerance = tolerance
+        self.exact_limit = exact_limit
+        self.improvement = improvement
+        self.assignment = np.arange(num_drones)  # slot of each drone
+        self.solves = 0
+        self.cache_hits = 0
+        self._best_distance = -np.inf  # lowest RMS distance to the assigned slots since the last solve
+
+    def _rms_distance(self, positions: np.ndarray, slots: np.ndarray) -> float:
+        diff = positions - slots[self.assignment]
+        squared = np.einsum('ij,ij->i', diff, diff)
+        squared = squared[np.isfinite(squared)]
+        return float(np.sqrt(squared.mean())) if len(squared) else 0.0
+
+    def assign(self, positions: np.ndarray, slots: np.ndarray, force: bool = False) -> np.ndarray:
+        """Slot index of each drone for (N,3) current ``positions`` and (N,3) formation ``slots``"""
+        positions = np.asarray(positions, dtype=np.float64)
+        distance = self._rms_distance(positions, slots)
+        if not force and distance <= self._best_distance + self.tolerance:
+            self._best_distance = min(self._best_distance, distance)
+            self.cache_hits += 1
+            return self.assignment
+        cost = assignment_cost(positions, slots)
+        if linear_sum_assignment is None and len(cost) > self.exact_limit:
+            candidate = greedy_assignment(cost)
+        else:
+            candidate = solve_assignment(cost)
+        rows = np.arange(len(cost))
+        if force or cost[rows, candidate].sum() < (1 - self.improvement) * cost[rows, self.assignment].sum():
+            self.assignment = candidate
+        self.solves += 1
+        self._best_distance = self._rms_distance(positions, slots)
+        return self.assignment
@@ -0,0 +1,63 @@
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+# A formation kernel maps (theta, angle, index, radius) to (N,3) offsets from the swarm center.
+# theta is the per-drone phase angle + 2*pi*i/N, index is i as a float array.
+FormationKernel = Callable[[np.ndarray, float, np.ndarray, float], np.ndarray]
+
+FORMATIONS: Dict[str, FormationKernel] = {}
+
+def register_formation(name: str) -> Callable[[FormationKernel], FormationKernel]:
+    """Decorator that adds a formation kernel to the registry under ``name``"""
+    def decorator(kernel: FormationKernel) -> FormationKernel:
+        FORMATIONS[name] = kernel
+        return kernel
+    return decorator
+
+def polar_offsets(radius, theta: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """Stack a polar (radius, theta) ring and vertical offsets into (N,3) offsets"""
+    return np.stack((radius * np.cos(theta), radius * np.sin(theta), z), axis=-1)
+
+@register_formation("circle")
+def circle(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Circular formation with synchronized vertical movement
+    return polar_offsets(radius, theta, 1.0 * np.sin(angle + index))
+
+@register_formation("spiral")
+def spiral(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Dynamic spiral formation
+    return polar_offsets(radius * (1 + 0.3 * np.sin(angle + index)), theta, 1.5 * np.sin(theta))
+
+@register_formation("wave")
+def wave(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Complex wave pattern
+    return polar_offsets(radius, theta, 2.0 * np.sin(theta * 2 + index))
+
+@register_formation("diamond")
+def diamond(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Diamond formation with dynamic scaling
+    return polar_offsets(radius * (1 + 0.5 * np.sin(theta)), theta, 1.0 * np.cos(theta))
+
+@register_formation("hexagon")
+def hexagon(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Hexagonal formation with rotation
+    return polar_offsets(radius * (1 + 0.2 * np.sin(angle)), theta, 1.0 * np.sin(theta))
+
+@register_formation("cross")
+def cross(theta: np.ndarray, angle: float, index: np.ndarray, radius: float) -> np.ndarray:
+    # Cross formation with dynamic movement
+    return polar_offsets(radius * (1 + 0.3 * np.cos(theta)), theta, 1.0 * np.sin(theta * 2))
+
+class FormationEngine:
+    """Compute formation targets for the whole swarm in one vectorized call"""
+    def __init__(self, num_drones: int, radius: float = 5.0):
+        self.radius = radius
+        self.index = np.arange(num_drones, dtype=np.float64)
+        self.phase_offsets = 2 * np.pi * self.index / max(num_drones, 1)
+
+    def compute(self, formation: str, center: Tuple[float, float, float], angle: float) -> np.ndarray:
+        """Return the (N,3) target positions of ``formation`` at ``angle``"""
+        kernel = FORMATIONS[formation]
+        offsets = kernel(self.phase_offsets + angle, angle, self.index, self.radius)
+        offsets += np.asarray(center, dtype=np.float64)
+        return offsets
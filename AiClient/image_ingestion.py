@@ -0,0 +1,117 @@
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+import airsim
+from instrumentation import get_logger, log_event
+
+logger = get_logger("image_ingestion")
+
+Roi = Tuple[int, int, int, int]  # x, y, width, height in source pixels
+
+class _FrameSlot:
+    """Reusable output buffers for one camera of one drone
+
+    Frames alternate between ``depth`` buffers, so the previous frame a consumer kept
+    (e.g. VO's prev_image) stays intact while the next one is decoded.
+    """
+    __slots__ = ("buffers", "gray", "index", "frame", "sequence")
+
+    def __init__(self, depth: int):
+        self.buffers: List[Optional[np.ndarray]] = [None] * depth
+        self.gray: Optional[np.ndarray] = None  # full-resolution scratch used before resizing
+        self.index = 0
+        self.frame: Optional[np.ndarray] = None
+        self.sequence = 0
+
+    def next_buffer(self, shape: Tuple[int, int]) -> np.ndarray:
+        self.index = (self.index + 1) % len(self.buffers)
+        buffer = self.buffers[self.index]
+        if buffer is None or buffer.shape != shape:
+            buffer = self.buffers[self.index] = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+    def scratch(self, shape: Tuple[int, int]) -> np.ndarray:
+        if self.gray is None or self.gray.shape != shape:
+            self.gray = np.empty(shape, dtype=np.uint8)
+        return self.gray
+
+class ImageIngestor:
+    """Grayscale camera frames for a set of drones, fetched with one simGetImages call per drone
+
+    All cameras of a drone are requested together. Raw frames are converted straight
+    from the RPC buffer into preallocated grayscale buffers, optionally cropped to
+    ``roi`` and resized to ``size`` (height, width) on the way. ``compress=True``
+    transfers PNG instead, trading decode time for about a third of the bandwidth.
+    """
+    def __init__(self, client: airsim.MultirotorClient, drone_names: Sequence[str],
+                 cameras: Sequence[str] = ("front_center",), compress: bool = False,
+                 roi: Optional[Roi] = None, size: Optional[Tuple[int, int]] = None, depth: int = 2):
+        self.client = client
+        self.drone_names = list(drone_names)
+        self.cameras = list(cameras)
+        self.compress = compress
+        self.roi = roi
+        self.size = size
+        self.requests = [airsim.ImageRequest(camera, airsim.ImageType.Scene, False, compress)
+                         for camera in self.cameras]
+        self.slots: Dict[Tuple[str, str], _FrameSlot] = {
+            (drone, camera): _FrameSlot(depth) for drone in self.drone_names for camera in self.cameras}
+
+    def fetch(self, drone_names: Optional[Sequence[str]] = None) -> int:
+        """Fetch and decode new frames for ``drone_names`` (default all), return how many arrived"""
+        received = 0
+        for drone_name in drone_names or self.drone_names:
+            try:
+                responses = self.client.simGetImages(self.requests, vehicle_name=drone_name)
+            except Exception as e:
+                log_event(logger, logging.WARNING, "image_fetch_error", drone=drone_name, error=str(e))
+                continue
+            for camera, response in zip(self.cameras, responses):
+                try:
+                    if self._ingest(self.slots[(drone_name, camera)], response):
+                        received += 1
+                except Exception as e:
+                    log_event(logger, logging.WARNING, "image_decode_error", drone=drone_name,
+                              camera=camera, error=str(e))
+        return received
+
+    def frame(self, drone_name: str, camera: Optional[str] = None) -> Optional[np.ndarray]:
+        """Latest grayscale frame, valid until ``depth`` more fetches have been made"""
+        return self.slots[(drone_name, camera or self.cameras[0])].frame
+
+    def sequence(self, drone_name: str, camera: Optional[str] = None) -> int:
+        """Number of frames ingested so far for a camera, to tell new frames from old ones"""
+        return self.slots[(drone_name, camera or self.cameras[0])].sequence
+
+    def _ingest(self, slot: _FrameSlot, response: airsim.ImageResponse) -> bool:
+        data = response.image_data_uint8
+        if not len(data) or not response.width or not response.height:
+            return False
+        if self.compress:
+            # imdecode always allocates; decoding straight to gray at least skips the BGR image
+            gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                return False
+            source = self._crop(gray)
+            if self.size is None:
+                slot.frame = source if source is gray else np.ascontiguousarray(source)
+            else:
+                slot.frame = cv2.resize(source, self.size[::-1], dst=slot.next_buffer(self.size),
+                                        interpolation=cv2.INTER_AREA)
+        else:
+            bgr = self._crop(np.frombuffer(data, dtype=np.uint8).reshape(response.height, response.width, 3))
+            if self.size is None:
+                slot.frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY, dst=slot.next_buffer(bgr.shape[:2]))
+            else:
+                gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY, dst=slot.scratch(bgr.shape[:2]))
+                slot.frame = cv2.resize(gray, self.size[::-1], dst=slot.next_buffer(self.size),
+                                        interpolation=cv2.INTER_AREA)
+        slot.sequence += 1
+        return True
+
+    def _crop(self, image: np.ndarray) -> np.ndarray:
+        if self.roi is None:
+            return image
+        x, y, width, height = self.roi
+        return image[y:y + height, x:x + width]
@@ -0,0 +1,172 @@
+import contextlib
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import numpy as np
+from typing import Dict, Optional, TextIO
+
+# Named pipeline stages shared by the swarm controller and visual odometry
+STATE_FETCH = "state_fetch"
+LIDAR_FETCH = "lidar_fetch"
+OBSTACLE_FILTER = "obstacle_filter"
+OCCUPANCY_UPDATE = "occupancy_update"
+FORMATION = "formation"
+COLLISION_AVOIDANCE = "collision_avoidance"
+COLLISION_CHECK = "collision_check"
+COMMAND_DISPATCH = "command_dispatch"
+VO_IMAGE = "vo_image"
+VO_DETECT = "vo_detect"
+VO_MATCH = "vo_match"
+VO_POSE = "vo_pose"
+
+_NULL_TIMER = contextlib.nullcontext()
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the shared ``aiclient`` namespace"""
+    return logging.getLogger(f"aiclient.{name}")
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """Log ``event`` with key=value fields, formatting nothing unless the level is enabled"""
+    if not logger.isEnabledFor(level):
+        return
+    parts = [event]
+    for key, value in fields.items():
+        parts.append(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}")
+    logger.log(level, " ".join(parts))
+
+class _StageTimer:
+    __slots__ = ("timers", "name", "start")
+
+    def __init__(self, timers: "StageTimers", name: str):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timers.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class _StageSamples:
+    """Fixed-size ring buffer of durations for one stage"""
+    __slots__ = ("durations", "count", "lock")
+
+    def __init__(self, capacity: int):
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.durations[self.count % len(self.durations)] = seconds
+            self.count += 1
+
+    def window(self) -> np.ndarray:
+        with self.lock:
+            return self.durations[:min(self.count, len(self.durations))].copy()
+
+class StageTimers:
+    """Per-stage latency histograms that cost a single attribute check when disabled
+
+    Each stage keeps its last ``capacity`` samples, so percentiles describe recent
+    behaviour and memory stays bounded on long runs.
+    """
+    def __init__(self, enabled: bool = False, capacity: int = 10000):
+        self.enabled = enabled
+        self.capacity = capacity
+        self._stages: Dict[str, _StageSamples] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """Context manager timing one execution of stage ``name``"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def record(self, name: str, seconds: float):
+        """Add one duration sample for ``name``"""
+        samples = self._stages.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self._stages.setdefault(name, _StageSamples(self.capacity))
+        samples.add(seconds)
+
+    def reset(self):
+        """Forget all recorded samples"""
+        with self._lock:
+            self._stages = {}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean, p50/p95/p99 and max per stage, in milliseconds"""
+        # record() may add a stage from another thread while we iterate
+        with self._lock:
+            stages = sorted(self._stages.items())
+        result = {}
+        for name, samples in stages:
+            window = samples.window() * 1000
+            if not len(window):
+                continue
+            p50, p95, p99 = np.percentile(window, [50, 95, 99])
+            result[name] = {
+                "count": samples.count,
+                "mean_ms": float(window.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(window.max()),
+            }
+        return result
+
+    def dump(self, stream: Optional[TextIO] = None):
+        """Print the per-stage summary as a table"""
+        stream = stream or sys.stdout
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"\n{'stage':<18} {'count':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)",
+              file=stream)
+        for name, row in summary.items():
+            print(f"{name:<18} {row['count']:>7} {row['mean_ms']:>8.2f} {row['p50_ms']:>8.2f} "
+                  f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}", file=stream)
+
+    def export(self, path: str):
+        """Write the summary to ``path`` as JSON, or CSV when the path ends in .csv"""
+        summary = self.summary()
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+                for name, row in summary.items():
+                    writer.writerow([name, row["count"], row["mean_ms"], row["p50_ms"],
+                                     row["p95_ms"], row["p99_ms"], row["max_ms"]])
+            else:
+                json.dump(summary, f, indent=2)
+
+def configure_from_env():
+    """Apply AICLIENT_LOG_LEVEL and AICLIENT_TIMING from the environment
+
+    AICLIENT_LOG_LEVEL=DEBUG shows the per-tick messages from the hot loops;
+    AICLIENT_TIMING=1 turns the stage timers on.
+    """
+    level = os.environ.get("AICLIENT_LOG_LEVEL", "WARNING").upper()
+    logging.basicConfig(level=getattr(logging, level, logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    timers.enabled = os.environ.get("AICLIENT_TIMING", "0") not in ("", "0")
+
+def report_timers():
+    """Dump the stage timers and export them to AICLIENT_TIMING_EXPORT if set"""
+    if not timers.enabled:
+        return
+    timers.dump()
+    export_path = os.environ.get("AICLIENT_TIMING_EXPORT")
+    if export_path:
+        timers.export(export_path)
+        print(f"Stage timings written to {export_path}")
+
+timers = StageTimers(enabled=os.environ.get("AICLIENT_TIMING", "0") not in ("", "0"))
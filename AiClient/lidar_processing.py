@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Optional, Sequence, Union
+
+EMPTY_POINTS = np.empty((0, 3), dtype=np.float32)
+
+def point_cloud_to_array(point_cloud: Union[Sequence[float], np.ndarray]) -> np.ndarray:
+    """Convert a flat LiDAR point cloud buffer into an (N,3) float32 array"""
+    points = np.asarray(point_cloud, dtype=np.float32).ravel()
+    # AirSim returns a single 0.0 when the sensor saw nothing
+    usable = points.size - points.size % 3
+    if usable == 0:
+        return EMPTY_POINTS
+    return points[:usable].reshape(-1, 3)
+
+def obstacle_mask(points: np.ndarray, max_range: float,
+                  max_lateral: Optional[float] = None) -> np.ndarray:
+    """Boolean mask of the points that count as obstacles
+
+    Without ``max_lateral`` a point is an obstacle when it lies within ``max_range``
+    of the sensor. With ``max_lateral`` only the forward box 0 < x < max_range,
+    |y| < max_lateral is considered.
+    """
+    if max_lateral is None:
+        squared = np.einsum('ij,ij->i', points, points)
+        return squared < max_range * max_range
+    x = points[:, 0]
+    return (x > 0) & (x < max_range) & (np.abs(points[:, 1]) < max_lateral)
+
+def extract_obstacles(point_cloud: Union[Sequence[float], np.ndarray], max_range: float = 3.0,
+                      max_lateral: Optional[float] = None) -> np.ndarray:
+    """Return the obstacle points of a raw point cloud as an (N,3) float32 array"""
+    points = point_cloud_to_array(point_cloud)
+    if len(points) == 0:
+        return EMPTY_POINTS
+    return points[obstacle_mask(points, max_range, max_lateral)]
+
+def quaternion_matrix(w: float, x: float, y: float, z: float) -> np.ndarray:
+    """3x3 rotation matrix of a unit quaternion"""
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+def points_to_world(points: np.ndarray, pose) -> np.ndarray:
+    """Move sensor-frame (N,3) points into the world (NED) frame with an airsim.Pose
+
+    Only for scans in SensorLocalFrame, which the settings files select for Lidar1;
+    AirSim's default VehicleInertialFrame points are already in the world frame.
+    """
+    q = pose.orientation
+    rotation = quaternion_matrix(q.w_val, q.x_val, q.y_val, q.z_val)
+    p = pose.position
+    return points @ rotation.T.astype(np.float32) + np.array([p.x_val, p.y_val, p.z_val], dtype=np.float32)
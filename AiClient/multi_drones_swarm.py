@@ -1,254 +1,381 @@
 import airsim
 import time
 import math
+import logging
 import numpy as np
 import sys
-from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor
+from swarm_acquisition import SwarmSnapshot, SwarmStateFetcher
+from lidar_processing import EMPTY_POINTS, extract_obstacles, point_cloud_to_array, points_to_world
+from occupancy_map import OccupancyMap
+from swarm_proximity import ProximityEngine
+from collision_avoidance import AvoidanceEngine
+from swarm_state import SwarmState
+from formations import FormationEngine
+from formation_assignment import SlotAssigner
+from control_loop import ControlLoop, DEGRADE, TickInfo
+from telemetry_recorder import TelemetryRecorder
+from swarm_lifecycle import SwarmLifecycle
+from connection import ClientPool, ResilientClient
+from sim_clock import Clock, WallClock, clock_from_env
+from instrumentation import (COLLISION_AVOIDANCE, COLLISION_CHECK, COMMAND_DISPATCH, FORMATION, OBSTACLE_FILTER,
+                             OCCUPANCY_UPDATE, configure_from_env, get_logger, log_event, report_timers, timers)
 
-@dataclass
-class DroneState:
-    position: Tuple[float, float, float]
-    velocity: Tuple[float, float, float]
-    battery: float
-    obstacles: List[Tuple[float, float, float]]
+logger = get_logger("swarm")
 
 class SwarmController:
-    def __init__(self, client: airsim.MultirotorClient, drone_names: List[str]):
+    def __init__(self, client: airsim.MultirotorClient, drone_names: List[str],
+                 client_factory: Optional[Callable[[], airsim.MultirotorClient]] = None,
+                 recorder: Optional[TelemetryRecorder] = None, clock: Optional[Clock] = None,
+                 acquisition: bool = True):
         self.client = client
+        self.clock = clock or WallClock()
         self.drone_names = drone_names
-        self.drone_states: Dict[str, DroneState] = {}
-        self.safety_distance = 2.0
-        self.formation_radius = 5.0
+        self.state = SwarmState(drone_names)
+        self.proximity = ProximityEngine(safety_distance=2.0)
+        self.avoidance = AvoidanceEngine(safety_distance=2.0)
+        self.occupancy = OccupancyMap()  # LiDAR hits of the whole swarm, kept for a few seconds
+        self.formations = FormationEngine(len(drone_names), radius=5.0)
+        self.formation_sequence = ["circle", "spiral", "wave", "diamond", "hexagon", "cross"]
         self.swarm_center = (0, 0, -3)
         self.formation_type = "circle"
         self.formation_phase = 0
-        self.executor = ThreadPoolExecutor(max_workers=len(drone_names))
+        self.assigner = SlotAssigner(len(drone_names))
+        self.tick_count = 0
+        self.recorder = recorder
+        self.vo = None  # optional VO runtime; its get_positions() estimates are recorded with the states
+        # acquisition=False leaves a planning-only controller (e.g. for AsyncSwarm) with
+        # no fetcher, dispatch pool or RPC clients
+        self.executor = None
+        self.clients = None
+        self.fetcher = None
+        if acquisition:
+            self.executor = ThreadPoolExecutor(max_workers=len(drone_names))
+            # Each acquisition and dispatch worker needs its own RPC connection
+            self.clients = ClientPool(client_factory or ResilientClient)
+            self.fetcher = SwarmStateFetcher(client_factory or ResilientClient, drone_names, clock=self.clock.now)
         print(f"\nInitializing Swarm Controller with drones: {drone_names}")
+    
+    @property
+    def drone_states(self) -> SwarmState:
+        """Per-drone views by name, for drones that have reported a state"""
+        return self.state
+    
+    @property
+    def safety_distance(self) -> float:
+        return self.proximity.safety_distance
+    
+    @safety_distance.setter
+    def safety_distance(self, value: float):
+        self.proximity.safety_distance = value
+        self.avoidance.safety_distance = value
+    
+    @property
+    def formation_radius(self) -> float:
+        return self.formations.radius
+    
+    @formation_radius.setter
+    def formation_radius(self, value: float):
+        self.formations.radius = value
+        
+    def update_drone_states(self, include_lidar: bool = True):
+        """Update state information for all drones
         
-    def update_drone_states(self):
-        """Update state information for all drones"""
-        print("\nUpdating drone states...")
-        for drone_name in self.drone_names:
+        With include_lidar=False only kinematics are refreshed and each drone keeps
+        the obstacles from its last LiDAR scan.
+        """
+        self.apply_snapshot(self.fetcher.fetch(include_lidar=include_lidar))
+    
+    def apply_snapshot(self, snapshot: SwarmSnapshot):
+        """Write one acquisition snapshot into the swarm state, keeping old obstacles if LiDAR is missing
+        
+        Every LiDAR scan is also moved into the world frame and added to the occupancy map.
+        """
+        world_points = []
+        for drone_name, sample in snapshot.samples.items():
+            if sample.error is not None:
+                log_event(logger, logging.WARNING, "state_error", drone=drone_name, error=sample.error)
+                continue
             try:
-                state = self.client.getMultirotorState(vehicle_name=drone_name)
-                pos = state.kinematics_estimated.position
-                vel = state.kinematics_estimated.linear_velocity
+                pos = sample.state.kinematics_estimated.position
+                vel = sample.state.kinematics_estimated.linear_velocity
                 
-                lidar_data = self.client.getLidarData(lidar_name="Lidar1", vehicle_name=drone_name)
-                obstacles = []
-                if lidar_data.point_cloud:
-                    points = np.array(lidar_data.point_cloud).reshape(-1, 3)
-                    obstacles = [tuple(p) for p in points if np.linalg.norm(p) < 3.0]
+                obstacles = None
+                if sample.lidar is not None:
+                    with timers.stage(OBSTACLE_FILTER):
+                        points = point_cloud_to_array(sample.lidar.point_cloud)
+                        obstacles = extract_obstacles(points, max_range=3.0)
+                    if len(points):
+                        world_points.append(points_to_world(points, sample.lidar.pose))
                 
-                self.drone_states[drone_name] = DroneState(
-                    position=(pos.x_val, pos.y_val, pos.z_val),
-                    velocity=(vel.x_val, vel.y_val, vel.z_val),
-                    battery=100.0,
-                    obstacles=obstacles
-                )
+                slot = self.state.slots[drone_name]
+                self.state.update(slot, (pos.x_val, pos.y_val, pos.z_val), (vel.x_val, vel.y_val, vel.z_val),
+                                  obstacles)
                 
-                print(f"\n{drone_name} State:")
-                print(f"  Position: x={pos.x_val:.2f}, y={pos.y_val:.2f}, z={pos.z_val:.2f}")
-                print(f"  Velocity: x={vel.x_val:.2f}, y={vel.y_val:.2f}, z={vel.z_val:.2f}")
-                print(f"  Obstacles detected: {len(obstacles)}")
+                log_event(logger, logging.DEBUG, "drone_state", drone=drone_name,
+                          x=pos.x_val, y=pos.y_val, z=pos.z_val,
+                          vx=vel.x_val, vy=vel.y_val, vz=vel.z_val,
+                          obstacles=int(self.state.obstacle_count[slot]))
                 
             except Exception as e:
-                print(f"Error updating state for {drone_name}: {str(e)}")
+                log_event(logger, logging.WARNING, "state_error", drone=drone_name, error=str(e))
+        
+        self.state.commit(snapshot.timestamp)
+        self.update_occupancy(world_points, snapshot.timestamp)
+    
+    def update_occupancy(self, world_points: List[np.ndarray], timestamp: float):
+        """Follow the swarm with the occupancy map and add this tick's world-frame LiDAR points"""
+        with timers.stage(OCCUPANCY_UPDATE):
+            center = self.state.center()
+            if np.isfinite(center).all():
+                self.occupancy.recenter(center)
+            points = np.concatenate(world_points) if world_points else EMPTY_POINTS
+            # The drones' own bodies and their neighbours show up in the scans; keep them out
+            self.occupancy.insert(points, timestamp, exclude=self.state.position[self.state.valid])
     
-    def move_drone_async(self, drone_name: str, target_pos: Tuple[float, float, float]):
+    def move_drone_async(self, drone_name: str, target_pos: Tuple[float, float, float],
+                         collision_risk: Optional[Tuple[str, float]] = None):
         """Move a single drone to its target position asynchronously"""
         try:
-            if not self.check_collision_risk(drone_name, target_pos):
-                print(f"  Moving {drone_name} to: x={target_pos[0]:.2f}, y={target_pos[1]:.2f}, z={target_pos[2]:.2f}")
-                self.client.moveToPositionAsync(
+            if collision_risk is None:
+                log_event(logger, logging.DEBUG, "move", drone=drone_name,
+                          x=target_pos[0], y=target_pos[1], z=target_pos[2])
+                self.clients.get().moveToPositionAsync(
                     target_pos[0], target_pos[1], target_pos[2],
                     2.0, vehicle_name=drone_name
                 )
             else:
-                print(f"  {drone_name}: Movement skipped due to collision risk")
+                other_drone, dist = collision_risk
+                log_event(logger, logging.INFO, "move_skipped", drone=drone_name, other=other_drone,
+                          distance=dist, minimum=self.safety_distance)
         except Exception as e:
-            print(f"Error moving {drone_name}: {str(e)}")
-    
-    def check_collision_risk(self, drone_name: str, target_pos: Tuple[float, float, float]) -> bool:
-        """Check if moving to target position would cause collision with other drones"""
-        current_pos = self.drone_states[drone_name].position
-        for other_drone, other_state in self.drone_states.items():
-            if other_drone != drone_name:
-                dist = np.linalg.norm(np.array(target_pos) - np.array(other_state.position))
-                if dist < self.safety_distance:
-                    print(f"\nCollision risk detected:")
-                    print(f"  {drone_name} -> {other_drone}")
-                    print(f"  Distance: {dist:.2f}m (minimum: {self.safety_distance}m)")
-                    return True
-        return False
+            log_event(logger, logging.WARNING, "move_error", drone=drone_name, error=str(e))
+    
+    def avoid_collisions(self, target_positions: Dict[str, Tuple[float, float, float]]) -> Dict[str, Tuple[float, float, float]]:
+        """Move targets away from the other drones and mapped obstacles, all drones in one batch
+        
+        Targets that would end up too close to another drone are adjusted rather than
+        dropped; find_collision_risks still holds back the few the adjustment cannot clear.
+        """
+        if not len(self.state):
+            return target_positions
+        with timers.stage(COLLISION_AVOIDANCE):
+            missing = (math.nan, math.nan, math.nan)
+            targets = np.array([target_positions.get(name, missing) for name in self.drone_names], dtype=np.float64)
+            valid = self.state.valid
+            _, obstacles = self.occupancy.nearest_occupied(targets[valid], self.avoidance.obstacle_distance)
+            result = self.avoidance.adjust(targets, self.state.position, self.state.velocity, obstacles)
+        if result.adjusted.any():
+            log_event(logger, logging.DEBUG, "targets_adjusted", drones=int(result.adjusted.sum()),
+                      max_shift=float(result.shift.max()))
+        adjusted = result.targets.tolist()
+        return {name: tuple(adjusted[self.state.slots[name]]) for name in target_positions}
+    
+    def find_collision_risks(self, target_positions: Dict[str, Tuple[float, float, float]]) -> Dict[str, Tuple[str, float]]:
+        """Check all targets against the other drones' current positions in one batch
+        
+        Returns the drones whose target is closer than safety_distance to another drone,
+        mapped to the closest such drone and its distance.
+        """
+        names = [name for name in target_positions if name in self.state]
+        if not names:
+            return {}
+        with timers.stage(COLLISION_CHECK):
+            targets = np.array([target_positions[name] for name in names])
+            if len(names) == len(self.drone_names):
+                positions = self.state.position  # common case: no copy
+            else:
+                positions = self.state.position[[self.state.slots[name] for name in names]]
+            report = self.proximity.check(targets, positions)
+        return {names[i]: (names[report.nearest[i]], float(report.distance[i]))
+                for i in np.flatnonzero(report.violations)}
     
     def calculate_swarm_center(self) -> Tuple[float, float, float]:
         """Calculate the center point of the swarm"""
-        positions = [state.position for state in self.drone_states.values()]
-        center = tuple(np.mean(positions, axis=0))
-        print(f"\nSwarm Center: x={center[0]:.2f}, y={center[1]:.2f}, z={center[2]:.2f}")
+        center = tuple(self.state.center().tolist())
+        log_event(logger, logging.DEBUG, "swarm_center", x=center[0], y=center[1], z=center[2])
         return center
     
     def calculate_formation_positions(self, center: Tuple[float, float, float], 
                                    angle: float) -> Dict[str, Tuple[float, float, float]]:
-        """Calculate positions for each drone in the formation"""
-        positions = {}
-        print(f"\nCalculating formation positions (angle: {angle:.2f}):")
+        """Calculate positions for each drone in the formation
         
+        Drones take the slots that minimize their total squared travel. The assignment
+        is re-solved on every formation switch and whenever the drones fall well behind
+        their slots.
+        """
         # Change formation type periodically
-        if int(angle / (2 * math.pi)) > self.formation_phase:
+        switched = int(angle / (2 * math.pi)) > self.formation_phase
+        if switched:
             self.formation_phase = int(angle / (2 * math.pi))
-            formations = ["circle", "spiral", "wave", "diamond", "hexagon", "cross"]
-            self.formation_type = formations[self.formation_phase % len(formations)]
-            print(f"\nSwitching to {self.formation_type} formation!")
-        
-        for i, drone_name in enumerate(self.drone_names):
-            if self.formation_type == "circle":
-                # Circular formation with synchronized vertical movement
-                offset_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                x = center[0] + self.formation_radius * math.cos(offset_angle)
-                y = center[1] + self.formation_radius * math.sin(offset_angle)
-                z = center[2] + 1.0 * math.sin(angle + i)
-                
-            elif self.formation_type == "spiral":
-                # Dynamic spiral formation
-                spiral_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                radius = self.formation_radius * (1 + 0.3 * math.sin(angle + i))
-                x = center[0] + radius * math.cos(spiral_angle)
-                y = center[1] + radius * math.sin(spiral_angle)
-                z = center[2] + 1.5 * math.sin(spiral_angle)
-                
-            elif self.formation_type == "wave":
-                # Complex wave pattern
-                wave_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                x = center[0] + self.formation_radius * math.cos(wave_angle)
-                y = center[1] + self.formation_radius * math.sin(wave_angle)
-                z = center[2] + 2.0 * math.sin(wave_angle * 2 + i)
-                
-            elif self.formation_type == "diamond":
-                # Diamond formation with dynamic scaling
-                diamond_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                radius = self.formation_radius * (1 + 0.5 * math.sin(diamond_angle))
-                x = center[0] + radius * math.cos(diamond_angle)
-                y = center[1] + radius * math.sin(diamond_angle)
-                z = center[2] + 1.0 * math.cos(diamond_angle)
-                
-            elif self.formation_type == "hexagon":
-                # Hexagonal formation with rotation
-                hex_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                radius = self.formation_radius * (1 + 0.2 * math.sin(angle))
-                x = center[0] + radius * math.cos(hex_angle)
-                y = center[1] + radius * math.sin(hex_angle)
-                z = center[2] + 1.0 * math.sin(hex_angle)
-                
-            else:  # cross formation
-                # Cross formation with dynamic movement
-                cross_angle = angle + (2 * math.pi * i / len(self.drone_names))
-                radius = self.formation_radius * (1 + 0.3 * math.cos(cross_angle))
-                x = center[0] + radius * math.cos(cross_angle)
-                y = center[1] + radius * math.sin(cross_angle)
-                z = center[2] + 1.0 * math.sin(cross_angle * 2)
+            self.formation_type = self.formation_sequence[self.formation_phase % len(self.formation_sequence)]
+            log_event(logger, logging.INFO, "formation_switch", formation=self.formation_type, angle=angle)
+        
+        with timers.stage(FORMATION):
+            slots = self.formations.compute(self.formation_type, center, angle)
+            targets = slots[self.assigner.assign(self.state.position, slots, force=switched)]
             
-            # Check for obstacles and adjust if necessary
-            if self.drone_states[drone_name].obstacles:
-                print(f"  {drone_name}: Obstacles detected, adjusting height")
-                z += 0.5
+            # Climb over obstacles seen by LiDAR, or mapped on the way to the target
+            has_obstacles = self.state.obstacle_count > 0
+            valid = self.state.valid
+            if valid.any():
+                blocked = ~self.occupancy.segment_free(self.state.position[valid], targets[valid])
+                has_obstacles[valid] |= blocked
+            targets[has_obstacles, 2] += 0.5
+        if has_obstacles.any():
+            log_event(logger, logging.DEBUG, "obstacle_climb", drones=int(has_obstacles.sum()))
+        
+        return {name: tuple(target) for name, target in zip(self.drone_names, targets.tolist())}
+    
+    def plan_tick(self, angle: float) -> Tuple[Dict[str, Tuple[float, float, float]], Dict[str, Tuple[str, float]]]:
+        """Formation targets for the current states and the drones that must not move this tick"""
+        # Calculate new swarm center
+        self.swarm_center = self.calculate_swarm_center()
+        
+        # Calculate formation positions
+        target_positions = self.calculate_formation_positions(self.swarm_center, angle)
+        
+        # Steer targets clear of the other drones and of obstacles
+        target_positions = self.avoid_collisions(target_positions)
+        
+        # Check the whole swarm for collision risks at once
+        collision_risks = self.find_collision_risks(target_positions)
+        return target_positions, collision_risks
+    
+    def finish_tick(self, target_positions: Dict[str, Tuple[float, float, float]],
+                    collision_risks: Dict[str, Tuple[str, float]]):
+        """Bookkeeping after the commands of a tick went out"""
+        if self.recorder is not None:
+            self.record_telemetry(target_positions, collision_risks)
+        self.tick_count += 1
+    
+    def control_tick(self, angle: float, include_lidar: bool = True):
+        """Run one sense -> plan -> act cycle of the swarm at formation angle ``angle``"""
+        # Update all drone states
+        self.update_drone_states(include_lidar=include_lidar)
+        if self.vo is not None and self.clock.lockstep:
+            self.vo.step()  # the paused simulator only moves between ticks, so VO runs inside them
+        
+        target_positions, collision_risks = self.plan_tick(angle)
+        
+        # Move all drones simultaneously
+        with timers.stage(COMMAND_DISPATCH):
+            futures = []
+            for drone_name, target_pos in target_positions.items():
+                future = self.executor.submit(self.move_drone_async, drone_name, target_pos,
+                                              collision_risks.get(drone_name))
+                futures.append(future)
             
-            positions[drone_name] = (x, y, z)
-            print(f"  {drone_name} target: x={x:.2f}, y={y:.2f}, z={z:.2f}")
-        return positions
+            # Wait for all movements to complete
+            for future in futures:
+                future.result()
+        
+        self.finish_tick(target_positions, collision_risks)
     
-    def execute_swarm_movement(self, duration: float = 30.0):
-        """Execute coordinated swarm movement"""
+    def record_telemetry(self, target_positions: Dict[str, Tuple[float, float, float]],
+                         collision_risks: Dict[str, Tuple[str, float]]):
+        """Append this tick's states, targets and VO estimates to the recorder"""
+        missing = (math.nan, math.nan, math.nan)
+        vo_positions = None
+        if self.vo is not None:
+            estimates = self.vo.get_positions()
+            vo_positions = np.array([estimates.get(name, missing) for name in self.drone_names], dtype=np.float64)
+        self.recorder.record_drones(
+            self.tick_count,
+            positions=self.state.position,  # NaN rows for drones that never reported
+            velocities=self.state.velocity,
+            targets=np.array([target_positions.get(name, missing) for name in self.drone_names], dtype=np.float64),
+            obstacles=self.state.obstacle_count,
+            skipped=np.array([name in collision_risks for name in self.drone_names]),
+            vo_positions=vo_positions,
+            timestamp=self.clock.now(),  # same time base as the ticks, e.g. sim time
+        )
+    
+    def execute_swarm_movement(self, duration: float = 30.0, rate_hz: float = 10.0,
+                               late_policy: str = DEGRADE, angular_speed: float = 0.5):
+        """Execute coordinated swarm movement
+        
+        Ticks run at rate_hz on absolute deadlines of the controller's clock. With the
+        default degrade policy a tick that follows an overrun skips the LiDAR fetch to
+        get back on schedule. With a LockstepClock every tick advances the simulation
+        by exactly one period and none can overrun. The formation turns at
+        ``angular_speed`` rad/s and switches shape after every full turn.
+        """
         print(f"\nStarting swarm movement for {duration} seconds")
-        start_time = time.time()
-        angular_speed = 0.5
         
-        while time.time() - start_time < duration:
+        def tick(info: TickInfo):
+            tick_index = self.tick_count
+            start = time.perf_counter()
             try:
-                # Update all drone states
-                self.update_drone_states()
-                
-                # Calculate new swarm center
-                self.swarm_center = self.calculate_swarm_center()
-                
-                # Calculate formation positions
-                elapsed = time.time() - start_time
-                angle = angular_speed * elapsed
-                target_positions = self.calculate_formation_positions(self.swarm_center, angle)
-                
-                # Move all drones simultaneously
-                print("\nExecuting movement commands:")
-                futures = []
-                for drone_name, target_pos in target_positions.items():
-                    future = self.executor.submit(self.move_drone_async, drone_name, target_pos)
-                    futures.append(future)
-                
-                # Wait for all movements to complete
-                for future in futures:
-                    future.result()
-                
-                time.sleep(0.1)
-                
+                self.control_tick(angular_speed * info.scheduled, include_lidar=not info.degraded)
             except Exception as e:
-                print(f"\nError during swarm movement: {str(e)}")
-                print("Attempting to continue...")
-                time.sleep(1)
+                log_event(logger, logging.ERROR, "tick_error", tick=info.index, error=str(e),
+                          action="continuing")
+                if isinstance(self.client, ResilientClient):
+                    self.client.check_health()  # reconnects if the simulator dropped us
+                else:
+                    time.sleep(1)
+            if self.recorder is not None:
+                self.recorder.record_tick(tick_index, info.scheduled, info.elapsed,
+                                          time.perf_counter() - start, info.degraded,
+                                          timestamp=self.clock.now())
+        
+        loop = ControlLoop(rate_hz, late_policy=late_policy, clock=self.clock.now, sleep=self.clock.sleep)
+        with self.clock:
+            stats = loop.run(tick, duration=duration)
+        print(f"\nSwarm control loop: {stats.summary()}")
+        return stats
     
     def __del__(self):
-        """Cleanup thread pool"""
-        self.executor.shutdown()
+        """Cleanup thread pools"""
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.fetcher is not None:
+            self.fetcher.shutdown()
 
 def main():
+    configure_from_env()
     print("\nInitializing AirSim connection...")
-    client = airsim.MultirotorClient()
+    client = ResilientClient(connect_timeout=60.0)  # waits for the simulator to come up
     client.confirmConnection()
     print("Connected to AirSim!")
     
-    # Initialize drones
-    drone_names = ["Drone1", "Drone2", "Drone3", "Drone4", "Drone5", "Drone6"]
+    # Discover the drones and get all of them in the air at once
+    lifecycle = SwarmLifecycle(ResilientClient)
+    print(f"Discovered vehicles: {lifecycle.drone_names}")
+    print("\nEnabling API control, arming and taking off...")
+    takeoff = lifecycle.takeoff()
+    print(takeoff.summary())
+    drone_names = lifecycle.airborne
+    if not drone_names:
+        lifecycle.emergency_land()
+        lifecycle.shutdown()
+        raise RuntimeError("No drone took off")
     
-    print("\nEnabling API control and arming drones...")
-    # Enable API control and arm drones
-    for drone_name in drone_names:
-        try:
-            print(f"\nSetting up {drone_name}:")
-            print("  Enabling API control...")
-            client.enableApiControl(True, drone_name)
-            print("  Arming...")
-            client.armDisarm(True, drone_name)
-            print("  Taking off...")
-            client.takeoffAsync(vehicle_name=drone_name).join()
-            print(f"  {drone_name} is ready!")
-        except Exception as e:
-            print(f"Error during {drone_name} setup: {str(e)}")
-            raise
-    
-    # Create swarm controller
-    swarm = SwarmController(client, drone_names)
+    # Create swarm controller, recording telemetry if AICLIENT_TELEMETRY names a directory
+    # and pacing it by simulation time if AICLIENT_CLOCK says so
+    recorder = TelemetryRecorder.from_env(drone_names)
+    clock = clock_from_env(ResilientClient())
+    swarm = SwarmController(client, drone_names, recorder=recorder, clock=clock)
     
+    land = lifecycle.land
     try:
         # Execute swarm movement
         swarm.execute_swarm_movement(duration=30)
         
     except Exception as e:
         print(f"\nError during swarm operation: {str(e)}")
+        land = lifecycle.emergency_land  # cancel running moves first
     finally:
         print("\nLanding drones...")
-        # Land all drones
-        for drone_name in drone_names:
-            try:
-                print(f"  Landing {drone_name}...")
-                client.landAsync(vehicle_name=drone_name).join()
-                print(f"  Disarming {drone_name}...")
-                client.armDisarm(False, drone_name)
-                print(f"  Disabling API control for {drone_name}...")
-                client.enableApiControl(False, drone_name)
-                print(f"  {drone_name} landed safely!")
-            except Exception as e:
-                print(f"Error during {drone_name} landing: {str(e)}")
+        # Land every drone at once, including any that failed to take off
+        print(land().summary())
+        lifecycle.shutdown()
+        report_timers()
+        if recorder is not None:
+            recorder.close()
+            print(f"Telemetry written to {recorder.directory}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+class OccupancyMap:
+    """Rolling voxel grid of recent LiDAR hits around the swarm, in world (NED) coordinates
+
+    The grid is a fixed ``shape`` window of ``voxel_size`` voxels stored as a ring
+    buffer: voxel (i, j, k) of the world lives in cell (i % X, j % Y, k % Z), and
+    ``recenter`` only clears the slabs that scroll out of the window, so memory and
+    per-tick cost stay bounded however far the swarm flies. Each cell keeps a hit
+    score and the time of its last update; scores decay with ``decay_time`` and are
+    only brought up to date when a cell is touched, so ageing costs nothing per tick.
+    Free space is not ray-traced: a voxel that is no longer seen fades out instead.
+    """
+    def __init__(self, voxel_size: float = 0.5, shape: Tuple[int, int, int] = (128, 128, 32),
+                 decay_time: float = 5.0, hit_threshold: float = 1.0, max_hits: float = 8.0):
+        self.voxel_size = voxel_size
+        self.shape = np.array(shape, dtype=np.int64)
+        self.decay_time = decay_time
+        self.hit_threshold = hit_threshold
+        self.max_hits = max_hits
+        size = int(np.prod(self.shape))
+        self.hits = np.zeros(size, dtype=np.float32)
+        self.stamps = np.zeros(size, dtype=np.float32)  # seconds since ``epoch``
+        self.origin = -(self.shape // 2)  # world voxel index of the window's lowest corner
+        self.epoch: Optional[float] = None
+        self.now = 0.0
+        self._strides = np.array([shape[1] * shape[2], shape[2], 1], dtype=np.int64)
+
+    def _voxels(self, points: np.ndarray) -> np.ndarray:
+        return np.floor(np.asarray(points, dtype=np.float64) / self.voxel_size).astype(np.int64)
+
+    def _cells(self, voxels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Flat buffer index of world voxels, and whether each lies inside the window"""
+        inside = np.all((voxels >= self.origin) & (voxels < self.origin + self.shape), axis=-1)
+        return (voxels % self.shape) @ self._strides, inside
+
+    def _time(self, timestamp: Optional[float]) -> float:
+        if timestamp is None:
+            return self.now
+        if self.epoch is None:
+            self.epoch = timestamp
+        return timestamp - self.epoch
+
+    def recenter(self, center: Sequence[float]):
+        """Move the window so it is centered on ``center``, dropping what scrolls out"""
+        new_origin = self._voxels(center) - self.shape // 2
+        grid = self.hits.reshape(tuple(self.shape))
+        for axis in range(3):
+            shift = int(new_origin[axis] - self.origin[axis])
+            size = int(self.shape[axis])
+            if shift == 0:
+                continue
+            if abs(shift) >= size:
+                self.hits.fill(0.0)
+                break
+            # World indices leaving the window along this axis
+            leaving = np.arange(self.origin[axis], new_origin[axis]) if shift > 0 else \
+                np.arange(new_origin[axis] + size, self.origin[axis] + size)
+            index = [slice(None)] * 3
+            index[axis] = leaving % size
+            grid[tuple(index)] = 0.0
+        self.origin = new_origin
+
+    def insert(self, points: np.ndarray, timestamp: Optional[float] = None,
+               exclude: Optional[np.ndarray] = None):
+        """Add world-frame (N,3) hits; points in the voxels around ``exclude`` positions (the drones) are ignored"""
+        now = self.now = self._time(timestamp)
+        if len(points) == 0:
+            return
+        voxels = self._voxels(points)
+        cells, inside = self._cells(voxels)
+        cells = cells[inside]
+        if exclude is not None and len(exclude):
+            neighbours = np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing="ij")).reshape(3, -1).T
+            excluded, excluded_inside = self._cells((self._voxels(exclude)[:, None, :] + neighbours).reshape(-1, 3))
+            cells = cells[~np.isin(cells, excluded[excluded_inside])]
+        cells, counts = np.unique(cells, return_counts=True)
+        score = self.hits[cells] * np.exp((self.stamps[cells] - now) / self.decay_time) + counts
+        self.hits[cells] = np.minimum(score, self.max_hits)
+        self.stamps[cells] = now
+
+    def occupancy(self, points: np.ndarray, timestamp: Optional[float] = None) -> np.ndarray:
+        """Decayed hit score at each point (0 outside the window)"""
+        now = self._time(timestamp)
+        cells, inside = self._cells(self._voxels(points))
+        score = self.hits[cells] * np.exp((self.stamps[cells] - now) / self.decay_time)
+        return np.where(inside, score, 0.0)
+
+    def is_occupied(self, points: np.ndarray, timestamp: Optional[float] = None) -> np.ndarray:
+        return self.occupancy(points, timestamp) >= self.hit_threshold
+
+    def segment_free(self, starts: np.ndarray, ends: np.ndarray, timestamp: Optional[float] = None) -> np.ndarray:
+        """(N,) True where the straight segment from starts[i] to ends[i] crosses no occupied voxel
+
+        Segments are sampled every half voxel, all of them in one batch.
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 3)
+        if len(starts) == 0:
+            return np.ones(0, dtype=bool)
+        lengths = np.sqrt(np.einsum('ij,ij->i', ends - starts, ends - starts))
+        samples = max(int(np.ceil(np.nanmax(lengths, initial=0.0) / (self.voxel_size / 2))), 1) + 1
+        fractions = np.linspace(0.0, 1.0, samples)
+        points = starts[:, None, :] + fractions[None, :, None] * (ends - starts)[:, None, :]
+        occupied = self.is_occupied(points.reshape(-1, 3), timestamp).reshape(len(starts), samples)
+        return ~occupied.any(axis=1)
+
+    def nearest_occupied(self, points: np.ndarray, max_distance: float = 3.0,
+                         timestamp: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Distance to and center of the closest occupied voxel within ``max_distance`` of each point
+
+        Returns (N,) distances (inf where there is none) and (N,3) voxel centers (NaN there).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        reach = int(np.ceil(max_distance / self.voxel_size))
+        axis = np.arange(-reach, reach + 1)
+        offsets = np.array(np.meshgrid(axis, axis, axis, indexing="ij")).reshape(3, -1).T
+        centers = (self._voxels(points)[:, None, :] + offsets[None, :, :] + 0.5) * self.voxel_size
+        flat = centers.reshape(-1, 3)
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', centers - points[:, None, :], centers - points[:, None, :]))
+        occupied = self.is_occupied(flat, timestamp).reshape(distance.shape) & (distance <= max_distance)
+        distance = np.where(occupied, distance, np.inf)
+        best = np.argmin(distance, axis=1) if offsets.size else np.zeros(len(points), dtype=np.int64)
+        nearest = distance[np.arange(len(points)), best]
+        location = np.where(np.isfinite(nearest)[:, None], centers[np.arange(len(points)), best], np.nan)
+        return nearest, location
+
+    def occupied_count(self, timestamp: Optional[float] = None) -> int:
+        """Number of voxels currently above the hit threshold (scans the whole window)"""
+        now = self._time(timestamp)
+        return int(np.count_nonzero(self.hits * np.exp((self.stamps - now) / self.decay_time)
+                                    >= self.hit_threshold))
@@ -0,0 +1,226 @@
+import multiprocessing as mp
+import os
+import time
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+import airsim
+from control_loop import ControlLoop, TickInfo
+from instrumentation import configure_from_env, get_logger, report_timers
+from visual_odometry import VisualOdometry
+
+logger = get_logger("parallel_odometry")
+
+# Frames are published by whoever fetched them: the workers themselves ("client"),
+# or the parent process through publish_frame() ("shared")
+FRAME_SOURCES = ("client", "shared")
+
+class SharedFrames:
+    """One grayscale frame slot per drone in shared memory, with a sequence number per slot
+
+    Writers copy into the slot under the drone's lock and bump its sequence number, so
+    readers in other processes get whole frames without anything being pickled.
+    """
+    def __init__(self, num_drones: int, image_size: Tuple[int, int], context=None,
+                 shm: Optional[shared_memory.SharedMemory] = None, locks=None, sequence=None):
+        context = context or mp.get_context()
+        height, width = image_size
+        self.image_size = image_size
+        self.owner = shm is None
+        self.shm = shm or shared_memory.SharedMemory(create=True, size=num_drones * height * width)
+        self.frames = np.ndarray((num_drones, height, width), dtype=np.uint8, buffer=self.shm.buf)
+        self.locks = locks or [context.Lock() for _ in range(num_drones)]
+        self.sequence = sequence if sequence is not None else context.RawArray("q", num_drones)
+
+    def __getstate__(self):
+        return {"image_size": self.image_size, "name": self.shm.name, "locks": self.locks,
+                "sequence": self.sequence, "num_drones": len(self.locks)}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_drones"], state["image_size"], shm=shared_memory.SharedMemory(name=state["name"]),
+                      locks=state["locks"], sequence=state["sequence"])
+
+    def write(self, slot: int, image: np.ndarray):
+        """Store ``image`` (resized to the slot if needed) as the newest frame of ``slot``"""
+        with self.locks[slot]:
+            if image.shape == self.frames[slot].shape:
+                np.copyto(self.frames[slot], image)
+            else:
+                cv2.resize(image, self.image_size[::-1], dst=self.frames[slot])
+            self.sequence[slot] += 1
+
+    def read(self, slot: int, out: np.ndarray) -> int:
+        """Copy the newest frame of ``slot`` into ``out`` and return its sequence number"""
+        with self.locks[slot]:
+            np.copyto(out, self.frames[slot])
+            return self.sequence[slot]
+
+    def close(self):
+        """Detach, and free the segment if this process created it"""
+        del self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _worker_main(worker_id: int, client_factory: Callable[[], airsim.MultirotorClient],
+                 slots: List[Tuple[int, str]], frames: SharedFrames, positions, counts, positions_lock,
+                 stop_event, results, rate_hz: float, mode: str, frame_source: str, share_frames):
+    """Run visual odometry for a subset of drones until ``stop_event`` is set"""
+    cv2.setNumThreads(1)  # one core per worker; OpenCV's own pool would oversubscribe
+    client = client_factory()
+    odometry = {name: VisualOdometry(client, name, mode=mode) for _, name in slots}
+    scratch = np.empty(frames.image_size, dtype=np.uint8)
+    seen = {slot: 0 for slot, _ in slots}
+    table = np.frombuffer(positions, dtype=np.float64).reshape(-1, 3)
+
+    def tick(info: TickInfo):
+        for slot, name in slots:
+            vo = odometry[name]
+            if frame_source == "shared":
+                sequence = frames.read(slot, scratch)
+                if sequence == seen[slot]:
+                    continue  # no new frame since the last tick
+                seen[slot] = sequence
+                position = vo.update(image=scratch)
+            else:
+                image = vo.get_camera_image()
+                if image is None:
+                    continue
+                if share_frames.value:
+                    frames.write(slot, image)  # only once someone asked for latest_frame
+                position = vo.update(image=image)
+            with positions_lock:
+                table[slot] = position
+                counts[slot] += 1
+
+    try:
+        stats = ControlLoop(rate_hz).run(tick, should_stop=stop_event.is_set)
+        results.put((worker_id, stats.summary()))
+    except Exception as e:
+        results.put((worker_id, f"failed: {e}"))
+
+class ParallelSwarmVisualOdometry:
+    """SwarmVisualOdometry with drones spread over worker processes
+
+    Each worker owns its own client and VisualOdometry instances for a subset of the
+    drones, so image decoding, feature work and pose estimation run on separate cores.
+    ``client_factory`` must be picklable when the start method is not fork (e.g. the
+    ``airsim.MultirotorClient`` class or a ``functools.partial`` of it).
+    """
+    def __init__(self, client_factory: Callable[[], airsim.MultirotorClient], drone_names: List[str],
+                 num_workers: Optional[int] = None, rate_hz: float = 10.0, mode: str = "detect",
+                 image_size: Tuple[int, int] = (144, 256), frame_source: str = "client", context=None):
+        if frame_source not in FRAME_SOURCES:
+            raise ValueError(f"Unknown frame source {frame_source!r}, expected one of {FRAME_SOURCES}")
+        self.client_factory = client_factory
+        self.drone_names = list(drone_names)
+        self.slots = {name: i for i, name in enumerate(self.drone_names)}
+        self.num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(self.drone_names)))
+        self.rate_hz = rate_hz
+        self.mode = mode
+        self.frame_source = frame_source
+        self.context = context or mp.get_context()
+
+        self.frames = SharedFrames(len(self.drone_names), image_size, self.context)
+        self._positions = self.context.RawArray("d", 3 * len(self.drone_names))
+        self._counts = self.context.RawArray("q", len(self.drone_names))
+        self._positions_lock = self.context.Lock()
+        self._stop_event = self.context.Event()
+        self._share_frames = self.context.RawValue("b", 0)  # set by latest_frame in client mode
+        self._results = self.context.Queue()
+        self.workers: List[mp.Process] = []
+        self.loop_stats: Dict[int, str] = {}
+
+        print(f"Initialized Parallel Swarm Visual Odometry for drones: {self.drone_names} "
+              f"({self.num_workers} workers)")
+
+    def start(self):
+        """Start one worker process per drone group"""
+        self._stop_event.clear()
+        for worker_id in range(self.num_workers):
+            slots = [(slot, name) for slot, name in enumerate(self.drone_names) if slot % self.num_workers == worker_id]
+            worker = self.context.Process(
+                target=_worker_main, name=f"vo-worker-{worker_id}", daemon=True,
+                args=(worker_id, self.client_factory, slots, self.frames, self._positions, self._counts,
+                      self._positions_lock, self._stop_event, self._results, self.rate_hz, self.mode,
+                      self.frame_source, self._share_frames))
+            worker.start()
+            self.workers.append(worker)
+        print("Started visual odometry workers")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers and collect their loop statistics"""
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        while len(self.loop_stats) < len(self.workers) and time.monotonic() < deadline:
+            try:
+                worker_id, summary = self._results.get(timeout=max(deadline - time.monotonic(), 0.01))
+                self.loop_stats[worker_id] = summary
+            except Exception:
+                break
+        for worker in self.workers:
+            worker.join(max(deadline - time.monotonic(), 0.1))
+            if worker.is_alive():
+                worker.terminate()
+        self.workers = []
+        print("Stopped visual odometry workers")
+        for worker_id, summary in sorted(self.loop_stats.items()):
+            print(f"Visual odometry worker {worker_id}: {summary}")
+
+    def close(self):
+        """Stop the workers if needed and release the shared frame buffers"""
+        if self.workers:
+            self.stop()
+        self.frames.close()
+
+    def publish_frame(self, drone_name: str, image: np.ndarray):
+        """Hand a grayscale frame to the worker of ``drone_name`` (frame_source="shared")"""
+        self.frames.write(self.slots[drone_name], image)
+
+    def latest_frame(self, drone_name: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Copy of the newest frame seen for ``drone_name``
+
+        With frame_source="client" workers only copy their frames into shared memory
+        once this has been called, so the first call may return a blank frame.
+        """
+        self._share_frames.value = 1
+        if out is None:
+            out = np.empty(self.frames.image_size, dtype=np.uint8)
+        self.frames.read(self.slots[drone_name], out)
+        return out
+
+    def update_counts(self) -> Dict[str, int]:
+        """Number of VO updates completed per drone"""
+        with self._positions_lock:
+            counts = list(self._counts)
+        return dict(zip(self.drone_names, counts))
+
+    def get_positions(self) -> Dict[str, Tuple[float, float, float]]:
+        """Get current positions of all drones, all taken from the same instant"""
+        with self._positions_lock:
+            table = np.frombuffer(self._positions, dtype=np.float64).reshape(-1, 3).copy()
+        return {name: tuple(table[slot].tolist()) for name, slot in self.slots.items()}
+
+    def get_relative_positions(self) -> Dict[str, Dict[str, Tuple[float, float, float]]]:
+        """Get relative positions between all drones"""
+        positions = self.get_positions()
+        return {drone1: {drone2: tuple(np.subtract(positions[drone2], positions[drone1]).tolist())
+                         for drone2 in self.drone_names if drone2 != drone1}
+                for drone1 in self.drone_names}
+
+# Example usage:
+if __name__ == "__main__":
+    configure_from_env()
+
+    drone_names = ["Drone1", "Drone2", "Drone3", "Drone4", "Drone5", "Drone6"]
+    swarm_vo = ParallelSwarmVisualOdometry(airsim.MultirotorClient, drone_names,
+                                           mode=os.environ.get("AICLIENT_VO_MODE", "detect"))
+
+    try:
+        swarm_vo.start()
+        time.sleep(30)
+        print(f"Updates per drone: {swarm_vo.update_counts()}")
+    finally:
+        swarm_vo.close()
+        report_timers()
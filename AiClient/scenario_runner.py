@@ -0,0 +1,463 @@
+import argparse
+import contextlib
+import csv
+import functools
+import itertools
+import json
+import logging
+import math
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from collision_avoidance import nearest_pairs
+from connection import ResilientClient, wait_until_ready
+from instrumentation import configure_from_env, get_logger, log_event
+from multi_drones_swarm import SwarmController
+from sim_clock import CLOCK_MODES, make_clock, sim_time
+from swarm_lifecycle import SwarmLifecycle, discover_vehicles
+
+logger = get_logger("scenarios")
+
+# Mission parameters a grid can sweep, with the values used when it does not
+DEFAULT_PARAMETERS: Dict[str, Any] = {
+    "num_drones": 0,            # 0 flies every drone the simulator has
+    "formation_radius": 5.0,
+    "safety_distance": 2.0,
+    "angular_speed": 0.5,
+    "duration": 30.0,
+    "rate_hz": 10.0,
+    "clock": "wall",            # one of sim_clock.CLOCK_MODES
+    "vo_mode": "",              # empty runs without visual odometry
+    "vo_matcher": "bf",
+    "vo_max_corners": 400,
+    "vo_min_tracked": 150,
+    "vo_keyframe_parallax": 30.0,
+}
+
+OK = "ok"
+FAILED = "failed"
+TIMEOUT = "timeout"
+
+@dataclass(frozen=True)
+class Endpoint:
+    host: str
+    port: int
+
+    @staticmethod
+    def parse(text: str) -> "Endpoint":
+        """Endpoint from ``host:port`` or a bare port on localhost"""
+        host, _, port = text.rpartition(":")
+        return Endpoint(host or "127.0.0.1", int(port))
+
+    def __str__(self) -> str:
+        return f"{self.host}:{self.port}"
+
+@dataclass
+class Scenario:
+    index: int
+    params: Dict[str, Any]  # only the swept values; the rest come from DEFAULT_PARAMETERS
+    repeat: int = 0
+
+    def mission_params(self) -> Dict[str, Any]:
+        return {**DEFAULT_PARAMETERS, **self.params}
+
+@dataclass
+class RunResult:
+    scenario: Scenario
+    status: str
+    attempts: int
+    endpoint: str = ""
+    wall_seconds: float = 0.0
+    error: str = ""
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+    def row(self) -> Dict[str, Any]:
+        """Flat result table row: scenario, outcome, swept parameters and metrics"""
+        return {"scenario": self.scenario.index, "repeat": self.scenario.repeat, "status": self.status,
+                "attempts": self.attempts, "endpoint": self.endpoint, "wall_seconds": round(self.wall_seconds, 3),
+                **self.scenario.params, **self.metrics, "error": self.error}
+
+def parse_value(text: str) -> Any:
+    """Grid value from the command line: a JSON number, bool or string, else the text itself"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def parse_grid_arg(text: str) -> Tuple[str, List[Any]]:
+    """(name, values) from ``name=v1,v2,...``"""
+    name, sep, values = text.partition("=")
+    if not sep or not values:
+        raise ValueError(f"expected name=value[,value...], got {text!r}")
+    return name.strip(), [parse_value(value.strip()) for value in values.split(",")]
+
+def expand_grid(grid: Dict[str, Sequence[Any]], repeats: int = 1) -> List[Scenario]:
+    """One scenario per combination of the grid's values, each repeated ``repeats`` times"""
+    unknown = sorted(set(grid) - set(DEFAULT_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters {unknown}, expected some of {sorted(DEFAULT_PARAMETERS)}")
+    for mode in grid.get("clock", ()):
+        if mode not in CLOCK_MODES:
+            raise ValueError(f"Unknown clock mode {mode!r}, expected one of {CLOCK_MODES}")
+    names = list(grid)
+    scenarios = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        for repeat in range(repeats):
+            scenarios.append(Scenario(len(scenarios), dict(zip(names, values)), repeat))
+    return scenarios
+
+class MissionMetrics:
+    """Per-tick accumulation of how well one mission flew"""
+    def __init__(self, safety_distance: float):
+        self.safety_distance = safety_distance
+        self.ticks = 0
+        self.held_moves = 0
+        self.close_ticks = 0  # ticks with two drones closer than the safety distance
+        self.min_separation = math.inf
+        self.squared_error = 0.0
+        self.error_samples = 0
+
+    def add(self, positions: np.ndarray, targets: np.ndarray, held: int):
+        """One tick: (N,3) positions before the move, (N,3) targets (NaN rows skipped), held moves"""
+        self.ticks += 1
+        self.held_moves += held
+        valid = np.isfinite(positions).all(axis=1)
+        points = positions[valid]
+        ids = np.arange(len(points))
+        # Separations beyond a few safety distances do not change the minimum that matters
+        _, _, distance = nearest_pairs(points, points, 4 * self.safety_distance, 1, ids, ids)
+        if len(distance):
+            self.min_separation = min(self.min_separation, float(distance.min()))
+            self.close_ticks += int(distance.min() < self.safety_distance)
+        error = positions - targets
+        squared = np.einsum('ij,ij->i', error, error)
+        squared = squared[np.isfinite(squared)]
+        self.squared_error += float(squared.sum())
+        self.error_samples += len(squared)
+
+    def summary(self) -> Dict[str, float]:
+        return {"ticks": self.ticks, "held_moves": self.held_moves, "close_ticks": self.close_ticks,
+                "min_separation": round(self.min_separation, 3),
+                "formation_rms": round(math.sqrt(self.squared_error / self.error_samples), 3)
+                if self.error_samples else math.nan}
+
+class _MeasuredSwarm(SwarmController):
+    """SwarmController that scores every tick it flies"""
+    metrics: MissionMetrics
+
+    def finish_tick(self, target_positions: Dict[str, Tuple[float, float, float]],
+                    collision_risks: Dict[str, Tuple[str, float]]):
+        missing = (math.nan, math.nan, math.nan)
+        targets = np.array([target_positions.get(name, missing) for name in self.drone_names], dtype=np.float64)
+        self.metrics.add(self.state.position, targets, len(collision_risks))
+        super().finish_tick(target_positions, collision_risks)
+
+def run_mission(endpoint: Endpoint, params: Dict[str, Any]) -> Dict[str, float]:
+    """Fly one mission with ``params`` against the simulator at ``endpoint`` and return its metrics
+
+    The simulator is reset first, so a mission starts from the same state whatever
+    the previous one on this endpoint left behind.
+    """
+    params = {**DEFAULT_PARAMETERS, **params}
+    client_factory = functools.partial(ResilientClient, endpoint.host, endpoint.port, connect_timeout=10.0)
+    client = client_factory()
+    client.simPause(False)  # a lockstep mission that was killed leaves the simulator paused
+    client.reset()
+    drone_names = discover_vehicles(client)
+    if params["num_drones"]:
+        if params["num_drones"] > len(drone_names):
+            raise ValueError(f"{endpoint} has {len(drone_names)} drones, scenario needs {params['num_drones']}")
+        drone_names = drone_names[:params["num_drones"]]
+
+    lifecycle = SwarmLifecycle(client_factory, drone_names)
+    swarm = None
+    vo = None
+    try:
+        takeoff = lifecycle.takeoff()
+        if not lifecycle.airborne:
+            raise RuntimeError(f"No drone took off: {takeoff.summary()}")
+        clock = make_clock(params["clock"], client_factory())
+        swarm = _MeasuredSwarm(client, lifecycle.airborne, client_factory=client_factory, clock=clock)
+        swarm.metrics = MissionMetrics(params["safety_distance"])
+        swarm.safety_distance = params["safety_distance"]
+        swarm.formation_radius = params["formation_radius"]
+        if params["vo_mode"]:
+            from visual_odometry import SwarmVisualOdometry  # needs OpenCV, which missions without VO do not
+            vo = SwarmVisualOdometry(client_factory(), lifecycle.airborne, mode=params["vo_mode"], clock=clock,
+                                     matcher=params["vo_matcher"], max_corners=params["vo_max_corners"],
+                                     min_tracked=params["vo_min_tracked"],
+                                     keyframe_parallax=params["vo_keyframe_parallax"])
+            swarm.vo = vo
+            vo.start()
+        start_positions = _positions(client, lifecycle.airborne)
+        sim_start = sim_time(client)
+        stats = swarm.execute_swarm_movement(duration=params["duration"], rate_hz=params["rate_hz"],
+                                             angular_speed=params["angular_speed"])
+        sim_seconds = sim_time(client) - sim_start
+        if vo is not None:
+            vo.stop()
+        metrics = {"drones": len(lifecycle.airborne), "sim_seconds": round(sim_seconds, 3),
+                   **swarm.metrics.summary(), "overruns": stats.overruns, "skipped": stats.skipped,
+                   "degraded": stats.degraded, "assignment_solves": swarm.assigner.solves}
+        if vo is not None:
+            # Monocular VO has no metric scale, so this mostly ranks VO settings against each other
+            truth = _positions(client, lifecycle.airborne) - start_positions
+            estimates = vo.get_positions()
+            drift = np.array([estimates[name] for name in lifecycle.airborne]) - truth
+            metrics["vo_error"] = round(float(np.sqrt(np.einsum('ij,ij->i', drift, drift).mean())), 3)
+        return metrics
+    finally:
+        if vo is not None and vo.running:
+            vo.stop()
+        lifecycle.land()
+        lifecycle.shutdown()
+        if swarm is not None:
+            swarm.fetcher.shutdown()
+            swarm.executor.shutdown()
+
+def _positions(client, drone_names: Sequence[str]) -> np.ndarray:
+    positions = []
+    for name in drone_names:
+        position = client.getMultirotorState(vehicle_name=name).kinematics_estimated.position
+        positions.append((position.x_val, position.y_val, position.z_val))
+    return np.array(positions, dtype=np.float64)
+
+def _mission_main(endpoint: Endpoint, params: Dict[str, Any], connection):
+    """Child process entry point: run one mission and send back (status, metrics or error)"""
+    configure_from_env()
+    try:
+        connection.send((OK, run_mission(endpoint, params)))
+    except Exception as e:
+        connection.send((FAILED, f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+
+class ScenarioRunner:
+    """Runs scenarios on a pool of simulator endpoints, one mission per endpoint at a time
+
+    Every endpoint has a worker thread that takes the next scenario from a shared
+    queue, so throughput grows with the number of simulators. Each attempt runs in a
+    process of its own that is killed when it exceeds its timeout. A failed or
+    timed-out scenario goes back on the queue for any endpoint to retry, up to
+    ``retries`` more times. An endpoint that stops answering is dropped after
+    ``endpoint_wait`` seconds, and the scenario it was running is retried elsewhere
+    without counting against its retries.
+    """
+    def __init__(self, endpoints: Sequence[Endpoint], timeout: Optional[float] = None, retries: int = 1,
+                 endpoint_wait: float = 10.0, context=None):
+        if not endpoints:
+            raise ValueError("ScenarioRunner needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.timeout = timeout  # seconds per attempt; None allows twice the mission duration plus a minute
+        self.retries = retries
+        self.endpoint_wait = endpoint_wait
+        self.context = context or mp.get_context("spawn")  # forking a process with live threads is unsafe
+        self._queue: "queue.Queue[Tuple[Scenario, int]]" = queue.Queue()
+        self._results: Dict[int, RunResult] = {}
+        self._lock = threading.Lock()
+        self._live_endpoints = 0
+
+    def attempt_timeout(self, scenario: Scenario) -> float:
+        return self.timeout or 2 * float(scenario.mission_params()["duration"]) + 60.0
+
+    def run(self, scenarios: Sequence[Scenario],
+            on_result: Optional[Callable[[RunResult], None]] = None) -> List[RunResult]:
+        """Run every scenario and return their results in scenario order"""
+        self._results = {}
+        self._live_endpoints = len(self.endpoints)
+        for scenario in scenarios:
+            self._queue.put((scenario, 0))
+        workers = [threading.Thread(target=self._worker, args=(endpoint, len(scenarios), on_result),
+                                    name=f"scenario-{endpoint}", daemon=True)
+                   for endpoint in self.endpoints]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Whatever is still queued had no endpoint left to run on
+        while True:
+            try:
+                scenario, attempts = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(RunResult(scenario, FAILED, attempts, error="no endpoint left"), on_result)
+        return [self._results[scenario.index] for scenario in scenarios]
+
+    def _finish(self, result: RunResult, on_result: Optional[Callable[[RunResult], None]]):
+        with self._lock:
+            self._results[result.scenario.index] = result
+        log_event(logger, logging.INFO, "scenario_done", scenario=result.scenario.index, status=result.status,
+                  attempts=result.attempts, endpoint=result.endpoint, seconds=result.wall_seconds)
+        if on_result is not None:
+            on_result(result)
+
+    def _worker(self, endpoint: Endpoint, total: int, on_result: Optional[Callable[[RunResult], None]]):
+        """Run queued scenarios on ``endpoint`` until all are done or the endpoint is gone"""
+        while True:
+            with self._lock:
+                if len(self._results) >= total:
+                    return
+            try:
+                scenario, attempts = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            status, outcome = self._attempt(endpoint, scenario)
+            elapsed = time.perf_counter() - start
+            if status == OK:
+                self._finish(RunResult(scenario, OK, attempts + 1, str(endpoint), elapsed, metrics=outcome),
+                             on_result)
+                continue
+            log_event(logger, logging.WARNING, "scenario_attempt_failed", scenario=scenario.index,
+                      endpoint=str(endpoint), status=status, error=outcome)
+            if not wait_until_ready(endpoint.host, endpoint.port, timeout=self.endpoint_wait):
+                # The simulator went away; the scenario was not at fault
+                self._queue.put((scenario, attempts))
+                with self._lock:
+                    self._live_endpoints -= 1
+                    remaining = self._live_endpoints
+                log_event(logger, logging.ERROR, "endpoint_lost", endpoint=str(endpoint), remaining=remaining)
+                return
+            if attempts < self.retries:
+                self._queue.put((scenario, attempts + 1))
+            else:
+                self._finish(RunResult(scenario, status, attempts + 1, str(endpoint), elapsed, error=outcome),
+                             on_result)
+
+    def _attempt(self, endpoint: Endpoint, scenario: Scenario) -> Tuple[str, Any]:
+        """Run one mission in a child process; (OK, metrics) or (FAILED/TIMEOUT, error text)"""
+        receiver, sender = self.context.Pipe(duplex=False)
+        process = self.context.Process(target=_mission_main, args=(endpoint, scenario.params, sender),
+                                       name=f"scenario-{scenario.index}", daemon=True)
+        process.start()
+        sender.close()
+        timeout = self.attempt_timeout(scenario)
+        try:
+            if not receiver.poll(timeout):
+                return TIMEOUT, f"no result within {timeout:.0f}s"
+            return receiver.recv()
+        except EOFError:
+            return FAILED, f"mission process exited with code {process.exitcode}"
+        finally:
+            receiver.close()
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+                process.join(5.0)
+                if process.is_alive():
+                    process.kill()
+
+def _serve_fake(num_drones: int, obstacles: int, seed: int, latency: float, ready):
+    """Process entry point: serve a fresh fake world on a free port and report the port"""
+    from fake_airsim import FakeAirSimServer, FakeScene, FakeWorld, LidarConfig
+    side = math.ceil(math.sqrt(num_drones))
+    world = FakeWorld(vehicles={f"Drone{i + 1}": (3.0 * (i % side), 3.0 * (i // side), -2.0)
+                                for i in range(num_drones)},
+                      scene=FakeScene.random(obstacles, seed=seed), lidar=LidarConfig(points_per_scan=64),
+                      seed=seed)
+    server = FakeAirSimServer(world, port=0, latency=latency, workers=8)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+class FakeEndpoints:
+    """Context manager running ``count`` local fake simulators, each in its own process
+
+    Entering starts them and returns their endpoints; every world has the same
+    drones and obstacles, so any of them can run any scenario.
+    """
+    def __init__(self, count: int, num_drones: int = 6, obstacles: int = 20, seed: int = 0,
+                 latency: float = 0.0, context=None):
+        self.count = count
+        self.num_drones = num_drones
+        self.obstacles = obstacles
+        self.seed = seed
+        self.latency = latency
+        self.context = context or mp.get_context("spawn")
+        self.processes: List[mp.Process] = []
+
+    def __enter__(self) -> List[Endpoint]:
+        ready = self.context.Queue()
+        for index in range(self.count):
+            process = self.context.Process(target=_serve_fake, name=f"fake-airsim-{index}", daemon=True,
+                                           args=(self.num_drones, self.obstacles, self.seed, self.latency, ready))
+            process.start()
+            self.processes.append(process)
+        try:
+            return [Endpoint("127.0.0.1", ready.get(timeout=60.0)) for _ in self.processes]
+        except queue.Empty:
+            self.__exit__(None, None, None)
+            raise RuntimeError("fake simulators did not start within 60s")
+
+    def __exit__(self, exc_type, exc, tb):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(5.0)
+        self.processes = []
+        return False
+
+def write_results(results: Sequence[RunResult], path: str):
+    """Write the result table as CSV; columns are the union of every row's keys"""
+    rows = [result.row() for result in results]
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    columns.pop("error", None)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[*columns, "error"], restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a grid of swarm missions across several simulators")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2",
+                        help=f"Values to sweep for one parameter; one of {', '.join(DEFAULT_PARAMETERS)}")
+    parser.add_argument("--grid", help="JSON file mapping parameter names to lists of values")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per parameter combination")
+    parser.add_argument("--endpoints", nargs="+", default=[], metavar="HOST:PORT",
+                        help="Simulators to run missions on (default: 127.0.0.1:41451)")
+    parser.add_argument("--fake", type=int, default=0, metavar="N", help="Start N local fake simulators instead")
+    parser.add_argument("--fake-drones", type=int, default=6, help="Drones in each fake simulator")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds per attempt (default: twice the mission duration plus 60)")
+    parser.add_argument("--retries", type=int, default=1, help="Extra attempts for a failed scenario")
+    parser.add_argument("--output", default="scenario_results.csv", help="Where to write the result table")
+    args = parser.parse_args(argv)
+    configure_from_env()
+
+    grid: Dict[str, List[Any]] = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    grid.update(parse_grid_arg(text) for text in args.param)
+    scenarios = expand_grid(grid, args.repeats)
+
+    def report(result: RunResult):
+        summary = ", ".join(f"{key}={value}" for key, value in result.metrics.items()) or result.error
+        print(f"  [{result.scenario.index + 1}/{len(scenarios)}] {result.status:<7} {result.scenario.params} "
+              f"on {result.endpoint or '-'} in {result.wall_seconds:.1f}s: {summary}")
+
+    with contextlib.ExitStack() as stack:
+        if args.fake:
+            endpoints = stack.enter_context(FakeEndpoints(args.fake, num_drones=args.fake_drones))
+        else:
+            endpoints = [Endpoint.parse(text) for text in args.endpoints or ["41451"]]
+        print(f"Running {len(scenarios)} scenarios on {len(endpoints)} simulators: "
+              f"{', '.join(str(endpoint) for endpoint in endpoints)}")
+        start = time.perf_counter()
+        results = ScenarioRunner(endpoints, timeout=args.timeout, retries=args.retries).run(scenarios, report)
+        elapsed = time.perf_counter() - start
+
+    write_results(results, args.output)
+    succeeded = sum(result.status == OK for result in results)
+    print(f"\n{succeeded}/{len(results)} scenarios succeeded in {elapsed:.1f}s; results written to {args.output}")
+    return 0 if succeeded == len(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+import argparse
+import json
+import mmap
+import os
+import threading
+import time
+import cv2
+import msgpack
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import airsim
+from control_loop import ControlLoop, TickInfo
+from connection import connect
+from fake_airsim import to_msgpack
+from visual_odometry import VisualOdometry
+
+# Every response is one msgpack blob in data.bin; index.bin holds one of these per blob
+INDEX_DTYPE = np.dtype([("stream", "<u2"), ("time", "<f8"), ("offset", "<u8"), ("length", "<u4")])
+DATA_FILE = "data.bin"
+INDEX_FILE = "index.bin"
+STREAMS_FILE = "streams.json"
+
+# LiDAR point clouds and float images are stored as raw float32 under this msgpack
+# ext code, the precision AirSim sends them in; every other float keeps its doubles
+FLOAT32_EXT = 1
+BULK_FLOAT_FIELDS = frozenset(("point_cloud", "image_data_float"))
+
+# Recorded methods and how to rebuild their return values
+DECODERS: Dict[str, Callable[[object], object]] = {
+    "getMultirotorState": airsim.MultirotorState.from_msgpack,
+    "getLidarData": airsim.LidarData.from_msgpack,
+    "simGetImages": lambda responses: [airsim.ImageResponse.from_msgpack(r) for r in responses],
+}
+
+def _pack_bulk_floats(value):
+    """Replace bulk float lists inside a to_msgpack value with float32 ext blobs"""
+    if isinstance(value, dict):
+        return {key: (msgpack.ExtType(FLOAT32_EXT, np.asarray(item, dtype="<f4").tobytes())
+                      if key in BULK_FLOAT_FIELDS and isinstance(item, list) else _pack_bulk_floats(item))
+                for key, item in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return [_pack_bulk_floats(item) for item in value]
+    return value
+
+def _unpack_ext(code: int, data: bytes):
+    if code == FLOAT32_EXT:
+        return np.frombuffer(data, dtype="<f4").tolist()
+    return msgpack.ExtType(code, data)
+
+class ReplayExhausted(EOFError):
+    """A replayed stream has no more recorded responses"""
+
+def _field(obj, name: str):
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+def image_stream_key(requests: Sequence[airsim.ImageRequest]) -> str:
+    """Stable description of an image request list, part of the stream key"""
+    return ",".join(f"{_field(r, 'camera_name')}:{int(_field(r, 'image_type'))}:"
+                    f"{int(bool(_field(r, 'pixels_as_float')))}:{int(bool(_field(r, 'compress')))}"
+                    for r in requests)
+
+def stream_key(method: str, vehicle_name: str, detail: str = "") -> str:
+    """Streams are replayed independently per method, vehicle and request details"""
+    return f"{method}|{vehicle_name}|{detail}"
+
+class RecordingSession:
+    """Append-only capture of sensor responses to ``directory``
+
+    Responses are packed with msgpack, as on the wire, and appended to one data file;
+    point clouds and float images go in as float32 blocks rather than per-value floats;
+    the index file gets a fixed-size (stream, time, offset, length) row per response, so
+    a replay can jump to any record without scanning. Shared by all wrapped clients.
+    """
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.streams: Dict[str, int] = {}
+        self.vehicles: List[str] = []
+        self._data = open(os.path.join(directory, DATA_FILE), "wb")
+        self._index = open(os.path.join(directory, INDEX_FILE), "wb")
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._offset = 0
+        self._row = np.zeros(1, dtype=INDEX_DTYPE)
+        self._lock = threading.Lock()
+
+    def wrap(self, client: airsim.MultirotorClient) -> "RecordingClient":
+        """Client that records its sensor responses into this session"""
+        return RecordingClient(client, self)
+
+    def factory(self, client_factory: Callable[[], airsim.MultirotorClient]) -> Callable[[], "RecordingClient"]:
+        """Wrap a client factory, e.g. for SwarmController's per-thread acquisition clients"""
+        return lambda: self.wrap(client_factory())
+
+    def append(self, method: str, vehicle_name: str, detail: str, value):
+        """Store one response of ``method`` for ``vehicle_name``"""
+        blob = self._packer.pack(_pack_bulk_floats(to_msgpack(value)))
+        key = stream_key(method, vehicle_name, detail)
+        with self._lock:
+            if key not in self.streams:
+                self.streams[key] = len(self.streams)
+                if vehicle_name not in self.vehicles:
+                    self.vehicles.append(vehicle_name)
+                self._write_streams()
+            self._row[0] = (self.streams[key], time.time(), self._offset, len(blob))
+            self._data.write(blob)
+            self._index.write(self._row.tobytes())
+            self._offset += len(blob)
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+            self._write_streams()
+
+    def _write_streams(self):
+        path = os.path.join(self.directory, STREAMS_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"streams": self.streams, "vehicles": self.vehicles}, f)
+        os.replace(path + ".tmp", path)
+
+class RecordingClient:
+    """Pass-through client that records state, LiDAR and image responses"""
+    def __init__(self, client: airsim.MultirotorClient, session: RecordingSession):
+        self._client = client
+        self._session = session
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def getMultirotorState(self, vehicle_name: str = ""):
+        state = self._client.getMultirotorState(vehicle_name=vehicle_name)
+        self._session.append("getMultirotorState", vehicle_name, "", state)
+        return state
+
+    def getLidarData(self, lidar_name: str = "", vehicle_name: str = ""):
+        lidar = self._client.getLidarData(lidar_name=lidar_name, vehicle_name=vehicle_name)
+        self._session.append("getLidarData", vehicle_name, lidar_name, lidar)
+        return lidar
+
+    def simGetImages(self, requests, vehicle_name: str = "", external: bool = False):
+        responses = self._client.simGetImages(requests, vehicle_name=vehicle_name)
+        self._session.append("simGetImages", vehicle_name, image_stream_key(requests), responses)
+        return responses
+
+class ReplaySession:
+    """Random-access reader for a RecordingSession directory, with per-stream cursors
+
+    Every (method, vehicle, request) stream is replayed in recorded order no matter how
+    calls from different threads interleave, which keeps replays deterministic.
+    """
+    def __init__(self, directory: str, loop: bool = False):
+        self.directory = directory
+        self.loop = loop
+        with open(os.path.join(directory, STREAMS_FILE)) as f:
+            meta = json.load(f)
+        self.streams: Dict[str, int] = meta["streams"]
+        self.vehicles: List[str] = meta["vehicles"]
+        self.index = np.fromfile(os.path.join(directory, INDEX_FILE), dtype=INDEX_DTYPE)
+        order = np.argsort(self.index["stream"], kind="stable")
+        bounds = np.searchsorted(self.index["stream"][order], np.arange(len(self.streams) + 1))
+        self.records = {key: order[bounds[i]:bounds[i + 1]] for key, i in self.streams.items()}
+        self.cursors = {key: 0 for key in self.streams}
+        with open(os.path.join(directory, DATA_FILE), "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._lock = threading.Lock()
+
+    def client(self) -> "ReplayClient":
+        """A client reading from this session; all clients share the cursors"""
+        return ReplayClient(self)
+
+    def count(self, key: str) -> int:
+        """Number of recorded responses in a stream"""
+        return len(self.records[key])
+
+    def read(self, key: str, position: int):
+        """Decoded response ``position`` of a stream, without moving its cursor"""
+        row = self.index[self.records[key][position]]
+        method = key.split("|", 1)[0]
+        raw = msgpack.unpackb(self._data[row["offset"]:row["offset"] + row["length"]], raw=False,
+                            ext_hook=_unpack_ext)
+        return DECODERS[method](raw)
+
+    def next(self, method: str, vehicle_name: str, detail: str = ""):
+        """Next response of a stream, advancing its cursor"""
+        key = stream_key(method, vehicle_name, detail)
+        if key not in self.records:
+            raise KeyError(f"No recorded {method} stream for {vehicle_name!r} ({detail or 'default'})")
+        with self._lock:
+            position = self.cursors[key]
+            if position >= len(self.records[key]):
+                if not self.loop or not len(self.records[key]):
+                    raise ReplayExhausted(key)
+                position = 0
+            self.cursors[key] = position + 1
+        return self.read(key, position)
+
+    def rewind(self):
+        """Restart every stream from its first record"""
+        with self._lock:
+            self.cursors = {key: 0 for key in self.streams}
+
+class _Done:
+    """Stand-in for an msgpack-rpc future of a command that is not replayed"""
+    def join(self):
+        return None
+
+    def get(self):
+        return True
+
+class ReplayClient:
+    """Client-compatible reader that serves recorded sensor data as fast as it is asked for
+
+    Sensor calls return the next recorded response of their stream; commands are
+    accepted and ignored, since the recording already contains their effect.
+    """
+    def __init__(self, session: ReplaySession):
+        self.session = session
+
+    # ------------------------------------------------------------- sensors
+    def getMultirotorState(self, vehicle_name: str = "") -> airsim.MultirotorState:
+        return self.session.next("getMultirotorState", vehicle_name)
+
+    def getLidarData(self, lidar_name: str = "", vehicle_name: str = "") -> airsim.LidarData:
+        return self.session.next("getLidarData", vehicle_name, lidar_name)
+
+    def simGetImages(self, requests, vehicle_name: str = "", external: bool = False) -> List[airsim.ImageResponse]:
+        return self.session.next("simGetImages", vehicle_name, image_stream_key(requests))
+
+    # ------------------------------------------------------------ session
+    def confirmConnection(self):
+        print(f"Replaying recording {self.session.directory}")
+
+    def ping(self) -> bool:
+        return True
+
+    def reset(self):
+        self.session.rewind()
+
+    def listVehicles(self) -> List[str]:
+        return list(self.session.vehicles)
+
+    def enableApiControl(self, is_enabled: bool, vehicle_name: str = ""):
+        pass
+
+    def isApiControlEnabled(self, vehicle_name: str = "") -> bool:
+        return True
+
+    def armDisarm(self, arm: bool, vehicle_name: str = "") -> bool:
+        return True
+
+    def simPause(self, is_paused: bool):
+        pass
+
+    def simIsPause(self) -> bool:
+        return False
+
+    def simContinueForTime(self, seconds: float):
+        pass
+
+    # ------------------------------------------------------------ commands
+    def takeoffAsync(self, timeout_sec: float = 20, vehicle_name: str = "") -> _Done:
+        return _Done()
+
+    def landAsync(self, timeout_sec: float = 60, vehicle_name: str = "") -> _Done:
+        return _Done()
+
+    def hoverAsync(self, vehicle_name: str = "") -> _Done:
+        return _Done()
+
+    def moveToPositionAsync(self, *args, **kwargs) -> _Done:
+        return _Done()
+
+    def moveOnPathAsync(self, *args, **kwargs) -> _Done:
+        return _Done()
+
+    def moveByVelocityAsync(self, *args, **kwargs) -> _Done:
+        return _Done()
+
+def record(client: airsim.MultirotorClient, directory: str, drone_names: Sequence[str], duration: float,
+           rate_hz: float = 10.0, lidar_name: str = "Lidar1",
+           camera_requests: Optional[List[airsim.ImageRequest]] = None) -> Tuple[RecordingSession, str]:
+    """Poll state, LiDAR and camera of every drone at ``rate_hz`` into a new recording"""
+    session = RecordingSession(directory)
+    recorder = session.wrap(client)
+    requests = camera_requests or [airsim.ImageRequest("front_center", airsim.ImageType.Scene, False, False)]
+
+    def tick(info: TickInfo):
+        for drone_name in drone_names:
+            recorder.getMultirotorState(vehicle_name=drone_name)
+            if lidar_name:
+                recorder.getLidarData(lidar_name=lidar_name, vehicle_name=drone_name)
+            recorder.simGetImages(requests, vehicle_name=drone_name)
+
+    try:
+        stats = ControlLoop(rate_hz).run(tick, duration=duration)
+    finally:
+        session.close()
+    return session, stats.summary()
+
+def replay_odometry(directory: str, drone_name: str, mode: str = "detect", seed: int = 0) -> Dict[str, float]:
+    """Run VisualOdometry over every recorded frame of one drone as fast as possible"""
+    cv2.setRNGSeed(seed)  # RANSAC in findEssentialMat draws from OpenCV's global RNG
+    session = ReplaySession(directory)
+    client = session.client()
+    vo = VisualOdometry(client, drone_name, mode=mode)
+    frames = session.count(stream_key("simGetImages", drone_name, image_stream_key(vo.ingestor.requests)))
+    start = time.perf_counter()
+    for _ in range(frames):
+        vo.update()
+    elapsed = time.perf_counter() - start
+    return {"frames": frames, "seconds": elapsed, "fps": frames / elapsed if elapsed else 0.0,
+            "x": float(vo.position[0]), "y": float(vo.position[1]), "z": float(vo.position[2])}
+
+def main():
+    parser = argparse.ArgumentParser(description="Record AirSim sensor streams, or replay them through VO")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="Poll a running simulator into a recording")
+    rec.add_argument("directory")
+    rec.add_argument("--drones", nargs="+", default=["Drone1"])
+    rec.add_argument("--duration", type=float, default=30.0)
+    rec.add_argument("--rate", type=float, default=10.0)
+    rec.add_argument("--lidar", default="Lidar1", help="LiDAR sensor name, empty to skip LiDAR")
+    rep = commands.add_parser("replay", help="Run visual odometry over a recording faster than real time")
+    rep.add_argument("directory")
+    rep.add_argument("--drone", default="Drone1")
+    rep.add_argument("--mode", default="detect", choices=["detect", "track"])
+    args = parser.parse_args()
+
+    if args.command == "record":
+        client = connect()
+        _, summary = record(client, args.directory, args.drones, args.duration, args.rate, args.lidar)
+        print(f"Recorded {args.drones} to {args.directory}: {summary}")
+    else:
+        result = replay_odometry(args.directory, args.drone, args.mode)
+        print(f"Replayed {result['frames']} frames in {result['seconds']:.2f}s ({result['fps']:.1f} fps), "
+              f"final VO position ({result['x']:.2f}, {result['y']:.2f}, {result['z']:.2f})")
+
+if __name__ == "__main__":
+    main()
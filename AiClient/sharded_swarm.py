@@ -0,0 +1,369 @@
+import argparse
+import logging
+import math
+import multiprocessing as mp
+import os
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional, Sequence, Tuple
+import airsim
+from collision_avoidance import AvoidanceEngine
+from control_loop import ControlLoop, DEGRADE, TickInfo
+from connection import ResilientClient
+from formations import FormationEngine
+from formation_assignment import SlotAssigner
+from instrumentation import (COLLISION_AVOIDANCE, COLLISION_CHECK, COMMAND_DISPATCH, FORMATION,
+                             STATE_FETCH, configure_from_env, get_logger, log_event, report_timers, timers)
+from lidar_processing import extract_obstacles
+from sim_clock import Clock, WallClock, clock_from_env
+from swarm_acquisition import SwarmStateFetcher
+from swarm_lifecycle import DroneTiming, PhaseReport, SwarmLifecycle, _wait
+from swarm_proximity import ProximityEngine
+
+logger = get_logger("sharded_swarm")
+
+# One row per drone, shared by the coordinator and every shard
+STATE_DTYPE = np.dtype([
+    ("position", "f8", (3,)),
+    ("velocity", "f8", (3,)),
+    ("obstacles", "i4"),        # LiDAR points within 3 m at the last scan
+    ("state_tick", "i8"),       # tick of the last successful state read, -1 if never
+    ("target", "f8", (3,)),
+    ("command", "?"),           # send target this tick (False when held back by the collision check)
+    ("phase_ok", "?"),          # the last takeoff or landing succeeded
+    ("phase_seconds", "f8"),    # and took this long
+])
+
+# Phases the coordinator asks the shards to run, written to the control block before each barrier
+SENSE, SENSE_NO_LIDAR, ACT, TAKEOFF, LAND, STOP = range(6)
+
+class SwarmStateTable:
+    """Structured per-drone state table in shared memory, attachable from other processes"""
+    def __init__(self, num_drones: int, shm: Optional[shared_memory.SharedMemory] = None):
+        self.num_drones = num_drones
+        # Forked children inherit this object, so ownership is tied to the creating process
+        self.owner_pid = os.getpid() if shm is None else None
+        self.shm = shm or shared_memory.SharedMemory(create=True, size=max(num_drones * STATE_DTYPE.itemsize, 1))
+        self.rows = np.ndarray((num_drones,), dtype=STATE_DTYPE, buffer=self.shm.buf)
+        if self.owner_pid is not None:
+            self.rows[:] = np.zeros(num_drones, dtype=STATE_DTYPE)
+            self.rows["state_tick"] = -1
+
+    def __getstate__(self):
+        return {"num_drones": self.num_drones, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_drones"], shm=shared_memory.SharedMemory(name=state["name"]))
+
+    def close(self):
+        """Detach, and free the segment if this process created it"""
+        del self.rows
+        self.shm.close()
+        if self.owner_pid == os.getpid():
+            self.shm.unlink()
+
+def _shard_main(shard_id: int, client_factory: Callable[[], airsim.MultirotorClient], rows: List[Tuple[int, str]],
+                table: SwarmStateTable, control, start_barrier, done_barrier, lidar_name: str, velocity: float,
+                fetch_workers: int):
+    """Serve the coordinator's phases for one subset of the drones until STOP"""
+    names = [name for _, name in rows]
+    client = client_factory()
+    fetcher = SwarmStateFetcher(client_factory, names, lidar_name=lidar_name,
+                                max_workers=min(fetch_workers, len(names)))
+    state = table.rows
+
+    def sense(include_lidar: bool):
+        snapshot = fetcher.fetch(include_lidar=include_lidar)
+        for slot, name in rows:
+            sample = snapshot.samples[name]
+            if sample.error is not None:
+                log_event(logger, logging.WARNING, "state_error", shard=shard_id, drone=name, error=sample.error)
+                continue
+            kinematics = sample.state.kinematics_estimated
+            position, velocity_ = kinematics.position, kinematics.linear_velocity
+            state["position"][slot] = (position.x_val, position.y_val, position.z_val)
+            state["velocity"][slot] = (velocity_.x_val, velocity_.y_val, velocity_.z_val)
+            if sample.lidar is not None:
+                state["obstacles"][slot] = len(extract_obstacles(sample.lidar.point_cloud, max_range=3.0))
+            state["state_tick"][slot] = control[1]
+
+    def act():
+        for slot, name in rows:
+            if state["command"][slot]:
+                x, y, z = state["target"][slot].tolist()
+                client.moveToPositionAsync(x, y, z, velocity, vehicle_name=name)
+
+    def lifecycle(action: str, before: Callable[[str], None], command, after: Callable[[str], None]):
+        """Start ``command`` on every drone at once, then record per drone whether it finished in time"""
+        timeout = float(control[2])
+        start = time.perf_counter()
+        futures = []
+        for slot, name in rows:
+            state["phase_ok"][slot] = False
+            state["phase_seconds"][slot] = 0.0
+            try:
+                before(name)
+                futures.append((slot, name, command(name, timeout)))
+            except Exception as e:
+                log_event(logger, logging.WARNING, "lifecycle_error", shard=shard_id, drone=name, error=str(e))
+        for slot, name, future in futures:
+            try:
+                _wait(future, action, timeout)
+                after(name)
+                state["phase_ok"][slot] = True
+            except Exception as e:
+                log_event(logger, logging.WARNING, "lifecycle_error", shard=shard_id, drone=name, error=str(e))
+            state["phase_seconds"][slot] = time.perf_counter() - start
+
+    def takeoff():
+        lifecycle("takeoff", lambda name: (client.enableApiControl(True, name), client.armDisarm(True, name)),
+                  lambda name, timeout: client.takeoffAsync(timeout_sec=timeout, vehicle_name=name),
+                  lambda name: None)
+
+    def land():
+        lifecycle("landing", lambda name: None,
+                  lambda name, timeout: client.landAsync(timeout_sec=timeout, vehicle_name=name),
+                  lambda name: (client.armDisarm(False, name), client.enableApiControl(False, name)))
+
+    try:
+        while True:
+            start_barrier.wait()
+            phase = control[0]
+            if phase == STOP:
+                break
+            try:
+                if phase in (SENSE, SENSE_NO_LIDAR):
+                    sense(include_lidar=phase == SENSE)
+                elif phase == ACT:
+                    act()
+                elif phase == TAKEOFF:
+                    takeoff()
+                elif phase == LAND:
+                    land()
+            except Exception as e:
+                log_event(logger, logging.ERROR, "shard_error", shard=shard_id, phase=phase, error=str(e))
+            done_barrier.wait()
+    except threading.BrokenBarrierError:
+        pass  # the coordinator went away
+    finally:
+        fetcher.shutdown()
+        del state
+        table.close()
+
+class ShardedSwarmController:
+    """SwarmController for large swarms: shard processes talk to AirSim, one coordinator plans
+
+    Every shard owns a contiguous block of drones, its own RPC connections and a
+    SwarmStateFetcher for them. Shards write state into a shared SwarmStateTable; the
+    coordinator plans formation targets over the whole table with array operations,
+    steers them apart, holds back the moves that still conflict and writes the
+    commands back for the shards to send.
+    """
+    def __init__(self, client_factory: Callable[[], airsim.MultirotorClient],
+                 drone_names: Optional[Sequence[str]] = None, num_shards: Optional[int] = None,
+                 safety_distance: float = 2.0, formation_radius: Optional[float] = None,
+                 lidar_name: str = "Lidar1", velocity: float = 2.0, fetch_workers: int = 8,
+                 phase_timeout: float = 30.0, context=None, clock: Optional[Clock] = None):
+        if drone_names is None:
+            drone_names = client_factory().listVehicles()
+        self.client_factory = client_factory
+        self.drone_names = list(drone_names)
+        count = len(self.drone_names)
+        self.num_shards = max(1, min(num_shards or os.cpu_count() or 1, count))
+        self.phase_timeout = phase_timeout
+        self.context = context or mp.get_context()
+        self.clock = clock or WallClock()
+
+        # Large swarms get a larger ring so neighbours stay about as far apart as with 6 drones
+        radius = formation_radius or max(5.0, safety_distance * 1.5 * count / (2 * math.pi))
+        self.proximity = ProximityEngine(safety_distance=safety_distance)
+        self.avoidance = AvoidanceEngine(safety_distance=safety_distance)
+        self.formations = FormationEngine(count, radius=radius)
+        self.assigner = SlotAssigner(count)
+        self.formation_sequence = ["circle", "spiral", "wave", "diamond", "hexagon", "cross"]
+        self.formation_type = "circle"
+        self.formation_phase = 0
+        self.swarm_center = np.array([0.0, 0.0, -3.0])
+        self.tick_count = 0
+
+        self.table = SwarmStateTable(count)
+        self._control = self.context.RawArray("q", 3)  # phase, tick, per-drone takeoff/landing timeout
+        self._start = self.context.Barrier(self.num_shards + 1)
+        self._done = self.context.Barrier(self.num_shards + 1)
+        bounds = np.linspace(0, count, self.num_shards + 1).astype(int)
+        self.shards = []
+        for shard_id in range(self.num_shards):
+            rows = [(row, self.drone_names[row]) for row in range(bounds[shard_id], bounds[shard_id + 1])]
+            shard = self.context.Process(
+                target=_shard_main, name=f"swarm-shard-{shard_id}", daemon=True,
+                args=(shard_id, client_factory, rows, self.table, self._control, self._start, self._done,
+                      lidar_name, velocity, fetch_workers))
+            shard.start()
+            self.shards.append(shard)
+        print(f"\nInitializing Sharded Swarm Controller with {count} drones in {self.num_shards} shards")
+
+    def _run_phase(self, phase: int, timeout: Optional[float] = None):
+        """Have every shard run ``phase`` and wait until all are done"""
+        self._control[0] = phase
+        self._control[1] = self.tick_count
+        self._start.wait(timeout or self.phase_timeout)
+        if phase != STOP:
+            self._done.wait(timeout or self.phase_timeout)
+
+    def _lifecycle_phase(self, phase: int, name: str, timeout: float) -> PhaseReport:
+        """Run TAKEOFF or LAND on every shard and collect the per-drone results from the table"""
+        self._control[2] = math.ceil(timeout)
+        start = time.perf_counter()
+        self._run_phase(phase, timeout + 10.0)
+        rows = self.table.rows
+        report = PhaseReport(name, time.perf_counter() - start)
+        for row, drone in enumerate(self.drone_names):
+            report.timings[drone] = DroneTiming(drone, float(rows["phase_seconds"][row]),
+                                                None if rows["phase_ok"][row] else f"{name} failed")
+        for drone in report.failed:
+            log_event(logger, logging.WARNING, "lifecycle_error", phase=name, drone=drone)
+        return report
+
+    def takeoff(self, timeout: float = 30.0) -> PhaseReport:
+        """Enable, arm and take off every drone, all shards in parallel; ``timeout`` is per drone"""
+        return self._lifecycle_phase(TAKEOFF, "takeoff", timeout)
+
+    def land(self, timeout: float = 60.0) -> PhaseReport:
+        """Land and disarm every drone, all shards in parallel
+
+        If a shard broke the phase barriers earlier (e.g. by timing out), the shards can
+        no longer be reached, so the coordinator lands every drone itself.
+        """
+        try:
+            return self._lifecycle_phase(LAND, "land", timeout)
+        except threading.BrokenBarrierError:
+            log_event(logger, logging.ERROR, "shard_barrier_broken", action="landing from the coordinator")
+            lifecycle = SwarmLifecycle(self.client_factory, self.drone_names)
+            try:
+                return lifecycle.land(timeout)
+            finally:
+                lifecycle.shutdown()
+
+    def plan(self, angle: float):
+        """Write formation targets and command flags for every drone with a known state"""
+        rows = self.table.rows
+        valid = rows["state_tick"] >= 0
+        if not valid.any():
+            rows["command"] = False
+            return
+        positions = rows["position"]
+
+        switched = int(angle / (2 * math.pi)) > self.formation_phase
+        if switched:
+            self.formation_phase = int(angle / (2 * math.pi))
+            self.formation_type = self.formation_sequence[self.formation_phase % len(self.formation_sequence)]
+            log_event(logger, logging.INFO, "formation_switch", formation=self.formation_type, angle=angle)
+
+        with timers.stage(FORMATION):
+            self.swarm_center = positions[valid].mean(axis=0)
+            slots = self.formations.compute(self.formation_type, self.swarm_center, angle)
+            # Drones without state have NaN positions and take whichever slots are left
+            targets = slots[self.assigner.assign(np.where(valid[:, None], positions, np.nan), slots, force=switched)]
+            targets[rows["obstacles"] > 0, 2] += 0.5  # climb over obstacles seen by LiDAR
+
+        with timers.stage(COLLISION_AVOIDANCE):
+            index = np.flatnonzero(valid)
+            targets[index] = self.avoidance.adjust(targets[index], positions[index], rows["velocity"][index]).targets
+
+        with timers.stage(COLLISION_CHECK):
+            held = np.zeros(len(rows), dtype=bool)
+            report = self.proximity.check(targets[index], positions[index])
+            held[index[report.violations]] = True
+        if held.any():
+            log_event(logger, logging.INFO, "moves_held", drones=int(held.sum()), minimum=self.proximity.safety_distance)
+
+        rows["target"] = targets
+        rows["command"] = valid & ~held
+
+    def control_tick(self, angle: float, include_lidar: bool = True):
+        """Sense in all shards, plan over the whole table, act in all shards"""
+        with timers.stage(STATE_FETCH):
+            self._run_phase(SENSE if include_lidar else SENSE_NO_LIDAR)
+        self.plan(angle)
+        with timers.stage(COMMAND_DISPATCH):
+            self._run_phase(ACT)
+        self.tick_count += 1
+
+    def execute_swarm_movement(self, duration: float = 30.0, rate_hz: float = 10.0,
+                               late_policy: str = DEGRADE):
+        """Execute coordinated swarm movement at rate_hz, as SwarmController does"""
+        print(f"\nStarting sharded swarm movement for {duration} seconds")
+        angular_speed = 0.5
+
+        def tick(info: TickInfo):
+            self.control_tick(angular_speed * info.scheduled, include_lidar=not info.degraded)
+
+        loop = ControlLoop(rate_hz, late_policy=late_policy, clock=self.clock.now, sleep=self.clock.sleep)
+        with self.clock:
+            stats = loop.run(tick, duration=duration)
+        print(f"\nSharded swarm control loop: {stats.summary()}")
+        return stats
+
+    def shutdown(self):
+        """Stop the shard processes and release the shared table"""
+        try:
+            self._run_phase(STOP, timeout=5.0)
+        except threading.BrokenBarrierError:
+            pass
+        for shard in self.shards:
+            shard.join(5.0)
+            if shard.is_alive():
+                shard.terminate()
+        self.shards = []
+        self.table.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fly a large swarm with sharded acquisition and dispatch")
+    parser.add_argument("--shards", type=int, default=None, help="Shard processes (default: one per core)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--rate", type=float, default=10.0)
+    parser.add_argument("--fake", type=int, default=0, metavar="N",
+                        help="Serve N fake drones locally instead of connecting to AirSim")
+    args = parser.parse_args()
+    configure_from_env()
+
+    server = None
+    client_factory = ResilientClient
+    if args.fake:
+        from fake_airsim import FakeAirSimServer, FakeWorld, LidarConfig
+        side = math.ceil(math.sqrt(args.fake))
+        world = FakeWorld(vehicles={f"Drone{i + 1}": (3.0 * (i % side), 3.0 * (i // side), -2.0)
+                                    for i in range(args.fake)}, lidar=LidarConfig(points_per_scan=64))
+        server = FakeAirSimServer(world, port=0, workers=16)
+        server.start()
+        client_factory = FakeServerClient(server.server_address[1])
+
+    # Drones are discovered from the simulator instead of a hard-coded list
+    swarm = ShardedSwarmController(client_factory, num_shards=args.shards, clock=clock_from_env(client_factory()))
+    try:
+        print(swarm.takeoff().summary())
+        swarm.execute_swarm_movement(duration=args.duration, rate_hz=args.rate)
+    except Exception as e:
+        print(f"\nError during swarm operation: {str(e)}")
+    finally:
+        print("\nLanding drones...")
+        try:
+            print(swarm.land().summary())
+        finally:
+            swarm.shutdown()
+            report_timers()
+            if server is not None:
+                server.shutdown()
+
+class FakeServerClient:
+    """Picklable factory for clients of a local fake server"""
+    def __init__(self, port: int):
+        self.port = port
+
+    def __call__(self) -> ResilientClient:
+        return ResilientClient(port=self.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import airsim
+import os
+import threading
+import time
+from typing import Optional
+
+def sim_time(client: airsim.MultirotorClient, vehicle_name: str = "") -> float:
+    """Current simulation time in seconds, from the timestamp of a vehicle's state"""
+    return client.getMultirotorState(vehicle_name=vehicle_name).timestamp * 1e-9
+
+class Clock:
+    """Time source for the control loops: ``now()`` in seconds and ``sleep(seconds)``
+
+    Pass ``clock.now`` and ``clock.sleep`` to ControlLoop. A clock is also a context
+    manager around the loop it paces; only LockstepClock does anything there.
+    """
+    lockstep = False  # True when time only moves inside sleep()
+
+    def now(self) -> float:
+        raise NotImplementedError
+
+    def sleep(self, seconds: float):
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def __enter__(self) -> "Clock":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+class WallClock(Clock):
+    """Host time; the simulator runs freely alongside"""
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class SimClock(Clock):
+    """Simulation time read from the simulator while it runs freely
+
+    Deadlines follow sim time, so a loop keeps its rate relative to the simulation
+    when ClockSpeed is not 1. ``sleep`` converts sim seconds to wall seconds with the
+    clock speed it measures as it goes, starting from ``clock_speed``, and tops up
+    until the sim time is reached. Every ``now()`` is one RPC on ``client``, which
+    must not be shared with other threads.
+    """
+    def __init__(self, client: airsim.MultirotorClient, clock_speed: float = 1.0, vehicle_name: str = ""):
+        self.client = client
+        self.clock_speed = clock_speed
+        self.vehicle_name = vehicle_name
+
+    def now(self) -> float:
+        return sim_time(self.client, self.vehicle_name)
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        start, wall_start = self.now(), time.monotonic()
+        remaining = seconds
+        while remaining > 1e-4:
+            time.sleep(remaining / self.clock_speed)
+            elapsed = self.now() - start
+            if elapsed <= 0:
+                return  # the simulator is paused; waiting longer would never end
+            wall = time.monotonic() - wall_start
+            if wall > 0:
+                self.clock_speed = 0.5 * self.clock_speed + 0.5 * elapsed / wall
+            remaining = seconds - elapsed
+
+class LockstepClock(Clock):
+    """Keeps the simulator paused and runs it only inside ``sleep``, via simContinueForTime
+
+    Work done between sleeps takes no simulation time, so a ControlLoop paced by this
+    clock advances the simulation by exactly one period per tick and runs as fast as
+    the host allows. Runs are reproducible as long as nothing else moves the
+    simulator. One loop must drive the clock; other code reads ``now()``.
+    """
+    lockstep = True
+
+    def __init__(self, client: airsim.MultirotorClient, vehicle_name: str = "", poll_interval: float = 0.001,
+                 timeout: float = 10.0):
+        self.client = client
+        self.vehicle_name = vehicle_name
+        self.poll_interval = poll_interval
+        self.timeout = timeout  # wall seconds to wait for one step before giving up
+        self.steps = 0
+        self._now: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Pause the simulator and take the current sim time as the clock's starting point"""
+        with self._lock:
+            self.client.simPause(True)
+            self._now = sim_time(self.client, self.vehicle_name)
+
+    def stop(self):
+        """Let the simulator run freely again"""
+        with self._lock:
+            self.client.simPause(False)
+            self._now = None
+
+    def now(self) -> float:
+        if self._now is None:
+            self.start()
+        return self._now
+
+    def sleep(self, seconds: float):
+        """Run the simulator for ``seconds`` of sim time and wait until it paused again"""
+        if seconds <= 0:
+            return
+        if self._now is None:
+            self.start()
+        with self._lock:
+            self.client.simContinueForTime(seconds)
+            deadline = time.monotonic() + self.timeout
+            while not self.client.simIsPause():
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"simulator did not finish a {seconds:.3f}s step within {self.timeout:.0f}s")
+                time.sleep(self.poll_interval)
+            self._now += seconds
+            self.steps += 1
+
+CLOCK_MODES = ("wall", "sim", "lockstep")
+
+def make_clock(mode: str, client: airsim.MultirotorClient, clock_speed: float = 1.0) -> Clock:
+    """Clock for one of CLOCK_MODES; ``client`` is only used by sim and lockstep clocks"""
+    if mode == "sim":
+        return SimClock(client, clock_speed)
+    if mode == "lockstep":
+        return LockstepClock(client)
+    if mode != "wall":
+        raise ValueError(f"Unknown clock mode {mode!r}, expected one of {CLOCK_MODES}")
+    return WallClock()
+
+def clock_from_env(client: airsim.MultirotorClient, clock_speed: float = 1.0) -> Clock:
+    """Clock selected by AICLIENT_CLOCK (wall, sim or lockstep; wall by default)
+
+    ``client`` should be a connection of its own, since sim and lockstep clocks call
+    the simulator from the loop's thread.
+    """
+    return make_clock(os.environ.get("AICLIENT_CLOCK", "wall").lower(), client, clock_speed)
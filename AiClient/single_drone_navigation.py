@@ -1,10 +1,20 @@
 import airsim
 import numpy as np
 import time
-import math
+import logging
+from connection import ResilientClient
+from lidar_processing import extract_obstacles
+from sim_clock import clock_from_env
+from trajectory import TrajectoryStreamer, shrinking_spiral
+from control_loop import DEGRADE, TickInfo
+from instrumentation import (LIDAR_FETCH, OBSTACLE_FILTER,
+                             configure_from_env, get_logger, log_event, report_timers, timers)
+
+configure_from_env()
+logger = get_logger("single_drone")
 
 # Connect to AirSim
-client = airsim.MultirotorClient(ip="127.0.0.1", port=41451)
+client = ResilientClient(host="127.0.0.1", port=41451, connect_timeout=60.0)
 client.confirmConnection()
 print("Connected to AirSim!")
 
@@ -28,35 +38,35 @@ angular_speed = 0.5  # Radians per second
 height_increment = 0.03  # Reduced climb per step (was 0.05)
 duration = 30  # Seconds
 
-# Main loop: Spiral flight with obstacle check
+# Main loop: the precomputed spiral streamed as velocity commands at 10 Hz, with an obstacle check
 print("Starting cinematic spiral flight...")
-start_time = time.time()
-while time.time() - start_time < duration:
-    elapsed = time.time() - start_time
-    angle = angular_speed * elapsed
-    radius_current = radius * (1 - elapsed / duration)  # Shrink radius over time
-    x = radius_current * math.cos(angle)
-    y = radius_current * math.sin(angle)
-    z = height + height_increment * elapsed
-
-    # Get LIDAR data for safety
-    lidar_data = client.getLidarData(lidar_name="Lidar1", vehicle_name="Drone1")
-    if lidar_data.point_cloud:
-        points = np.array(lidar_data.point_cloud).reshape(-1, 3)
-        obstacles_ahead = [p for p in points if 0 < p[0] < 3 and abs(p[1]) < 1]
-        if obstacles_ahead:
-            print("Obstacle ahead! Adjusting height...")
-            z += 0.5  # Reduced emergency climb (was 1)
-
-    # Move to position
-    client.moveToPositionAsync(x, y, z, 2, vehicle_name="Drone1").join()
-    print(f"Moving to: ({x:.2f}, {y:.2f}, {z:.2f})")
-
-    time.sleep(0.1)
+obstacles_ahead = []
+trajectory = shrinking_spiral("Drone1", duration=duration, radius=radius, height=height,
+                              angular_speed=angular_speed, height_increment=height_increment)
+# AICLIENT_CLOCK=sim or lockstep flies the spiral in simulation time
+streamer = TrajectoryStreamer(client, trajectory, clock=clock_from_env(ResilientClient()))
+streamer.move_to_start(velocity=2)
+
+def avoid_obstacles(info: TickInfo, targets: np.ndarray):
+    global obstacles_ahead
+    # Get LIDAR data for safety (reuse the last scan when running late)
+    if not info.degraded:
+        with timers.stage(LIDAR_FETCH):
+            lidar_data = client.getLidarData(lidar_name="Lidar1", vehicle_name="Drone1")
+        with timers.stage(OBSTACLE_FILTER):
+            obstacles_ahead = extract_obstacles(lidar_data.point_cloud, max_range=3.0, max_lateral=1.0)
+    if len(obstacles_ahead):
+        log_event(logger, logging.INFO, "obstacle_ahead", points=len(obstacles_ahead), action="climb")
+        targets[0, 2] += 0.5  # Reduced emergency climb (was 1)
+    log_event(logger, logging.DEBUG, "move", x=targets[0, 0], y=targets[0, 1], z=targets[0, 2])
+
+loop_stats = streamer.fly_velocity(rate_hz=10.0, late_policy=DEGRADE, adjust=avoid_obstacles)
+print(f"Control loop: {loop_stats.summary()}")
 
 # Land
 print("Landing...")
 client.landAsync(vehicle_name="Drone1").join()
 client.armDisarm(False, "Drone1")
 client.enableApiControl(False, "Drone1")
-print("Done!")
\ No newline at end of file
+print("Done!")
+report_timers()
\ No newline at end of file
@@ -0,0 +1,68 @@
+import airsim
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from connection import ClientPool
+from instrumentation import LIDAR_FETCH, STATE_FETCH, timers
+
+@dataclass
+class DroneSample:
+    state: Optional[airsim.MultirotorState]
+    lidar: Optional[airsim.LidarData]
+    error: Optional[str] = None
+
+@dataclass
+class SwarmSnapshot:
+    tick: int
+    timestamp: float
+    samples: Dict[str, DroneSample]
+
+class SwarmStateFetcher:
+    """Fetch state and LiDAR for every drone in parallel, one RPC client per worker thread.
+
+    A msgpack-rpc client cannot be shared safely across threads, so each worker
+    lazily builds its own client from ``client_factory`` and keeps it for its lifetime.
+    Snapshots are stamped with ``clock()``, e.g. a sim_clock Clock's ``now``.
+    """
+    def __init__(self, client_factory: Callable[[], airsim.MultirotorClient], drone_names: List[str],
+                 lidar_name: str = "Lidar1", max_workers: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        self.client_factory = client_factory
+        self.drone_names = list(drone_names)
+        self.lidar_name = lidar_name
+        self.tick = 0
+        self.clock = clock
+        self.clients = ClientPool(client_factory)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or len(self.drone_names),
+                                           thread_name_prefix="swarm-fetch")
+
+    def _worker_client(self) -> airsim.MultirotorClient:
+        """Return the RPC client owned by the calling worker thread"""
+        return self.clients.get()
+
+    def _fetch_drone(self, drone_name: str, include_lidar: bool) -> DroneSample:
+        """Fetch state and, optionally, LiDAR for a single drone"""
+        try:
+            client = self._worker_client()
+            with timers.stage(STATE_FETCH):
+                state = client.getMultirotorState(vehicle_name=drone_name)
+            lidar = None
+            if include_lidar:
+                with timers.stage(LIDAR_FETCH):
+                    lidar = client.getLidarData(lidar_name=self.lidar_name, vehicle_name=drone_name)
+            return DroneSample(state=state, lidar=lidar)
+        except Exception as e:
+            return DroneSample(state=None, lidar=None, error=str(e))
+
+    def fetch(self, include_lidar: bool = True) -> SwarmSnapshot:
+        """Fetch all drones concurrently and return them as one snapshot"""
+        futures = {name: self.executor.submit(self._fetch_drone, name, include_lidar)
+                   for name in self.drone_names}
+        samples = {name: future.result() for name, future in futures.items()}
+        self.tick += 1
+        return SwarmSnapshot(tick=self.tick, timestamp=self.clock(), samples=samples)
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self.executor.shutdown()
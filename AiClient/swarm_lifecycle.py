@@ -0,0 +1,174 @@
+import airsim
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+from connection import ClientPool, ResilientClient
+from instrumentation import get_logger, log_event
+
+logger = get_logger("swarm_lifecycle")
+
+@dataclass
+class DroneTiming:
+    drone: str
+    seconds: float
+    error: Optional[str] = None  # None when the step succeeded
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@dataclass
+class PhaseReport:
+    phase: str
+    elapsed: float
+    timings: Dict[str, DroneTiming] = field(default_factory=dict)
+
+    @property
+    def succeeded(self) -> List[str]:
+        return [name for name, timing in self.timings.items() if timing.ok]
+
+    @property
+    def failed(self) -> List[str]:
+        return [name for name, timing in self.timings.items() if not timing.ok]
+
+    def summary(self) -> str:
+        lines = [f"{self.phase}: {len(self.succeeded)}/{len(self.timings)} drones in {self.elapsed:.1f}s"]
+        for name, timing in self.timings.items():
+            status = "ok" if timing.ok else f"FAILED ({timing.error})"
+            lines.append(f"  {name}: {timing.seconds:.2f}s {status}")
+        return "\n".join(lines)
+
+def discover_vehicles(client: airsim.MultirotorClient, expected: Optional[Sequence[str]] = None) -> List[str]:
+    """Vehicles the simulator knows about, in ``expected`` order when given
+
+    Raises RuntimeError if any expected vehicle is missing.
+    """
+    vehicles = list(client.listVehicles())
+    if expected is None:
+        return vehicles
+    missing = [name for name in expected if name not in vehicles]
+    if missing:
+        raise RuntimeError(f"Vehicles {missing} not found (simulator has {vehicles}); check settings.json")
+    return list(expected)
+
+def _wait(future, action: str, timeout: float):
+    """Join an *Async command and raise if the simulator reports that it timed out
+
+    join() returns nothing on a msgpack-rpc future; the server's answer comes from get().
+    """
+    if future.get() is False:
+        raise TimeoutError(f"{action} not finished after {timeout:.0f}s")
+
+class SwarmLifecycle:
+    """Takes off, lands and tears down every drone of a swarm at once
+
+    Each step runs for all drones in parallel, one RPC client per worker thread (a
+    msgpack-rpc client cannot be shared across threads). A drone that fails or
+    exceeds its timeout is reported in the step's PhaseReport instead of stopping
+    the others; ``last_report`` keeps the most recent one.
+    """
+    def __init__(self, client_factory: Callable[[], airsim.MultirotorClient],
+                 drone_names: Optional[Sequence[str]] = None, max_workers: int = 32):
+        self.client_factory = client_factory
+        self.drone_names = list(drone_names) if drone_names is not None else \
+            discover_vehicles(client_factory())
+        self.airborne: List[str] = []
+        self.last_report: Optional[PhaseReport] = None
+        self.clients = ClientPool(client_factory)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.drone_names))),
+                                           thread_name_prefix="swarm-lifecycle")
+
+    def _worker_client(self) -> airsim.MultirotorClient:
+        """Return the RPC client owned by the calling worker thread"""
+        return self.clients.get()
+
+    def _timed(self, step: Callable[[airsim.MultirotorClient, str], None], name: str) -> DroneTiming:
+        start = time.perf_counter()
+        try:
+            step(self._worker_client(), name)
+            return DroneTiming(name, time.perf_counter() - start)
+        except Exception as e:
+            return DroneTiming(name, time.perf_counter() - start, error=str(e) or type(e).__name__)
+
+    def run_phase(self, phase: str, step: Callable[[airsim.MultirotorClient, str], None],
+                  drone_names: Optional[Sequence[str]] = None, timeout: float = 30.0) -> PhaseReport:
+        """Run ``step(client, drone)`` for every drone at once, giving up on drones still busy after ``timeout``"""
+        names = list(self.drone_names if drone_names is None else drone_names)
+        start = time.perf_counter()
+        futures = {name: self.executor.submit(self._timed, step, name) for name in names}
+        report = PhaseReport(phase, 0.0)
+        for name, future in futures.items():
+            remaining = max(0.0, start + timeout - time.perf_counter())
+            try:
+                report.timings[name] = future.result(timeout=remaining)
+            except FutureTimeout:
+                report.timings[name] = DroneTiming(name, time.perf_counter() - start,
+                                                   error=f"no answer after {timeout:.0f}s")
+        report.elapsed = time.perf_counter() - start
+        for name in report.failed:
+            log_event(logger, logging.WARNING, "lifecycle_error", phase=phase, drone=name,
+                      error=report.timings[name].error)
+        self.last_report = report
+        return report
+
+    def takeoff(self, timeout: float = 30.0) -> PhaseReport:
+        """Enable API control, arm and take off every drone; drones that fail stay on the ground"""
+        def step(client: airsim.MultirotorClient, name: str):
+            client.enableApiControl(True, name)
+            client.armDisarm(True, name)
+            _wait(client.takeoffAsync(timeout_sec=timeout, vehicle_name=name), "takeoff", timeout)
+
+        report = self.run_phase("takeoff", step, timeout=timeout + 5.0)
+        self.airborne = report.succeeded
+        return report
+
+    def land(self, timeout: float = 60.0, drone_names: Optional[Sequence[str]] = None) -> PhaseReport:
+        """Land, disarm and release every drone (all of them by default, not just the airborne ones)"""
+        def step(client: airsim.MultirotorClient, name: str):
+            client.ping()  # a client whose connection dropped reconnects here rather than in a join
+            _wait(client.landAsync(timeout_sec=timeout, vehicle_name=name), "landing", timeout)
+            client.armDisarm(False, name)
+            client.enableApiControl(False, name)
+
+        report = self.run_phase("land", step, drone_names, timeout=timeout + 5.0)
+        self.airborne = [name for name in self.airborne if name not in report.succeeded]
+        return report
+
+    def emergency_land(self, timeout: float = 60.0) -> PhaseReport:
+        """Stop whatever every drone is doing and land all of them at once; never raises"""
+        def step(client: airsim.MultirotorClient, name: str):
+            try:
+                client.cancelLastTask(vehicle_name=name)
+            except Exception:
+                pass  # landing below still overrides the running command
+            client.ping()
+            _wait(client.landAsync(timeout_sec=timeout, vehicle_name=name), "landing", timeout)
+            client.armDisarm(False, name)
+            client.enableApiControl(False, name)
+
+        try:
+            report = self.run_phase("emergency_land", step, timeout=timeout + 5.0)
+        except Exception as e:
+            log_event(logger, logging.ERROR, "emergency_land_error", error=str(e))
+            return PhaseReport("emergency_land", 0.0)
+        self.airborne = [name for name in self.airborne if name not in report.succeeded]
+        return report
+
+    def shutdown(self):
+        """Stop the worker threads without waiting for drones stuck past their timeout"""
+        self.executor.shutdown(wait=False)
+
+# Example usage:
+if __name__ == "__main__":
+    lifecycle = SwarmLifecycle(ResilientClient)
+    print(f"Discovered vehicles: {lifecycle.drone_names}")
+    try:
+        print(lifecycle.takeoff().summary())
+        time.sleep(3)
+        print(lifecycle.land().summary())
+    except KeyboardInterrupt:
+        print(lifecycle.emergency_land().summary())
+    finally:
+        lifecycle.shutdown()
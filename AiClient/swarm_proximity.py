@@ -0,0 +1,112 @@
+import itertools
+import numpy as np
+from dataclasses import dataclass
+from typing import Tuple
+
+_CELL_BITS = 21
+_CELL_BIAS = 1 << (_CELL_BITS - 1)
+
+def _neighbour_offsets(dims: int) -> np.ndarray:
+    """Offsets of the 3**dims grid cells around (and including) a cell"""
+    return np.array(list(itertools.product((-1, 0, 1), repeat=dims)), dtype=np.int64)
+
+def _pack_cells(cells: np.ndarray) -> np.ndarray:
+    """Pack integer 2D or 3D cell coordinates into one sortable int64 key"""
+    cells = cells + _CELL_BIAS
+    key = cells[..., 0]
+    for axis in range(1, cells.shape[-1]):
+        key = (key << _CELL_BITS) | cells[..., axis]
+    return key
+
+def grid_candidate_pairs(queries: np.ndarray, points: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+    """All (query, point) index pairs whose grid cells are neighbours
+
+    Points are hashed into a uniform grid with ``cell_size`` cells; every pair closer
+    than ``cell_size`` is guaranteed to be returned, along with some farther ones that
+    the caller filters by exact distance. Works for 2D or 3D coordinates.
+    """
+    dims = points.shape[1]
+    offsets = _neighbour_offsets(dims)
+    point_keys = _pack_cells(np.floor(points / cell_size).astype(np.int64))
+    order = np.argsort(point_keys, kind='stable')
+    sorted_keys = point_keys[order]
+
+    # Look up all neighbour cells of every query in one searchsorted call
+    query_cells = np.floor(queries / cell_size).astype(np.int64)
+    query_keys = _pack_cells(query_cells[:, None, :] + offsets[None, :, :]).ravel()
+    lo = np.searchsorted(sorted_keys, query_keys, side='left')
+    hi = np.searchsorted(sorted_keys, query_keys, side='right')
+    counts = hi - lo
+
+    # Expand the (lo, hi) ranges into flat candidate pairs
+    total = int(counts.sum())
+    query = np.repeat(np.arange(query_keys.size) // len(offsets), counts)
+    run_starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+    return query, order[run_starts + np.arange(total)]
+
+@dataclass
+class ProximityReport:
+    violations: np.ndarray  # (N,) bool, True when the target is too close to another drone
+    nearest: np.ndarray     # (N,) index of the closest offending drone, -1 when there is none
+    distance: np.ndarray    # (N,) distance to that drone, inf when there is none
+
+class ProximityEngine:
+    """Batch target-vs-current separation checks for the whole swarm
+
+    Small swarms use a dense pairwise distance matrix. Above ``dense_limit`` drones
+    the current positions are hashed into a uniform grid with ``safety_distance``
+    sized cells so only the 27 neighbouring cells of each target are examined.
+    """
+    def __init__(self, safety_distance: float, dense_limit: int = 64):
+        self.safety_distance = safety_distance
+        self.dense_limit = dense_limit
+
+    def check(self, targets: np.ndarray, positions: np.ndarray) -> ProximityReport:
+        """Compare every drone's target against every other drone's current position
+
+        Rows with NaN (drones without a target or state) are never reported and never
+        counted as an offender.
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if len(targets) <= self.dense_limit:
+            return self._check_dense(targets, positions)
+        return self._check_grid(targets, positions)
+
+    def _check_dense(self, targets: np.ndarray, positions: np.ndarray) -> ProximityReport:
+        diff = targets[:, None, :] - positions[None, :, :]
+        squared = np.einsum('ijk,ijk->ij', diff, diff)
+        squared = np.where(np.isfinite(squared), squared, np.inf)  # NaN rows constrain nothing
+        np.fill_diagonal(squared, np.inf)
+        nearest = np.argmin(squared, axis=1) if len(targets) else np.empty(0, dtype=np.int64)
+        distance = np.sqrt(squared[np.arange(len(targets)), nearest])
+        violations = distance < self.safety_distance
+        return ProximityReport(violations=violations,
+                               nearest=np.where(violations, nearest, -1),
+                               distance=np.where(violations, distance, np.inf))
+
+    def _check_grid(self, targets: np.ndarray, positions: np.ndarray) -> ProximityReport:
+        count = len(targets)
+        # Drones without a target or a state (NaN rows) cannot be hashed and constrain nothing
+        target_rows = np.flatnonzero(np.isfinite(targets).all(axis=1))
+        position_rows = np.flatnonzero(np.isfinite(positions).all(axis=1))
+        query, other = grid_candidate_pairs(targets[target_rows], positions[position_rows], self.safety_distance)
+        query, other = target_rows[query], position_rows[other]
+
+        keep = query != other
+        query, other = query[keep], other[keep]
+        diff = targets[query] - positions[other]
+        distance = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        close = distance < self.safety_distance
+        query, other, distance = query[close], other[close], distance[close]
+
+        nearest = np.full(count, -1, dtype=np.int64)
+        nearest_distance = np.full(count, np.inf)
+        if len(query):
+            # Closest offender per drone: sort by (drone, distance) and take the first of each run
+            by_drone = np.lexsort((distance, query))
+            first = np.unique(query[by_drone], return_index=True)[1]
+            picked = by_drone[first]
+            nearest[query[picked]] = other[picked]
+            nearest_distance[query[picked]] = distance[picked]
+        return ProximityReport(violations=nearest >= 0, nearest=nearest, distance=nearest_distance)
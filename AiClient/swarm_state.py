@@ -0,0 +1,168 @@
+import numpy as np
+from typing import Iterator, List, Optional, Sequence, Tuple
+from lidar_processing import EMPTY_POINTS
+
+class DroneView:
+    """Read/write window onto one drone's slot of a SwarmState"""
+    __slots__ = ("_state", "slot")
+
+    def __init__(self, state: "SwarmState", slot: int):
+        self._state = state
+        self.slot = slot
+
+    @property
+    def name(self) -> str:
+        return self._state.drone_names[self.slot]
+
+    @property
+    def position(self) -> np.ndarray:
+        return self._state.position[self.slot]
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self._state.velocity[self.slot]
+
+    @property
+    def battery(self) -> float:
+        return float(self._state.battery[self.slot])
+
+    @property
+    def obstacles(self) -> np.ndarray:
+        """(N,3) float32 LiDAR points of the last scan closer than the obstacle range"""
+        return self._state.obstacles[self.slot]
+
+    @property
+    def obstacle_count(self) -> int:
+        return int(self._state.obstacle_count[self.slot])
+
+    def __repr__(self) -> str:
+        return f"DroneView({self.name!r}, position={self.position.tolist()})"
+
+class SwarmState:
+    """Struct-of-arrays state of a swarm: row ``slot`` of every array belongs to one drone
+
+    Updates write into preallocated arrays in place, and the last ``history`` committed
+    positions are kept in a ring buffer for velocity and acceleration estimates. The
+    mapping interface (``state[name]``, ``items()``, ``in``) only exposes drones that
+    have reported at least once, like the per-drone dict it replaces.
+    """
+    def __init__(self, drone_names: Sequence[str], history: int = 8):
+        self.drone_names: List[str] = list(drone_names)
+        self.slots = {name: slot for slot, name in enumerate(self.drone_names)}
+        n = len(self.drone_names)
+        self.position = np.full((n, 3), np.nan)
+        self.velocity = np.full((n, 3), np.nan)
+        self.battery = np.full(n, 100.0)
+        self.obstacle_count = np.zeros(n, dtype=np.int32)
+        self.obstacle_distance = np.full(n, np.inf)  # range of the closest obstacle point
+        self.obstacles: List[np.ndarray] = [EMPTY_POINTS] * n
+        self.valid = np.zeros(n, dtype=bool)  # True once a drone has reported a state
+        self.history_positions = np.full((history, n, 3), np.nan)
+        self.history_times = np.full(history, np.nan)
+        self.history_size = 0
+        self._head = -1
+        self._views = [DroneView(self, slot) for slot in range(n)]
+        # Scratch buffers so per-tick queries do not allocate
+        self._center = np.zeros(3)
+        self._valid_column = np.zeros((n, 1), dtype=bool)
+        self._pair_diff = np.empty((n, n, 3))
+        self._pair_distance = np.empty((n, n))
+
+    def __len__(self) -> int:
+        return int(self.valid.sum())
+
+    def __contains__(self, name: str) -> bool:
+        slot = self.slots.get(name)
+        return slot is not None and bool(self.valid[slot])
+
+    def __getitem__(self, name: str) -> DroneView:
+        slot = self.slots[name]
+        if not self.valid[slot]:
+            raise KeyError(name)
+        return self._views[slot]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def get(self, name: str, default=None) -> Optional[DroneView]:
+        return self[name] if name in self else default
+
+    def keys(self) -> List[str]:
+        return [name for name, valid in zip(self.drone_names, self.valid) if valid]
+
+    def values(self) -> List[DroneView]:
+        return [self._views[slot] for slot in np.flatnonzero(self.valid)]
+
+    def items(self) -> List[Tuple[str, DroneView]]:
+        return [(self.drone_names[slot], self._views[slot]) for slot in np.flatnonzero(self.valid)]
+
+    def update(self, slot: int, position: Tuple[float, float, float], velocity: Tuple[float, float, float],
+               obstacles: Optional[np.ndarray] = None):
+        """Write one drone's kinematics; ``obstacles`` None keeps the points of its last scan"""
+        self.position[slot] = position
+        self.velocity[slot] = velocity
+        if obstacles is not None:
+            self.obstacles[slot] = obstacles
+            self.obstacle_count[slot] = len(obstacles)
+            self.obstacle_distance[slot] = np.sqrt(np.einsum('ij,ij->i', obstacles, obstacles).min()) \
+                if len(obstacles) else np.inf
+        self.valid[slot] = True
+
+    def commit(self, timestamp: float):
+        """Push the current positions into the history ring buffer"""
+        self._head = (self._head + 1) % len(self.history_times)
+        np.copyto(self.history_positions[self._head], self.position)
+        self.history_times[self._head] = timestamp
+        self.history_size = min(self.history_size + 1, len(self.history_times))
+
+    def history(self, age: int) -> Tuple[np.ndarray, float]:
+        """(N,3) positions and timestamp committed ``age`` commits ago (0 is the latest)"""
+        if age >= self.history_size:
+            raise IndexError(f"only {self.history_size} commits in history")
+        index = (self._head - age) % len(self.history_times)
+        return self.history_positions[index], float(self.history_times[index])
+
+    def estimated_velocity(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """(N,3) velocity from the last two committed positions, NaN until there are two"""
+        out = np.full_like(self.position, np.nan) if out is None else out
+        if self.history_size < 2:
+            out.fill(np.nan)
+            return out
+        (latest, t1), (previous, t0) = self.history(0), self.history(1)
+        np.subtract(latest, previous, out=out)
+        out /= max(t1 - t0, 1e-9)
+        return out
+
+    def estimated_acceleration(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """(N,3) acceleration from the last three committed positions, NaN until there are three"""
+        out = np.full_like(self.position, np.nan) if out is None else out
+        if self.history_size < 3:
+            out.fill(np.nan)
+            return out
+        (p2, t2), (p1, t1), (p0, t0) = self.history(0), self.history(1), self.history(2)
+        # Second divided difference, valid for uneven tick spacing
+        out[:] = ((p2 - p1) / max(t2 - t1, 1e-9) - (p1 - p0) / max(t1 - t0, 1e-9)) / max((t2 - t0) / 2, 1e-9)
+        return out
+
+    def center(self) -> np.ndarray:
+        """(3,) mean position of the drones that have reported; NaN when none has"""
+        count = np.count_nonzero(self.valid)
+        if count == 0:
+            self._center.fill(np.nan)
+        elif count == len(self.valid):
+            np.add.reduce(self.position, axis=0, out=self._center)
+            self._center /= count
+        else:
+            self._valid_column[:, 0] = self.valid
+            np.add.reduce(self.position, axis=0, where=self._valid_column, out=self._center, initial=0.0)
+            self._center /= count
+        return self._center
+
+    def pairwise_distances(self) -> np.ndarray:
+        """(N,N) distances between current positions (NaN rows for drones without state)
+
+        The result is an internal buffer, overwritten by the next call.
+        """
+        np.subtract(self.position[:, None, :], self.position[None, :, :], out=self._pair_diff)
+        np.einsum('ijk,ijk->ij', self._pair_diff, self._pair_diff, out=self._pair_distance)
+        return np.sqrt(self._pair_distance, out=self._pair_distance)
@@ -0,0 +1,227 @@
+import json
+import os
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (name, dtype, per-row shape) of every column
+Column = Tuple[str, str, Tuple[int, ...]]
+
+# One row per drone per control tick
+DRONE_COLUMNS: List[Column] = [
+    ("tick", "i8", ()),
+    ("time", "f8", ()),
+    ("drone", "i2", ()),            # index into the recording's drone_names
+    ("position", "f8", (3,)),
+    ("velocity", "f4", (3,)),
+    ("target", "f8", (3,)),         # commanded formation position
+    ("command_skipped", "?", ()),   # move held back by the collision check
+    ("obstacles", "i4", ()),        # LiDAR points within range
+    ("vo_position", "f8", (3,)),    # NaN when no VO estimate is available
+]
+
+# One row per control tick
+TICK_COLUMNS: List[Column] = [
+    ("tick", "i8", ()),
+    ("time", "f8", ()),
+    ("scheduled", "f8", ()),        # seconds since loop start the tick was due
+    ("started", "f8", ()),          # seconds since loop start it actually began
+    ("duration", "f8", ()),
+    ("degraded", "?", ()),
+]
+
+TABLES = {"drones": DRONE_COLUMNS, "ticks": TICK_COLUMNS}
+META_FILE = "telemetry.json"
+
+class ColumnarWriter:
+    """Append-only table stored as one preallocated .npy memmap per column and chunk
+
+    Only the current chunk is mapped; full chunks are flushed and unmapped, so memory
+    stays bounded however long the run is.
+    """
+    def __init__(self, directory: str, columns: Sequence[Column], chunk_rows: int = 65536):
+        self.directory = directory
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.chunk_sizes: List[int] = []  # rows used in every chunk, the last one still growing
+        self.arrays: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return sum(self.chunk_sizes)
+
+    def append(self, **values):
+        """Append rows given as equally long arrays (or scalars for a single row) per column"""
+        values = {name: np.asarray(value) for name, value in values.items()}
+        first_name, first_dtype, first_shape = self.columns[0]
+        count = 1 if values[first_name].ndim == len(first_shape) else len(values[first_name])
+        written = 0
+        while written < count:
+            if not self.arrays or self.chunk_sizes[-1] == self.chunk_rows:
+                self._roll()
+            start = self.chunk_sizes[-1]
+            take = min(count - written, self.chunk_rows - start)
+            for name, dtype, shape in self.columns:
+                value = values[name]
+                if value.ndim > len(shape):
+                    value = value[written:written + take]
+                self.arrays[name][start:start + take] = value
+            self.chunk_sizes[-1] += take
+            written += take
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+
+    def close(self):
+        self.flush()
+        self.arrays = {}
+
+    def _roll(self):
+        self.close()
+        path = os.path.join(self.directory, f"{len(self.chunk_sizes):05d}")
+        os.makedirs(path, exist_ok=True)
+        self.arrays = {name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode="w+",
+                                                       dtype=dtype, shape=(self.chunk_rows,) + shape)
+                       for name, dtype, shape in self.columns}
+        self.chunk_sizes.append(0)
+
+class TelemetryRecorder:
+    """Records per-drone state and per-tick timing of a swarm run into ``directory``
+
+    The index (drone names, schema, rows per chunk) is rewritten on every flush, which
+    happens at most every ``flush_interval`` seconds; a crash loses at most that much.
+    """
+    def __init__(self, directory: str, drone_names: Sequence[str], chunk_rows: int = 65536,
+                 flush_interval: float = 1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.drone_names = list(drone_names)
+        self.drone_index = np.arange(len(self.drone_names), dtype=np.int16)
+        self.flush_interval = flush_interval
+        self.writers = {table: ColumnarWriter(os.path.join(directory, table), columns, chunk_rows)
+                        for table, columns in TABLES.items()}
+        self._last_flush = time.monotonic()
+        self._write_meta()
+
+    @classmethod
+    def from_env(cls, drone_names: Sequence[str]) -> Optional["TelemetryRecorder"]:
+        """Recorder writing to AICLIENT_TELEMETRY if it is set, else None"""
+        directory = os.environ.get("AICLIENT_TELEMETRY")
+        return cls(directory, drone_names) if directory else None
+
+    def record_drones(self, tick: int, positions: np.ndarray, velocities: np.ndarray, targets: np.ndarray,
+                      obstacles: np.ndarray, skipped: Optional[np.ndarray] = None,
+                      vo_positions: Optional[np.ndarray] = None, timestamp: Optional[float] = None):
+        """Append one row per drone; arrays are (N,3) or (N,) in drone_names order"""
+        n = len(self.drone_names)
+        self.writers["drones"].append(
+            tick=np.full(n, tick),
+            time=np.full(n, time.time() if timestamp is None else timestamp),
+            drone=self.drone_index,
+            position=positions,
+            velocity=velocities,
+            target=targets,
+            command_skipped=np.zeros(n, dtype=bool) if skipped is None else skipped,
+            obstacles=obstacles,
+            vo_position=np.full((n, 3), np.nan) if vo_positions is None else vo_positions,
+        )
+        self._maybe_flush()
+
+    def record_tick(self, tick: int, scheduled: float, started: float, duration: float, degraded: bool,
+                    timestamp: Optional[float] = None):
+        """Append the timing of one control tick"""
+        self.writers["ticks"].append(tick=tick, time=time.time() if timestamp is None else timestamp,
+                                     scheduled=scheduled, started=started, duration=duration, degraded=degraded)
+        self._maybe_flush()
+
+    def flush(self):
+        """Write the memmaps and the index to disk"""
+        for writer in self.writers.values():
+            writer.flush()
+        self._write_meta()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self._write_meta()
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write_meta(self):
+        meta = {
+            "drone_names": self.drone_names,
+            "tables": {table: {"columns": [[name, dtype, list(shape)] for name, dtype, shape in writer.columns],
+                               "chunk_sizes": writer.chunk_sizes}
+                       for table, writer in self.writers.items()},
+        }
+        path = os.path.join(self.directory, META_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)  # readers never see a half-written index
+
+class RecordedTable:
+    """Read-only view of one recorded table; chunks are memory-mapped only when touched"""
+    def __init__(self, directory: str, columns: Sequence[Column], chunk_sizes: Sequence[int]):
+        self.directory = directory
+        self.columns = {name: (dtype, tuple(shape)) for name, dtype, shape in columns}
+        self.chunk_sizes = list(chunk_sizes)
+        self.offsets = np.concatenate([[0], np.cumsum(self.chunk_sizes)]).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def chunk(self, index: int, name: str) -> np.ndarray:
+        """Memory-mapped valid rows of column ``name`` in chunk ``index``"""
+        array = np.load(os.path.join(self.directory, f"{index:05d}", f"{name}.npy"), mmap_mode="r")
+        return array[:self.chunk_sizes[index]]
+
+    def chunks(self, name: str) -> Iterator[np.ndarray]:
+        for index in range(len(self.chunk_sizes)):
+            yield self.chunk(index, name)
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Rows ``start:stop`` of a column, reading only the chunks they fall in"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        first = max(int(np.searchsorted(self.offsets, start, side="right")) - 1, 0)
+        parts = []
+        for index in range(first, len(self.chunk_sizes)):
+            if self.offsets[index] >= stop:
+                break
+            lo = max(start - self.offsets[index], 0)
+            hi = min(stop - self.offsets[index], self.chunk_sizes[index])
+            parts.append(self.chunk(index, name)[lo:hi])
+        if not parts:
+            dtype, shape = self.columns[name]
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.concatenate(parts)
+
+class TelemetryRecording:
+    """Lazy loader for a directory written by TelemetryRecorder"""
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        self.drone_names: List[str] = meta["drone_names"]
+        self.tables = {table: RecordedTable(os.path.join(directory, table), info["columns"], info["chunk_sizes"])
+                       for table, info in meta["tables"].items()}
+
+    @property
+    def drones(self) -> RecordedTable:
+        return self.tables["drones"]
+
+    @property
+    def ticks(self) -> RecordedTable:
+        return self.tables["ticks"]
+
+    def drone_column(self, drone_name: str, name: str) -> np.ndarray:
+        """All recorded values of column ``name`` for one drone, gathered chunk by chunk"""
+        index = self.drone_names.index(drone_name)
+        parts = [values[drones == index]
+                 for drones, values in zip(self.drones.chunks("drone"), self.drones.chunks(name))]
+        if not parts:
+            dtype, shape = self.drones.columns[name]
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.concatenate(parts)
@@ -0,0 +1,189 @@
+import logging
+import math
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+import airsim
+from control_loop import ControlLoop, DEGRADE, LoopStats, TickInfo
+from instrumentation import COMMAND_DISPATCH, get_logger, log_event, timers
+from sim_clock import Clock, WallClock
+from swarm_acquisition import SwarmStateFetcher
+
+logger = get_logger("trajectory")
+
+@dataclass
+class SwarmTrajectory:
+    names: List[str]
+    times: np.ndarray      # (T,) seconds since start, increasing
+    positions: np.ndarray  # (D,T,3) NED position of every drone at every time
+
+    @property
+    def duration(self) -> float:
+        return float(self.times[-1])
+
+    def velocities(self) -> np.ndarray:
+        """(D,T,3) reference velocities by finite differences"""
+        return np.gradient(self.positions, self.times, axis=1)
+
+    def sample(self, t: float, values: Optional[np.ndarray] = None) -> np.ndarray:
+        """(D,3) positions (or other per-time ``values``) of all drones at time ``t``
+
+        Linearly interpolated and clamped to the ends.
+        """
+        values = self.positions if values is None else values
+        t = min(max(t, self.times[0]), self.times[-1])
+        upper = min(int(np.searchsorted(self.times, t, side="right")), len(self.times) - 1)
+        lower = max(upper - 1, 0)
+        span = self.times[upper] - self.times[lower]
+        weight = (t - self.times[lower]) / span if span > 0 else 0.0
+        return values[:, lower] + weight * (values[:, upper] - values[:, lower])
+
+    def path_length(self) -> np.ndarray:
+        """(D,) arc length of every drone's path"""
+        steps = np.diff(self.positions, axis=1)
+        return np.sqrt(np.einsum('dtk,dtk->dt', steps, steps)).sum(axis=1)
+
+    def waypoints(self, index: int, spacing: float = 0.5) -> List[airsim.Vector3r]:
+        """Drone ``index``'s path resampled to about one waypoint every ``spacing`` meters"""
+        points = self.positions[index]
+        steps = np.sqrt(np.einsum('tk,tk->t', np.diff(points, axis=0), np.diff(points, axis=0)))
+        distance = np.concatenate([[0.0], np.cumsum(steps)])
+        keep = np.unique(np.searchsorted(distance, np.arange(0.0, distance[-1], spacing)))
+        keep = np.append(keep[keep < len(points) - 1], len(points) - 1)
+        return [airsim.Vector3r(*point) for point in points[keep].tolist()]
+
+def sample_times(duration: float, dt: float = 0.05) -> np.ndarray:
+    """Uniform time stamps from 0 to ``duration`` inclusive"""
+    return np.linspace(0.0, duration, int(round(duration / dt)) + 1)
+
+def orbit_spiral(names: Sequence[str], duration: float = 20.0, base_radius: float = 5.0,
+                 height_range: Tuple[float, float] = (-4.0, -2.0), angular_speed: float = 0.8,
+                 spiral_speed: float = 0.3, dt: float = 0.05) -> SwarmTrajectory:
+    """Drones evenly spaced on a breathing, bobbing orbit (multi_drones_navigation's pattern)"""
+    times = sample_times(duration, dt)
+    index = np.arange(len(names))[:, None]
+    angle = angular_speed * times[None, :] + 2 * math.pi / len(names) * index
+    radius = base_radius * (1 + np.sin(spiral_speed * times))
+    height = (height_range[0] + height_range[1]) / 2 + \
+             (height_range[1] - height_range[0]) / 2 * np.sin(angular_speed * times)
+    positions = np.stack(np.broadcast_arrays(radius * np.cos(angle), radius * np.sin(angle), height), axis=-1)
+    return SwarmTrajectory(list(names), times, positions)
+
+def shrinking_spiral(name: str, duration: float = 30.0, radius: float = 5.0, height: float = -3.0,
+                     angular_speed: float = 0.5, height_increment: float = 0.03,
+                     dt: float = 0.05) -> SwarmTrajectory:
+    """Inward spiral with a slow height change (single_drone_navigation's pattern)"""
+    times = sample_times(duration, dt)
+    angle = angular_speed * times
+    radius_current = radius * (1 - times / duration)
+    positions = np.stack([radius_current * np.cos(angle), radius_current * np.sin(angle),
+                          height + height_increment * times], axis=-1)
+    return SwarmTrajectory([name], times, positions[None])
+
+class TrajectoryStreamer:
+    """Fly a SwarmTrajectory on every drone at once, without a join per waypoint
+
+    ``fly_path`` uploads each drone's whole path in a single moveOnPath call, so the
+    flight costs one RPC per drone regardless of its length (the shape is kept, speed is
+    the average of the reference). ``fly_velocity`` keeps the reference timing: every
+    tick each drone gets the reference velocity ``lookahead`` seconds ahead (covering
+    command latency) plus a correction that closes any position error within
+    ``correction_time``, sent without waiting for an answer. Ticks follow ``clock``,
+    so with a sim_clock LockstepClock the reference is flown in simulation time.
+    """
+    def __init__(self, client: airsim.MultirotorClient, trajectory: SwarmTrajectory, lookahead: float = 0.1,
+                 correction_time: float = 1.0, max_speed: float = 12.0,
+                 client_factory: Optional[Callable[[], airsim.MultirotorClient]] = None,
+                 clock: Optional[Clock] = None):
+        self.client = client
+        self.clock = clock or WallClock()
+        self.trajectory = trajectory
+        self.reference_velocities = trajectory.velocities()
+        self.lookahead = lookahead
+        self.correction_time = correction_time
+        self.max_speed = max_speed
+        # With a factory, velocity commands correct toward the reference from measured positions
+        self.fetcher = SwarmStateFetcher(client_factory, trajectory.names, clock=self.clock.now) \
+            if client_factory else None
+        self.tracking_error: List[float] = []  # worst drone's distance from the reference, per tick
+
+    def move_to_start(self, velocity: float = 3.0):
+        """Send every drone to its first reference point and wait until all are there"""
+        futures = [self.client.moveToPositionAsync(*start, velocity, vehicle_name=name)
+                   for name, start in zip(self.trajectory.names, self.trajectory.positions[:, 0].tolist())]
+        for future in futures:
+            future.join()
+
+    def fly_path(self, velocity: Optional[float] = None, spacing: float = 0.5) -> float:
+        """Upload every drone's path in one call each, wait for all of them; returns seconds taken"""
+        if self.clock.lockstep:
+            raise ValueError("fly_path waits on the simulator running freely; use fly_velocity with a lockstep clock")
+        lengths = self.trajectory.path_length()
+        start = time.perf_counter()
+        futures = []
+        with timers.stage(COMMAND_DISPATCH):
+            for index, name in enumerate(self.trajectory.names):
+                speed = velocity or max(lengths[index] / self.trajectory.duration, 0.1)
+                futures.append(self.client.moveOnPathAsync(
+                    self.trajectory.waypoints(index, spacing), speed,
+                    lookahead=-1, adaptive_lookahead=1, vehicle_name=name))
+        for future in futures:
+            future.join()
+        return time.perf_counter() - start
+
+    def fly_velocity(self, rate_hz: float = 10.0, late_policy: str = DEGRADE,
+                     adjust: Optional[Callable[[TickInfo, np.ndarray], None]] = None) -> LoopStats:
+        """Track the reference in time with per-tick velocity commands
+
+        ``adjust(info, targets)`` may shift the (D,3) reference positions of the tick in
+        place, e.g. to climb over an obstacle.
+        """
+        period = 1.0 / rate_hz
+        self.tracking_error = []
+
+        def tick(info: TickInfo):
+            t = info.scheduled
+            reference = self.trajectory.sample(t)
+            targets = reference.copy()
+            if adjust is not None:
+                adjust(info, targets)
+            # Without measurements the drone is assumed on the reference, so an adjustment
+            # still reaches the command through the correction term
+            current = self._measured_positions(reference, include_state=not info.degraded)
+            velocity = self.trajectory.sample(t + self.lookahead, self.reference_velocities) + \
+                       (targets - current) / self.correction_time
+            speed = np.sqrt(np.einsum('dk,dk->d', velocity, velocity))
+            velocity *= np.minimum(1.0, self.max_speed / np.maximum(speed, 1e-9))[:, None]
+            with timers.stage(COMMAND_DISPATCH):
+                for name, (vx, vy, vz) in zip(self.trajectory.names, velocity.tolist()):
+                    # Commands outlive a missed tick briefly, then the drone stops on its own
+                    self.client.moveByVelocityAsync(vx, vy, vz, duration=2 * period, vehicle_name=name)
+
+        loop = ControlLoop(rate_hz, late_policy=late_policy, clock=self.clock.now, sleep=self.clock.sleep)
+        with self.clock:
+            stats = loop.run(tick, duration=self.trajectory.duration)
+        for name in self.trajectory.names:
+            self.client.hoverAsync(vehicle_name=name)
+        if self.tracking_error:
+            log_event(logger, logging.INFO, "tracking_error", max=max(self.tracking_error),
+                      mean=float(np.mean(self.tracking_error)))
+        return stats
+
+    def _measured_positions(self, reference: np.ndarray, include_state: bool) -> np.ndarray:
+        if self.fetcher is None or not include_state:
+            return reference
+        snapshot = self.fetcher.fetch(include_lidar=False)
+        current = reference.copy()
+        for index, name in enumerate(self.trajectory.names):
+            sample = snapshot.samples[name]
+            if sample.error is None:
+                position = sample.state.kinematics_estimated.position
+                current[index] = (position.x_val, position.y_val, position.z_val)
+        error = current - reference
+        self.tracking_error.append(float(np.sqrt(np.einsum('dk,dk->d', error, error)).max()))
+        return current
+
+    def shutdown(self):
+        if self.fetcher is not None:
+            self.fetcher.shutdown()
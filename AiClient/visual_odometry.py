@@ -2,19 +2,50 @@ import airsim
 import cv2
 import numpy as np
 import time
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
 import threading
+import logging
+import os
+from control_loop import ControlLoop, TickInfo
+from connection import connect
+from feature_matching import EMPTY_MATCH, create_matcher, keypoint_coords
+from image_ingestion import ImageIngestor
+from instrumentation import (VO_DETECT, VO_IMAGE, VO_MATCH, VO_POSE,
+                             configure_from_env, get_logger, log_event, report_timers, timers)
+from sim_clock import Clock, WallClock
+
+logger = get_logger("visual_odometry")
+
+# detect: ORB detect + match every frame; track: LK optical flow with keyframe re-detection
+VO_MODES = ("detect", "track")
 
 class VisualOdometry:
-    def __init__(self, client: airsim.MultirotorClient, drone_name: str):
+    def __init__(self, client: airsim.MultirotorClient, drone_name: str, matcher: str = "bf",
+                 mode: str = "detect", max_corners: int = 400, min_tracked: int = 150,
+                 keyframe_parallax: float = 30.0, ingestor: Optional[ImageIngestor] = None,
+                 clock: Optional[Clock] = None):
+        if mode not in VO_MODES:
+            raise ValueError(f"Unknown VO mode {mode!r}, expected one of {VO_MODES}")
         self.client = client
         self.drone_name = drone_name
+        self.mode = mode
         self.prev_image = None
-        self.prev_keypoints = None
+        self.prev_points = None
         self.prev_descriptors = None
+        self.keyframe_points = None  # positions of the tracked points in the last keyframe
+        self.max_corners = max_corners
+        self.min_tracked = min_tracked
+        self.keyframe_parallax = keyframe_parallax
+        self.pixel_motion = None  # median feature shift of the last frame pair, used as a matching prior
         self.position = (0, 0, 0)
         self.velocity = (0, 0, 0)
-        self.last_update_time = time.time()
+        self.clock = clock or WallClock()  # velocities are per second of this clock, e.g. sim time
+        self.last_update_time = self.clock.now()
+        
+        # Frames come from a shared ingestor pumped by the owner, or from a private one
+        self.owns_ingestor = ingestor is None
+        self.ingestor = ingestor or ImageIngestor(client, [drone_name])
+        self.frame_sequence = 0
         
         # Initialize ORB detector
         self.orb = cv2.ORB_create(
@@ -24,29 +55,31 @@ class VisualOdometry:
             edgeThreshold=31
         )
         
-        # Initialize feature matcher
-        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        # Initialize feature matcher (bf, flann or grid)
+        self.matcher = create_matcher(matcher)
+        
+        # Pyramidal Lucas-Kanade parameters for tracking mode
+        self.lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
         
-        print(f"Initialized Visual Odometry for {drone_name}")
+        print(f"Initialized Visual Odometry for {drone_name} ({mode} mode)")
     
-    def get_camera_image(self) -> np.ndarray:
-        """Get image from the drone's camera"""
+    def get_camera_image(self) -> Optional[np.ndarray]:
+        """Get the drone's newest grayscale camera frame, or None if there is no new one"""
         try:
-            # Get image from AirSim
-            image_response = self.client.simGetImages([
-                airsim.ImageRequest("front_center", airsim.ImageType.Scene, False, False)
-            ], vehicle_name=self.drone_name)[0]
-            
-            # Convert to numpy array
-            img1d = np.frombuffer(image_response.image_data_uint8, dtype=np.uint8)
-            img = img1d.reshape(image_response.height, image_response.width, 3)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            return gray
+            if self.owns_ingestor:
+                self.ingestor.fetch()
+            sequence = self.ingestor.sequence(self.drone_name)
+            if sequence == self.frame_sequence:
+                return None
+            self.frame_sequence = sequence
+            return self.ingestor.frame(self.drone_name)
             
         except Exception as e:
-            print(f"Error getting camera image for {self.drone_name}: {str(e)}")
+            log_event(logger, logging.WARNING, "camera_image_error", drone=self.drone_name, error=str(e))
             return None
     
     def detect_features(self, image: np.ndarray) -> Tuple[List[cv2.KeyPoint], np.ndarray]:
@@ -55,33 +88,48 @@ class VisualOdometry:
             keypoints, descriptors = self.orb.detectAndCompute(image, None)
             return keypoints, descriptors
         except Exception as e:
-            print(f"Error detecting features for {self.drone_name}: {str(e)}")
+            log_event(logger, logging.WARNING, "detect_error", drone=self.drone_name, error=str(e))
             return [], None
     
-    def match_features(self, desc1: np.ndarray, desc2: np.ndarray) -> List[cv2.DMatch]:
-        """Match features between two images"""
+    def detect_corners(self, image: np.ndarray) -> np.ndarray:
+        """Detect corners to track with optical flow, as (N,2) float32 points"""
+        try:
+            corners = cv2.goodFeaturesToTrack(image, maxCorners=self.max_corners, qualityLevel=0.01, minDistance=8)
+            if corners is None:
+                return np.empty((0, 2), dtype=np.float32)
+            return corners.reshape(-1, 2)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "detect_error", drone=self.drone_name, error=str(e))
+            return np.empty((0, 2), dtype=np.float32)
+    
+    def track_features(self, prev_image: np.ndarray, image: np.ndarray,
+                       points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Follow points into the next image with pyramidal LK, returning (src, dst) and the kept mask"""
         try:
-            if desc1 is None or desc2 is None:
-                return []
-            matches = self.matcher.match(desc1, desc2)
-            # Sort matches by distance
-            matches = sorted(matches, key=lambda x: x.distance)
-            return matches
+            if len(points) == 0:
+                return EMPTY_MATCH + (np.zeros(0, dtype=bool),)
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_image, image, points, None, **self.lk_params)
+            found = status.ravel() == 1
+            return points[found], next_points.reshape(-1, 2)[found], found
         except Exception as e:
-            print(f"Error matching features for {self.drone_name}: {str(e)}")
-            return []
+            log_event(logger, logging.WARNING, "track_error", drone=self.drone_name, error=str(e))
+            return EMPTY_MATCH + (np.zeros(len(points), dtype=bool),)
     
-    def estimate_motion(self, matches: List[cv2.DMatch], 
-                       kp1: List[cv2.KeyPoint], kp2: List[cv2.KeyPoint]) -> Tuple[float, float, float]:
-        """Estimate motion from matched features"""
+    def match_features(self, pts1: np.ndarray, desc1: np.ndarray,
+                       pts2: np.ndarray, desc2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Match features between two images, returning matched (src, dst) point arrays"""
         try:
-            if len(matches) < 8:
+            return self.matcher.match(pts1, desc1, pts2, desc2, prior=self.pixel_motion)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "match_error", drone=self.drone_name, error=str(e))
+            return EMPTY_MATCH
+    
+    def estimate_motion(self, src_pts: np.ndarray, dst_pts: np.ndarray) -> Tuple[float, float, float]:
+        """Estimate motion from matched feature points"""
+        try:
+            if len(src_pts) < 8:
                 return (0, 0, 0)
             
-            # Get matched keypoints
-            src_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
-            dst_pts = np.float32([kp2[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
-            
             # Calculate essential matrix
             E, mask = cv2.findEssentialMat(src_pts, dst_pts, focal=1.0, pp=(0., 0.))
             
@@ -94,71 +142,131 @@ class VisualOdometry:
             return (t[0][0], t[1][0], t[2][0])
             
         except Exception as e:
-            print(f"Error estimating motion for {self.drone_name}: {str(e)}")
+            log_event(logger, logging.WARNING, "motion_error", drone=self.drone_name, error=str(e))
             return (0, 0, 0)
     
-    def update(self) -> Tuple[float, float, float]:
-        """Update visual odometry estimate"""
+    def update(self, image: Optional[np.ndarray] = None) -> Tuple[float, float, float]:
+        """Update visual odometry estimate, from ``image`` if given instead of the camera"""
         try:
             # Get current image
-            current_image = self.get_camera_image()
+            if image is not None:
+                current_image = image.copy()  # kept as the next prev_image, so it must not alias a reused buffer
+            else:
+                with timers.stage(VO_IMAGE):
+                    current_image = self.get_camera_image()
             if current_image is None:
                 return self.position
             
-            # Detect features
-            current_keypoints, current_descriptors = self.detect_features(current_image)
-            
-            if self.prev_image is not None:
-                # Match features
-                matches = self.match_features(self.prev_descriptors, current_descriptors)
-                
-                # Estimate motion
-                motion = self.estimate_motion(matches, self.prev_keypoints, current_keypoints)
-                
-                # Update position
-                dt = time.time() - self.last_update_time
-                self.velocity = (
-                    motion[0] / dt if dt > 0 else 0,
-                    motion[1] / dt if dt > 0 else 0,
-                    motion[2] / dt if dt > 0 else 0
-                )
-                
-                self.position = (
-                    self.position[0] + self.velocity[0] * dt,
-                    self.position[1] + self.velocity[1] * dt,
-                    self.position[2] + self.velocity[2] * dt
-                )
+            if self.mode == "track":
+                self._update_tracking(current_image)
+            else:
+                self._update_detection(current_image)
             
-            # Update previous frame
             self.prev_image = current_image
-            self.prev_keypoints = current_keypoints
-            self.prev_descriptors = current_descriptors
-            self.last_update_time = time.time()
-            
+            self.last_update_time = self.clock.now()
             return self.position
             
         except Exception as e:
-            print(f"Error updating visual odometry for {self.drone_name}: {str(e)}")
+            log_event(logger, logging.WARNING, "update_error", drone=self.drone_name, error=str(e))
             return self.position
+    
+    def _update_detection(self, current_image: np.ndarray):
+        """Detect ORB features in every frame and match them against the previous one"""
+        with timers.stage(VO_DETECT):
+            current_keypoints, current_descriptors = self.detect_features(current_image)
+            current_points = keypoint_coords(current_keypoints)
+        
+        if self.prev_image is not None:
+            with timers.stage(VO_MATCH):
+                src_pts, dst_pts = self.match_features(self.prev_points, self.prev_descriptors,
+                                                       current_points, current_descriptors)
+            self._apply_motion(src_pts, dst_pts)
+        
+        self.prev_points = current_points
+        self.prev_descriptors = current_descriptors
+    
+    def _update_tracking(self, current_image: np.ndarray):
+        """Track the previous points with optical flow, re-detecting only when needed
+        
+        New corners are detected when fewer than ``min_tracked`` points survive or when
+        the median shift since the last keyframe exceeds ``keyframe_parallax`` pixels.
+        """
+        tracked = None
+        if self.prev_image is not None and self.prev_points is not None:
+            with timers.stage(VO_MATCH):
+                src_pts, dst_pts, found = self.track_features(self.prev_image, current_image, self.prev_points)
+            self._apply_motion(src_pts, dst_pts)
+            self.keyframe_points = self.keyframe_points[found]
+            tracked = dst_pts
+        
+        if tracked is None or len(tracked) < self.min_tracked or self._parallax(tracked) > self.keyframe_parallax:
+            with timers.stage(VO_DETECT):
+                tracked = self.detect_corners(current_image)
+            self.keyframe_points = tracked
+        self.prev_points = tracked
+    
+    def _parallax(self, points: np.ndarray) -> float:
+        """Median pixel displacement of the tracked points since the last keyframe"""
+        if not len(points):
+            return 0.0
+        shift = points - self.keyframe_points
+        return float(np.median(np.sqrt(np.einsum('ij,ij->i', shift, shift))))
+    
+    def _apply_motion(self, src_pts: np.ndarray, dst_pts: np.ndarray):
+        """Estimate motion from a frame pair's correspondences and integrate it"""
+        self.pixel_motion = np.median(dst_pts - src_pts, axis=0) if len(src_pts) >= 8 else None
+        
+        # Estimate motion
+        with timers.stage(VO_POSE):
+            motion = self.estimate_motion(src_pts, dst_pts)
+        
+        # Update position
+        dt = self.clock.now() - self.last_update_time
+        self.velocity = (
+            motion[0] / dt if dt > 0 else 0,
+            motion[1] / dt if dt > 0 else 0,
+            motion[2] / dt if dt > 0 else 0
+        )
+        
+        # Integrate the motion itself; velocity * dt would make the track depend on timing
+        self.position = (
+            self.position[0] + motion[0],
+            self.position[1] + motion[1],
+            self.position[2] + motion[2]
+        )
 
 class SwarmVisualOdometry:
-    def __init__(self, client: airsim.MultirotorClient, drone_names: List[str]):
+    def __init__(self, client: airsim.MultirotorClient, drone_names: List[str], mode: str = "detect",
+                 ingestor: Optional[ImageIngestor] = None, clock: Optional[Clock] = None, **options):
+        """``options`` (matcher, max_corners, min_tracked, keyframe_parallax) go to every drone's VisualOdometry"""
         self.client = client
         self.drone_names = drone_names
+        self.clock = clock or WallClock()
+        self.ingestor = ingestor or ImageIngestor(client, drone_names)
         self.odometry_instances: Dict[str, VisualOdometry] = {}
         self.positions: Dict[str, Tuple[float, float, float]] = {}
         self.running = False
         self.update_thread = None
+        self.loop_stats = None
         
         # Initialize visual odometry for each drone
         for drone_name in drone_names:
-            self.odometry_instances[drone_name] = VisualOdometry(client, drone_name)
+            self.odometry_instances[drone_name] = VisualOdometry(client, drone_name, mode=mode,
+                                                                 ingestor=self.ingestor, clock=self.clock,
+                                                                 **options)
             self.positions[drone_name] = (0, 0, 0)
         
         print(f"Initialized Swarm Visual Odometry for drones: {drone_names}")
     
     def start(self):
-        """Start visual odometry updates"""
+        """Start visual odometry updates
+        
+        With a lockstep clock there is no thread: the loop driving the clock calls
+        step() once per tick instead.
+        """
+        if self.clock.lockstep:
+            print("Visual odometry is stepped by the lockstep clock's loop")
+            return
         self.running = True
         self.update_thread = threading.Thread(target=self._update_loop)
         self.update_thread.start()
@@ -170,19 +278,31 @@ class SwarmVisualOdometry:
         if self.update_thread:
             self.update_thread.join()
         print("Stopped visual odometry updates")
+        if self.loop_stats is not None:
+            print(f"Visual odometry loop: {self.loop_stats.summary()}")
+    
+    def step(self):
+        """Fetch one frame per drone and update every estimate"""
+        with timers.stage(VO_IMAGE):
+            self.ingestor.fetch()
+        for drone_name in self.drone_names:
+            position = self.odometry_instances[drone_name].update()
+            self.positions[drone_name] = position
+            log_event(logger, logging.DEBUG, "vo_position", drone=drone_name,
+                      x=position[0], y=position[1], z=position[2])
     
     def _update_loop(self):
         """Update loop for visual odometry"""
-        while self.running:
+        def tick(info: TickInfo):
             try:
-                for drone_name in self.drone_names:
-                    position = self.odometry_instances[drone_name].update()
-                    self.positions[drone_name] = position
-                    print(f"{drone_name} position: x={position[0]:.2f}, y={position[1]:.2f}, z={position[2]:.2f}")
-                time.sleep(0.1)  # Update at 10 Hz
+                self.step()
             except Exception as e:
-                print(f"Error in visual odometry update loop: {str(e)}")
+                log_event(logger, logging.ERROR, "vo_loop_error", error=str(e))
                 time.sleep(1)
+        
+        # Update at 10 Hz
+        self.loop_stats = ControlLoop(rate_hz=10.0, clock=self.clock.now,
+                                      sleep=self.clock.sleep).run(tick, should_stop=lambda: not self.running)
     
     def get_positions(self) -> Dict[str, Tuple[float, float, float]]:
         """Get current positions of all drones"""
@@ -206,13 +326,14 @@ class SwarmVisualOdometry:
 
 # Example usage:
 if __name__ == "__main__":
+    configure_from_env()
+    
     # Connect to AirSim
-    client = airsim.MultirotorClient()
-    client.confirmConnection()
+    client = connect()
     
     # Initialize swarm visual odometry
     drone_names = ["Drone1", "Drone2", "Drone3", "Drone4", "Drone5", "Drone6"]
-    swarm_vo = SwarmVisualOdometry(client, drone_names)
+    swarm_vo = SwarmVisualOdometry(client, drone_names, mode=os.environ.get("AICLIENT_VO_MODE", "detect"))
     
     try:
         # Start visual odometry
@@ -223,4 +344,5 @@ if __name__ == "__main__":
         
     finally:
         # Stop visual odometry
-        swarm_vo.stop() 
\ No newline at end of file
+        swarm_vo.stop()
+        report_timers() 
\ No newline at end of file